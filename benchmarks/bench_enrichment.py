@@ -0,0 +1,58 @@
+"""Throughput of EnrichmentEngine against stubbed services.
+
+Run from the repository root:
+
+    python benchmarks/bench_enrichment.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.enrichment import EnrichmentEngine, EnrichmentTask  # noqa: E402
+
+SEARCH_LATENCY = 0.05
+LLM_LATENCY = 0.10
+ENTITIES = 64
+
+
+class StubSearchService:
+    def search(self, query, max_results=3):
+        time.sleep(SEARCH_LATENCY)
+        return [{"url": f"http://example.com/{query}", "snippet": query}]
+
+
+class StubLLMService:
+    def extract_multiple_information(self, search_results, prompt_templates):
+        time.sleep(LLM_LATENCY)
+        return {"result": "Not found", "status": "success"}
+
+
+def bench(workers: int) -> float:
+    engine = EnrichmentEngine(
+        StubSearchService(),
+        StubLLMService(),
+        max_workers=workers,
+        search_concurrency=workers,
+        llm_concurrency=workers,
+    )
+    tasks = [EnrichmentTask("name", f"entity {i}", f"entity {i}") for i in range(ENTITIES)]
+    start = time.perf_counter()
+    for _ in engine.run(tasks, ["Find the email address of {entity}"]):
+        pass
+    return ENTITIES / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{ENTITIES} entities, search {SEARCH_LATENCY * 1000:.0f} ms, llm {LLM_LATENCY * 1000:.0f} ms")
+    print(f"{'workers':>8} {'entities/s':>12} {'speedup':>8}")
+    baseline = None
+    for workers in (1, 2, 4, 8, 16):
+        throughput = bench(workers)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>12.1f} {throughput / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Completions and prompt tokens per entity with multi-entity batching.
+
+Uses a stub Groq client that answers batched prompts with valid JSON, so
+only request packing is measured. Token counts use the same estimate as
+LLMService (about 4 characters per token).
+
+    python benchmarks/bench_llm_batching.py
+"""
+import json
+import os
+import re
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.llm_service import LLMService, estimate_tokens  # noqa: E402
+
+ENTITIES = 96
+PROMPTS = ["Find the email address of {entity}", "Find the CEO of {entity}"]
+
+
+class StubCompletions:
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def create(self, model, messages):
+        self.calls += 1
+        self.prompt_tokens += sum(estimate_tokens(m["content"]) for m in messages)
+        numbers = re.findall(r"### Entity (\d+):", messages[-1]["content"])
+        if numbers:
+            content = json.dumps({n: ["Not found"] * len(PROMPTS) for n in numbers})
+        else:
+            content = "1. Not found\n2. Not found"
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def search_results(i):
+    return [
+        {"url": f"https://example.com/{i}/{j}", "snippet": f"Company {i} was founded in 19{j}0 and is based in a city."}
+        for j in range(3)
+    ]
+
+
+def bench(batch_size):
+    service = LLMService(api_key="stub")
+    completions = StubCompletions()
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    items = [(f"Company {i}", search_results(i)) for i in range(ENTITIES)]
+    if batch_size == 1:
+        for _, results in items:
+            service.extract_multiple_information(results, PROMPTS)
+    else:
+        service.extract_batch(items, PROMPTS, max_entities=batch_size)
+    return completions.calls, completions.prompt_tokens
+
+
+def main():
+    print(f"{ENTITIES} entities, {len(PROMPTS)} prompts, 3 snippets each")
+    print(f"{'batch':>6} {'calls':>6} {'calls/entity':>13} {'tokens/entity':>14}")
+    for batch_size in (1, 4, 8, 16):
+        calls, tokens = bench(batch_size)
+        print(f"{batch_size:>6} {calls:>6} {calls / ENTITIES:>13.3f} {tokens / ENTITIES:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
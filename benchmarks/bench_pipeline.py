@@ -0,0 +1,314 @@
+"""End-to-end throughput of search -> extract -> export, fully offline.
+
+SearchService and LLMService run unmodified against local HTTP servers that
+replay the recorded responses in fixtures/ (search_corpus.json for SerpAPI,
+llm_completions.json for Groq), with injected latency and error rates.
+Results are exported through the real CSV, Parquet or Sheets writers; the
+Sheets API is replaced by an in-process fake with the same latency model.
+
+Every size runs in a fresh interpreter so peak memory is measured in
+isolation. The report is JSON (stdout or --output) and a summary table goes
+to stderr; pass --compare with an earlier report to see the change.
+
+    python benchmarks/bench_pipeline.py --output bench.json
+    python benchmarks/bench_pipeline.py --sizes 1000 --error-rate 0.05 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PROMPTS = ["Find the email address of {entity}", "Find the headquarters city of {entity}"]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="entities per run")
+    parser.add_argument("--export", choices=["csv", "parquet", "sheets"], default="csv")
+    parser.add_argument("--search-latency", type=float, default=0.02, help="seconds per search request")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per completion")
+    parser.add_argument("--sheets-latency", type=float, default=0.1, help="seconds per Sheets write")
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency varies by up to +/- this fraction")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing (half 429, half 5xx)")
+    parser.add_argument("--max-workers", type=int, default=16)
+    parser.add_argument("--search-concurrency", type=int, default=8)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="REPORT", help="earlier JSON report to compare throughput with")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES, "search_corpus.json")) as f:
+        corpus = json.load(f)
+    with open(os.path.join(FIXTURES, "llm_completions.json")) as f:
+        completions = json.load(f)
+    return corpus, completions
+
+
+class Faults:
+    """Latency and error injection shared by the fake APIs."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+
+    def delay(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds * self.rng.uniform(1 - self.args.jitter, 1 + self.args.jitter))
+
+    def error(self):
+        """None, or the HTTP status of an injected failure."""
+        if self.rng.random() >= self.args.error_rate:
+            return None
+        return 429 if self.rng.random() < 0.5 else 503
+
+
+def search_handler(corpus, faults):
+    def handle(method, path, query, body):
+        faults.delay(faults.args.search_latency)
+        status = faults.error()
+        if status:
+            return status, {"error": "injected"}, {"Retry-After": "0"}
+        # Entities are "<fixture entity> <n>"; n picks the recording
+        entry = corpus[int(query["q"][0].rsplit(" ", 1)[1]) % len(corpus)]
+        organic = [{"link": r["url"], "snippet": r["snippet"]} for r in entry["results"]]
+        return 200, {"organic_results": organic}
+
+    return handle
+
+
+def llm_handler(corpus, completions, faults):
+    by_url = {entry["results"][0]["url"]: i for i, entry in enumerate(corpus)}
+
+    def handle(method, path, query, body):
+        faults.delay(faults.args.llm_latency)
+        status = faults.error()
+        if status:
+            return status, {"error": {"message": "injected"}}, {"Retry-After": "0"}
+        user_message = body["messages"][-1]["content"]
+        url = user_message.split("URL: ", 1)[1].split("\n", 1)[0]
+        completion = completions[by_url.get(url, 0)]
+        return 200, {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": completion["content"]}, "finish_reason": "stop"}
+            ],
+            "usage": {**completion["usage"], "total_tokens": sum(completion["usage"].values())},
+        }
+
+    return handle
+
+
+class FakeSheetsService:
+    """Just enough of the Sheets client for SheetResultWriter."""
+
+    def __init__(self, faults):
+        self.faults = faults
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def batchUpdate(self, spreadsheetId, body):
+        return self
+
+    def execute(self):
+        import httplib2
+        from googleapiclient.errors import HttpError
+
+        self.faults.delay(self.faults.args.sheets_latency)
+        status = self.faults.error()
+        if status:
+            raise HttpError(httplib2.Response({"status": status}), b"injected")
+        return {}
+
+
+def open_writer(args, faults, tmpdir):
+    from services.result_writer import open_result_writer
+    from services.sheets_handler import SheetResultWriter
+    from utils.rate_limiter import RateLimiter
+
+    if args.export == "sheets":
+        handler = SimpleNamespace(service=FakeSheetsService(faults), write_rate_limiter=RateLimiter(60, per=60))
+        return SheetResultWriter(handler, "bench", retry_backoff=0.01)
+    return open_result_writer(os.path.join(tmpdir, f"results.{args.export}"), args.export)
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    samples = sorted(samples)
+
+    def at(q):
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    return {"count": len(samples), "p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": samples[-1]}
+
+
+def timed(function, samples):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+
+    return wrapper
+
+
+def run_child(args, size: int) -> dict:
+    import groq
+    import pandas as pd
+
+    from services.enrichment import create_engine, plan_tasks
+    from services.llm_service import LLMService
+    from services.search_service import SearchService
+    from tests.stub_server import StubServer
+    from utils.metrics import metrics
+    from utils.rate_limiter import RateLimiter
+
+    corpus, completions = load_fixtures()
+    faults = Faults(args)
+    config = {
+        "processing": {
+            "max_workers": args.max_workers,
+            "search_concurrency": args.search_concurrency,
+            "llm_concurrency": args.llm_concurrency,
+        }
+    }
+    entities = pd.DataFrame({"name": [f"{corpus[i % len(corpus)]['entity']} {i}" for i in range(size)]})
+    latencies = {"search": [], "llm": [], "export": []}
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with StubServer(search_handler(corpus, faults)) as search_server, StubServer(
+        llm_handler(corpus, completions, faults)
+    ) as llm_server, tempfile.TemporaryDirectory() as tmpdir:
+        # Unlimited rate limiters keep the services' retry paths without pacing them
+        search = SearchService(
+            "bench",
+            base_url=f"{search_server.url}/search",
+            max_connections=args.search_concurrency,
+            rate_limiter=RateLimiter(1e9, per=1),
+        )
+        llm = LLMService("bench", rate_limiter=RateLimiter(1e9, per=1))
+        llm.client = groq.Groq(api_key="bench", base_url=llm_server.url, max_retries=0)
+        search.search = timed(search.search, latencies["search"])
+        llm.extract_multiple_information = timed(llm.extract_multiple_information, latencies["llm"])
+        engine = create_engine(search, llm, config)
+        writer = open_writer(args, faults, tmpdir)
+        write = timed(writer.write, latencies["export"])
+        metrics.reset()
+
+        start = time.perf_counter()
+        plan = plan_tasks(entities, ["name"], "{entity}")
+        failed = 0
+        for row in plan.iter_fan_out(engine.run(plan.tasks, PROMPTS)):
+            failed += "error" in row["Extracted Information"].lower()
+            write(row)
+        timed(writer.close, latencies["export"])()
+        elapsed = time.perf_counter() - start
+        search.close()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "entities": size,
+        "seconds": elapsed,
+        "entities_per_second": size / elapsed,
+        "latency_seconds": {stage: percentiles(samples) for stage, samples in latencies.items()},
+        "failed_rows": failed,
+        "retries": {stage: metrics.value("quickdata_retries_total", stage=stage) for stage in ("search", "llm", "sheets_write")},
+        "errors": {stage: metrics.value("quickdata_errors_total", stage=stage) for stage in ("search", "llm", "sheets_write")},
+        "llm_tokens": {kind: metrics.value("quickdata_llm_tokens_total", kind=kind) for kind in ("prompt", "completion")},
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": peak_rss / 1024,
+        "peak_rss_growth_mb": (peak_rss - baseline_rss) / 1024,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(report, previous=None):
+    before = {run["entities"]: run for run in (previous or {}).get("runs", [])}
+    print(f"{'entities':>9} {'entities/s':>11} {'search p95':>11} {'llm p95':>9} {'export p95':>11} {'peak MB':>8} {'failed':>7}", file=sys.stderr)
+    for run in report["runs"]:
+        latency = run["latency_seconds"]
+        line = (
+            f"{run['entities']:>9} {run['entities_per_second']:>11.1f} "
+            f"{latency['search']['p95']:>10.3f}s {latency['llm']['p95']:>8.3f}s "
+            f"{latency['export']['p95']:>10.4f}s {run['peak_rss_mb']:>8.1f} {run['failed_rows']:>7}"
+        )
+        if run["entities"] in before:
+            change = run["entities_per_second"] / before[run["entities"]]["entities_per_second"] - 1
+            line += f"  {change:+.1%} vs previous"
+        print(line, file=sys.stderr)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child is not None:
+        print(json.dumps(run_child(args, args.child)))
+        return
+
+    child_args = [arg for arg in (argv if argv is not None else sys.argv[1:])]
+    runs = []
+    for size in args.sizes:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *child_args, "--child", str(size)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        runs.append(json.loads(output))
+
+    report = {
+        "benchmark": "pipeline",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("child", "output", "compare", "sizes")},
+        "runs": runs,
+    }
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_summary(report, previous)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Wall time of the search -> LLM pipeline against its lower and upper bounds.
+
+Search and LLM are stubs that sleep for a jittered latency. Each stage may
+run ``--concurrency`` calls at once, so for N entities:
+
+- stages strictly alternating per entity take about N * (S + L) / c
+- stages overlapping take about N * max(S, L) / c
+
+Every configuration runs with the same thread budget (``--max-workers``),
+unpipelined (prefetch 0) and with several lookaheads. Unpipelined, an entity
+whose search finished holds its thread while it waits for an LLM slot, so
+with max_workers = c the stages alternate and with 2c a burst of slow
+completions still stalls searching. The pipeline parks searched entities in
+a queue that costs no thread, so uneven latencies are absorbed by the
+lookahead:
+
+    python benchmarks/bench_pipelining.py
+    python benchmarks/bench_pipelining.py --search-latency 0.08 --llm-latency 0.04 --prefetch 4 16
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.enrichment import EnrichmentEngine, EnrichmentTask  # noqa: E402
+
+PROMPTS = ["Find the email address of {entity}"]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entities", type=int, default=200)
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per search")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.9, help="latency varies by up to +/- this fraction")
+    parser.add_argument("--concurrency", type=int, default=4, help="search and LLM calls in flight per stage")
+    parser.add_argument("--max-workers", type=int, nargs="+", help="thread budgets (default: c and 2c)")
+    parser.add_argument("--prefetch", type=int, nargs="+", default=[4, 16, 32], help="lookaheads to try")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+class Latency:
+    def __init__(self, seconds: float, jitter: float, seed: int):
+        self.seconds = seconds
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sleep(self):
+        with self.lock:
+            factor = self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        time.sleep(self.seconds * factor)
+
+
+class StubSearchService:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def search(self, query, max_results=3):
+        self.latency.sleep()
+        return [{"url": f"http://example.com/{query}", "snippet": query}]
+
+
+class StubLLMService:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def extract_multiple_information(self, search_results, prompt_templates):
+        self.latency.sleep()
+        return {"result": "Not found", "status": "success"}
+
+
+def bench(args, max_workers: int, prefetch: int) -> float:
+    engine = EnrichmentEngine(
+        StubSearchService(Latency(args.search_latency, args.jitter, args.seed)),
+        StubLLMService(Latency(args.llm_latency, args.jitter, args.seed + 1)),
+        max_workers=max_workers,
+        search_concurrency=args.concurrency,
+        llm_concurrency=args.concurrency,
+        prefetch=prefetch,
+    )
+    tasks = [EnrichmentTask("name", f"entity {i}", f"entity {i}") for i in range(args.entities)]
+    start = time.perf_counter()
+    for _ in engine.run(tasks, PROMPTS):
+        pass
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    c = args.concurrency
+    serial = args.entities * (args.search_latency + args.llm_latency) / c
+    overlapped = args.entities * max(args.search_latency, args.llm_latency) / c
+    print(
+        f"{args.entities} entities, search {args.search_latency * 1000:.0f} ms, "
+        f"llm {args.llm_latency * 1000:.0f} ms, {c} calls per stage"
+    )
+    print(f"alternating bound N*(S+L)/c = {serial:.2f}s, overlapped bound N*max(S,L)/c = {overlapped:.2f}s")
+    print(f"{'workers':>8} {'prefetch':>9} {'seconds':>8} {'vs bound':>9} {'speedup':>8}")
+    for max_workers in args.max_workers or [c, 2 * c]:
+        baseline = None
+        for prefetch in [0, *args.prefetch]:
+            seconds = bench(args, max_workers, prefetch)
+            baseline = baseline or seconds
+            print(
+                f"{max_workers:>8} {prefetch:>9} {seconds:>8.2f} "
+                f"{seconds / overlapped:>8.2f}x {baseline / seconds:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Prompt tokens per completion before and after snippet compaction.
+
+Replays the search results in fixtures/search_corpus.json (SerpAPI result
+shape, with the mirrored pages, repeated snippets and empty snippets that
+real result pages contain) through LLMService with a stub Groq client.
+"Facts kept" counts the expected answers still present in the prompt, so a
+budget that trims away the answer shows up as lost quality.
+
+    python benchmarks/bench_prompt_tokens.py
+"""
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.llm_service import EXTRACT_MULTIPLE_SYSTEM_PROMPT, LLMService  # noqa: E402
+from services.prompt_builder import PromptBuilder, estimate_tokens, format_search_results  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "search_corpus.json")
+BUDGETS = [(120, 1000), (60, 1000), (40, 1000), (120, 100)]
+
+
+class StubCompletions:
+    def __init__(self):
+        self.prompts = []
+
+    def create(self, model, messages):
+        self.prompts.append(messages)
+        message = SimpleNamespace(content="1. Not found\n2. Not found")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def baseline_messages(entry):
+    """The prompt as it was built before compaction: verbatim results, instructions twice."""
+    prompts_text = "\n".join(f"{i+1}. {p}" for i, p in enumerate(entry["prompts"]))
+    user = (
+        f"{EXTRACT_MULTIPLE_SYSTEM_PROMPT}\n\nSearch results:\n"
+        f"{format_search_results(entry['results'])}\n\nExtract:\n{prompts_text}"
+    )
+    return [
+        {"role": "system", "content": EXTRACT_MULTIPLE_SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
+
+
+def summarize(corpus, all_messages):
+    tokens = [sum(estimate_tokens(m["content"]) for m in messages) for messages in all_messages]
+    kept = sum(
+        fact in messages[-1]["content"]
+        for entry, messages in zip(corpus, all_messages)
+        for fact in entry["expected"]
+    )
+    facts = sum(len(entry["expected"]) for entry in corpus)
+    return sum(tokens) / len(tokens), max(tokens), f"{kept}/{facts}"
+
+
+def compacted_messages(corpus, max_snippet_tokens, max_context_tokens):
+    service = LLMService(
+        api_key="stub",
+        prompt_builder=PromptBuilder(max_snippet_tokens, max_context_tokens),
+    )
+    completions = StubCompletions()
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    for entry in corpus:
+        service.extract_multiple_information(entry["results"], entry["prompts"])
+    return completions.prompts
+
+
+def main():
+    with open(CORPUS) as f:
+        corpus = json.load(f)
+    results = sum(len(entry["results"]) for entry in corpus)
+    print(f"{len(corpus)} entities, {results} search results")
+    print(f"{'prompt':<32} {'avg tokens':>10} {'max tokens':>10} {'facts kept':>11}")
+
+    average, peak, kept = summarize(corpus, [baseline_messages(entry) for entry in corpus])
+    print(f"{'verbatim (before)':<32} {average:>10.0f} {peak:>10} {kept:>11}")
+    for snippet_budget, context_budget in BUDGETS:
+        messages = compacted_messages(corpus, snippet_budget, context_budget)
+        average, peak, kept = summarize(corpus, messages)
+        label = f"compacted {snippet_budget}/snippet {context_budget}/call"
+        print(f"{label:<32} {average:>10.0f} {peak:>10} {kept:>11}")
+
+
+if __name__ == "__main__":
+    main()
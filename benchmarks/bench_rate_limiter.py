@@ -0,0 +1,111 @@
+"""Contention microbenchmark for RateLimiter.
+
+Many threads compete for a bucket refilling at RATE tokens/s. Compares the
+old polling limiter (``time.sleep(0.1)`` loop on ``time.time()``) with the
+reservation-based RateLimiter: wake-ups (lock round-trips) per acquire,
+CPU time and how evenly waiting time is spread across threads.
+
+    python benchmarks/bench_rate_limiter.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utils.rate_limiter import RateLimiter  # noqa: E402
+
+RATE = 100  # tokens per second
+THREADS = 200
+ACQUIRES_PER_THREAD = 2
+
+
+class PollingRateLimiter:
+    """The limiter this module replaced, kept here as a baseline."""
+
+    def __init__(self, rate, per=60):
+        self.rate = rate
+        self.per = per
+        self.tokens = rate
+        self.last_update = time.time()
+        self.lock = threading.Lock()
+        self.attempts = 0
+
+    def _add_tokens(self):
+        now = time.time()
+        self.tokens = min(self.rate, self.tokens + (now - self.last_update) * (self.rate / self.per))
+        self.last_update = now
+
+    def acquire(self):
+        with self.lock:
+            self.attempts += 1
+            self._add_tokens()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait(self):
+        while not self.acquire():
+            time.sleep(0.1)
+
+
+def run_threads(limiter):
+    waits = []
+    order = []
+    lock = threading.Lock()
+
+    def worker(i):
+        for _ in range(ACQUIRES_PER_THREAD):
+            start = time.monotonic()
+            limiter.wait()
+            with lock:
+                waits.append(time.monotonic() - start)
+                order.append(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.monotonic() - wall_start, time.process_time() - cpu_start, waits
+
+
+def run_async(limiter):
+    async def worker():
+        for _ in range(ACQUIRES_PER_THREAD):
+            await limiter.acquire_async()
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(THREADS)))
+
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    asyncio.run(main())
+    return time.monotonic() - wall_start, time.process_time() - cpu_start
+
+
+def report(name, wall, cpu, waits=None, attempts=None):
+    total = THREADS * ACQUIRES_PER_THREAD
+    line = f"{name:<22} wall {wall:5.2f}s  cpu {cpu * 1000:6.1f} ms"
+    line += f"  wake-ups/acquire {(attempts or total) / total:5.1f}"
+    if waits:
+        line += f"  max wait {max(waits):5.2f}s  wait stdev {statistics.pstdev(waits):5.2f}s"
+    print(line)
+
+
+def main():
+    total = THREADS * ACQUIRES_PER_THREAD
+    print(f"{THREADS} threads x {ACQUIRES_PER_THREAD} acquires, {RATE}/s, burst {RATE}")
+    print(f"ideal wall time {(total - RATE) / RATE:.2f}s")
+    polling = PollingRateLimiter(RATE, per=1)
+    report("polling (old)", *run_threads(polling), attempts=polling.attempts)
+    report("reservation threads", *run_threads(RateLimiter(RATE, per=1)))
+    report("reservation asyncio", *run_async(RateLimiter(RATE, per=1)))
+
+
+if __name__ == "__main__":
+    main()
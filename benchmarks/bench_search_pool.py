@@ -0,0 +1,71 @@
+"""Per-query latency of SerpAPI-style requests with and without connection reuse.
+
+Runs against a local stub server that adds SERVER_LATENCY per request to
+stand in for SerpAPI's response time. There is no TLS locally, so against
+serpapi.com the saving from connection reuse is larger.
+
+    python benchmarks/bench_search_pool.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+
+from services.search_service import AsyncSearchService, SearchService  # noqa: E402
+from tests.stub_server import StubServer  # noqa: E402
+
+QUERIES = 200
+SERVER_LATENCY = 0.02
+
+
+def handler(method, path, query, body):
+    time.sleep(SERVER_LATENCY)
+    return 200, {"organic_results": [{"link": "http://example.com", "snippet": query["q"][0]}]}
+
+
+def fresh_connections(url):
+    for i in range(QUERIES):
+        httpx.get(url, params={"api_key": "key", "q": f"query {i}", "num": 3}).raise_for_status()
+
+
+def pooled(url):
+    service = SearchService("key", rate_limit=10**6, base_url=url)
+    for i in range(QUERIES):
+        service.search(f"query {i}")
+    service.close()
+
+
+def fanned_out(url):
+    async def run():
+        async with AsyncSearchService("key", rate_limit=10**6, base_url=url) as service:
+            await service.search_many([f"query {i}" for i in range(QUERIES)])
+
+    asyncio.run(run())
+
+
+def main():
+    with StubServer(handler) as server:
+        print(f"{QUERIES} queries, {SERVER_LATENCY * 1000:.0f} ms server latency")
+        for name, fn in (
+            ("new connection per query", fresh_connections),
+            ("pooled SearchService", pooled),
+            ("AsyncSearchService.search_many", fanned_out),
+        ):
+            server.connections.clear()
+            start = time.perf_counter()
+            fn(server.url)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:<32} {elapsed / QUERIES * 1000:7.2f} ms/query "
+                f"{len(server.connections):4d} connections"
+            )
+
+
+if __name__ == "__main__":
+    main()
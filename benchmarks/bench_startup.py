@@ -0,0 +1,184 @@
+"""Cold start and rerun cost of the Streamlit app.
+
+Each measurement runs in a fresh interpreter:
+
+- import: time to import dashboard.ui, and which heavy SDKs that pulls in
+- app: the app driven by Streamlit's AppTest; the first Home render (cold
+  start), Home reruns, the first Data Processing render, its reruns, and
+  Data Processing in a second session of the same server
+
+The app runs in a scratch directory with a copy of config/config.yaml
+whose Google credentials do not exist, so nothing talks to Google; trees
+that build the Sheets client on page load fail there after importing it.
+Pass --baseline with a git revision to measure that tree too:
+
+    python benchmarks/bench_startup.py --baseline HEAD~1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+APP_TIMINGS = [
+    "home_first_seconds",
+    "home_rerun_seconds",
+    "processing_first_seconds",
+    "processing_rerun_seconds",
+    "processing_new_session_seconds",
+]
+HEAVY_MODULES = ["pandas", "pyarrow", "yaml", "pydantic", "groq", "httpx", "googleapiclient", "google.oauth2"]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", metavar="REV", help="git revision to compare against, e.g. HEAD~1")
+    parser.add_argument("--reruns", type=int, default=5, help="reruns timed per page")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement; the median is kept")
+    parser.add_argument("--child", choices=["import", "app"], help=argparse.SUPPRESS)
+    parser.add_argument("--root", default=ROOT, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def loaded_heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def measure_import(root: str) -> dict:
+    sys.path.insert(0, os.path.join(root, "src"))
+    start = time.perf_counter()
+    import dashboard.ui  # noqa: F401
+
+    return {"import_seconds": time.perf_counter() - start, "heavy_modules": loaded_heavy_modules()}
+
+
+def scratch_config(root: str, directory: str):
+    import yaml
+
+    with open(os.path.join(root, "config", "config.yaml")) as f:
+        config = yaml.safe_load(f)
+    config["google_sheets"]["credentials_file"] = os.path.join(directory, "google", "credentials.json")
+    cache = os.path.join(directory, ".cache")
+    for section in ("search", "llm"):
+        if (config.get(section) or {}).get("cache"):
+            config[section]["cache"]["directory"] = cache
+    config["jobs"] = {"directory": cache}
+    if "quota" in config:
+        config["quota"]["path"] = os.path.join(cache, "quota.sqlite3")
+    config["metrics"] = {"json_path": None, "trace_path": None}
+    os.makedirs(os.path.join(directory, "config"))
+    with open(os.path.join(directory, "config", "config.yaml"), "w") as f:
+        yaml.safe_dump(config, f)
+    os.symlink(os.path.join(root, "logo.jpg"), os.path.join(directory, "logo.jpg"))
+
+
+def timed_run(app) -> float:
+    start = time.perf_counter()
+    app.run()
+    return time.perf_counter() - start
+
+
+def measure_app(root: str, reruns: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        scratch_config(root, directory)
+        os.chdir(directory)
+        sys.path.insert(0, os.path.join(root, "src"))
+        heavy_before = set(loaded_heavy_modules())
+        from streamlit.testing.v1 import AppTest
+
+        app = AppTest.from_file(os.path.join(root, "src", "main.py"), default_timeout=120)
+        home_first = timed_run(app)
+        heavy_after_home = [name for name in loaded_heavy_modules() if name not in heavy_before]
+        home_reruns = [timed_run(app) for _ in range(reruns)]
+
+        app.sidebar.radio[0].set_value("Data Processing")
+        processing_first = timed_run(app)
+        processing_reruns = [timed_run(app) for _ in range(reruns)]
+        errors = [error.value for error in app.error]
+
+        session = AppTest.from_file(os.path.join(root, "src", "main.py"), default_timeout=120)
+        session.run()
+        session.sidebar.radio[0].set_value("Data Processing")
+        new_session = timed_run(session)
+
+    return {
+        "home_first_seconds": home_first,
+        "home_rerun_seconds": statistics.median(home_reruns),
+        "processing_first_seconds": processing_first,
+        "processing_rerun_seconds": statistics.median(processing_reruns),
+        "processing_new_session_seconds": new_session,
+        "heavy_modules_after_home": heavy_after_home,
+        "processing_errors": errors,
+    }
+
+
+def run_child(kind: str, root: str, reruns: int) -> dict:
+    args = [sys.executable, os.path.abspath(__file__), "--child", kind, "--root", root, "--reruns", str(reruns)]
+    output = subprocess.run(args, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_tree(root: str, args) -> dict:
+    """Medians over ``args.repeat`` fresh interpreters for each measurement."""
+    imports = [run_child("import", root, args.reruns) for _ in range(args.repeat)]
+    apps = [run_child("app", root, args.reruns) for _ in range(args.repeat)]
+    result = {"import_seconds": statistics.median(run["import_seconds"] for run in imports)}
+    result["heavy_modules"] = imports[0]["heavy_modules"]
+    for key in APP_TIMINGS:
+        result[key] = statistics.median(run[key] for run in apps)
+    result["heavy_modules_after_home"] = apps[0]["heavy_modules_after_home"]
+    result["processing_errors"] = apps[0]["processing_errors"]
+    return result
+
+
+def export_revision(rev: str, directory: str):
+    archive = subprocess.run(["git", "archive", rev], cwd=ROOT, check=True, capture_output=True).stdout
+    subprocess.run(["tar", "-x", "-C", directory], input=archive, check=True)
+
+
+def print_summary(results: dict):
+    rows = [
+        ("import dashboard.ui", "import_seconds"),
+        ("Home, first render", "home_first_seconds"),
+        ("Home, rerun", "home_rerun_seconds"),
+        ("Data Processing, first render", "processing_first_seconds"),
+        ("Data Processing, rerun", "processing_rerun_seconds"),
+        ("Data Processing, new session", "processing_new_session_seconds"),
+    ]
+    names = list(results)
+    print(f"{'':<32}" + "".join(f"{name:>14}" for name in names), file=sys.stderr)
+    for label, key in rows:
+        line = f"{label:<32}" + "".join(f"{results[name][key] * 1000:>12.0f}ms" for name in names)
+        if len(names) == 2:
+            before, after = (results[name][key] for name in names)
+            line += f"  {after / before - 1:+.0%}"
+        print(line, file=sys.stderr)
+    for name in names:
+        print(f"{name}: Home loads {', '.join(results[name]['heavy_modules_after_home']) or 'no heavy SDKs'}", file=sys.stderr)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child == "import":
+        print(json.dumps(measure_import(args.root)))
+        return
+    if args.child == "app":
+        print(json.dumps(measure_app(args.root, args.reruns)))
+        return
+
+    results = {}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            export_revision(args.baseline, directory)
+            results[args.baseline] = measure_tree(directory, args)
+    results["working tree"] = measure_tree(ROOT, args)
+    print_summary(results)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
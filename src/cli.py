@@ -0,0 +1,276 @@
+"""Headless batch runner: enriches a CSV file or Google Sheet without Streamlit.
+
+Example:
+
+    ./quickdata --csv companies.csv --columns name \
+        --prompt "Find the email address" --output results.parquet
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+import yaml
+
+from services.csv_handler import iter_csv_chunks, read_csv_header
+from services.enrichment import create_engine, plan_tasks
+from services.incremental import IncrementalRun
+from services.job_store import create_job_store
+from services.llm_service import create_llm_service
+from services.result_writer import RESULT_COLUMNS, open_result_writer
+from services.search_service import create_search_service
+from services.structured_output import result_columns
+from services.sheets_handler import GoogleSheetsHandler
+from utils.env_utils import get_env_variable, load_env_variables
+from utils.metrics import Tracer, metrics
+from utils.quota_ledger import create_quota_ledger
+
+DEFAULT_QUERY_TEMPLATE = "Find information about {entity}"
+
+
+def load_config(path: str) -> dict:
+    load_env_variables()
+    with open(path, "r") as f:
+        config = yaml.safe_load(f)
+
+    config["api_keys"]["serpapi"] = get_env_variable("SERPAPI_API_KEY")
+    config["api_keys"]["groq"] = get_env_variable("GROQ_API_KEY")
+    return config
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="quickdata",
+        description="Enrich entities from a CSV file or Google Sheet with web search and an LLM.",
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="input CSV file")
+    source.add_argument("--sheet", help="Google Sheet ID or URL")
+    parser.add_argument("-c", "--columns", nargs="+", required=True, help="columns holding the entities")
+    parser.add_argument(
+        "-p",
+        "--prompt",
+        dest="prompts",
+        action="append",
+        required=True,
+        help='information to extract, e.g. "Find the email address"; repeat for several',
+    )
+    parser.add_argument("--query-template", default=DEFAULT_QUERY_TEMPLATE, help="search query, with {entity}")
+    parser.add_argument("--start-row", type=int, default=0, help="first row to process (default: 0)")
+    parser.add_argument("--end-row", type=int, help="row to stop before (default: last row)")
+    parser.add_argument("-o", "--output", help="output file, .csv or .parquet")
+    parser.add_argument(
+        "--export-sheet",
+        nargs="?",
+        const="",
+        metavar="SHEET",
+        help="also write results to this Google Sheet ID or URL as they finish (a new sheet if omitted)",
+    )
+    parser.add_argument("--format", choices=["csv", "parquet"], help="output format (default: from extension)")
+    parser.add_argument("--config", default="config/config.yaml", help="config file (default: %(default)s)")
+    parser.add_argument("--max-workers", type=int, help="entities enriched in parallel")
+    parser.add_argument("--search-concurrency", type=int, help="simultaneous search requests")
+    parser.add_argument("--llm-concurrency", type=int, help="simultaneous LLM completions")
+    parser.add_argument("--llm-batch-size", type=int, help="entities packed into one completion")
+    parser.add_argument("--prefetch", type=int, help="entities searched ahead of the LLM (0 disables pipelining)")
+    parser.add_argument(
+        "--structured",
+        action="store_true",
+        help="ask for JSON and write one column per prompt instead of a single text column",
+    )
+    parser.add_argument("--no-dedupe", action="store_true", help="search every cell, even repeated entities")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only enrich rows that are new or changed since the last incremental run of this source",
+    )
+    parser.add_argument("--key-column", help="column identifying rows for --incremental (default: row number)")
+    parser.add_argument(
+        "--metrics", metavar="FILE", help="write metrics here when done (.prom for Prometheus text, else JSON)"
+    )
+    parser.add_argument("--trace", metavar="FILE", help="append one JSON line per entity with time spent per stage")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args(argv)
+    if args.output is None and args.export_sheet is None:
+        parser.error("one of --output or --export-sheet is required")
+    if args.key_column and not args.incremental:
+        parser.error("--key-column requires --incremental")
+    return args
+
+
+def format_prompt(prompt: str) -> str:
+    """Matches the dashboard: "Find the email address" -> "... of {entity}"."""
+    return prompt if "{entity}" in prompt else f"{prompt} of {{entity}}"
+
+
+def parse_sheet_id(sheet: str) -> str:
+    if "/spreadsheets/d/" in sheet:
+        return sheet.split("/spreadsheets/d/")[1].split("/")[0]
+    return sheet
+
+
+def source_name(args: argparse.Namespace) -> str:
+    """Identifies the input across runs, for --incremental."""
+    return os.path.abspath(args.csv) if args.csv else parse_sheet_id(args.sheet)
+
+
+def load_data(args: argparse.Namespace, config: dict, columns: Optional[List[str]] = None):
+    """Returns the selected rows as chunks, so neither source is loaded whole."""
+    columns = columns or args.columns
+    if args.csv:
+        available = read_csv_header(args.csv)
+    else:
+        sheets_handler = GoogleSheetsHandler(config["google_sheets"]["credentials_file"])
+        sheet_id = parse_sheet_id(args.sheet)
+        available = sheets_handler.read_sheet_header(sheet_id)
+
+    missing = [column for column in columns if column not in available]
+    if missing:
+        raise Exception(f"Columns not found: {', '.join(missing)}")
+    if args.csv:
+        return iter_csv_chunks(args.csv, columns, args.start_row, args.end_row)
+    return sheets_handler.iter_sheet_pages(sheet_id, columns, args.start_row, args.end_row)
+
+
+class ProgressReporter:
+    """Prints entity progress and throughput to stderr at most every ``interval`` seconds."""
+
+    def __init__(self, interval: float = 1.0, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.start = time.monotonic()
+        self.last_report = float("-inf")
+
+    def __call__(self, done: int, total: int, row: dict):
+        now = time.monotonic()
+        if done < total and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        rate = done / max(now - self.start, 1e-9)
+        latency = "".join(
+            f", {stage} p50/p95 {stats['p50']:.2f}/{stats['p95']:.2f}s"
+            for stage, stats in (("search", metrics.latency("search")), ("llm", metrics.latency("llm")))
+            if stats["p50"] is not None
+        )
+        print(f"{done}/{total} entities ({rate:.2f}/s{latency})", file=self.stream, flush=True)
+
+
+def run(args: argparse.Namespace) -> int:
+    config = load_config(args.config)
+    for key in ("serpapi", "groq"):
+        if not config["api_keys"].get(key):
+            raise Exception(f"Missing API key: set {key.upper()}_API_KEY in the environment or .env")
+
+    processing_config = config.setdefault("processing", {})
+    overrides = {
+        "max_workers": args.max_workers,
+        "search_concurrency": args.search_concurrency,
+        "llm_concurrency": args.llm_concurrency,
+        "llm_batch_size": args.llm_batch_size,
+        "prefetch": args.prefetch,
+    }
+    processing_config.update({key: value for key, value in overrides.items() if value is not None})
+    if args.structured:
+        config.setdefault("llm", {})["structured_output"] = True
+    structured_output = config.get("llm", {}).get("structured_output", False)
+    dedupe_config = processing_config.get("dedupe", {})
+
+    prompts = [format_prompt(prompt) for prompt in args.prompts]
+    incremental = None
+    if args.incremental:
+        job_store = create_job_store(config.get("jobs", {}))
+        incremental = IncrementalRun(
+            job_store,
+            source_name(args),
+            args.columns,
+            prompts,
+            args.query_template,
+            args.key_column,
+            structured_output,
+            whole_source=args.start_row == 0 and args.end_row is None,
+        )
+        data = incremental.filter_changed(load_data(args, config, incremental.read_columns))
+    else:
+        data = load_data(args, config)
+    plan = plan_tasks(
+        data,
+        args.columns,
+        args.query_template,
+        dedupe=dedupe_config.get("enabled", True) and not args.no_dedupe,
+        casefold=dedupe_config.get("casefold", True),
+        collapse_whitespace=dedupe_config.get("collapse_whitespace", True),
+    )
+    if incremental is not None:
+        print(
+            f"{incremental.changed_rows} new or changed rows, {incremental.reused_rows} unchanged",
+            file=sys.stderr,
+        )
+    print(f"{len(plan.cells)} cells, {len(plan.tasks)} unique entities", file=sys.stderr)
+
+    quota_ledger = create_quota_ledger(config.get("quota"))
+    search_service = create_search_service(config["api_keys"]["serpapi"], config.get("search", {}), quota_ledger)
+    llm_service = create_llm_service(config["api_keys"]["groq"], config.get("llm", {}), quota_ledger)
+    tracer = Tracer(args.trace) if args.trace else None
+    engine = create_engine(search_service, llm_service, config, tracer)
+    on_progress = None if args.quiet else ProgressReporter()
+
+    columns = result_columns(prompts) if structured_output else RESULT_COLUMNS
+    writers = []
+    if args.output:
+        writers.append(open_result_writer(args.output, args.format, columns))
+    if args.export_sheet is not None:
+        sheets_config = config.get("google_sheets", {})
+        sheets_handler = GoogleSheetsHandler(sheets_config["credentials_file"])
+        sheet_writer = sheets_handler.open_result_writer(
+            parse_sheet_id(args.export_sheet) or None,
+            chunk_size=sheets_config.get("write_chunk_rows", 500),
+            flush_interval=sheets_config.get("write_flush_seconds", 5),
+            columns=columns,
+        )
+        print(f"Writing results to {sheet_writer.url}", file=sys.stderr)
+        writers.append(sheet_writer)
+
+    start = time.monotonic()
+    try:
+        rows = plan.iter_fan_out(engine.run(plan.tasks, prompts, on_progress=on_progress))
+        if incremental is not None:
+            # Unchanged rows take their earlier results, so output waits for the whole run
+            rows = incremental.merge(list(rows))
+        for row in rows:
+            for writer in writers:
+                writer.write(row)
+    finally:
+        for writer in writers:
+            writer.close()
+        search_service.close()
+        if tracer is not None:
+            tracer.close()
+        metrics_path = args.metrics or (config.get("metrics") or {}).get("json_path")
+        if metrics_path:
+            metrics.write(metrics_path)
+    elapsed = time.monotonic() - start
+
+    print(
+        f"Enriched {len(plan.tasks)} entities in {elapsed:.1f}s "
+        f"({len(plan.tasks) / max(elapsed, 1e-9):.2f} entities/s); "
+        f"wrote {writers[0].count} rows",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        return run(args)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,17 @@
-import pandas as pd
+import time
+
 import streamlit as st
-import yaml
 
-from services.llm_service import LLMService
-from services.search_service import SearchService
-from services.sheets_handler import GoogleSheetsHandler
 from utils.env_utils import get_env_variable, load_env_variables
+from utils.metrics import Tracer, metrics
+
+# pandas, the API SDKs and the services built on them are imported where
+# they are first used, so the Home page loads without any of them
+
+PREVIEW_ROWS = 1000
+# What st.experimental_user reports on deployments without authentication
+PLACEHOLDER_EMAIL = "test@example.com"
+
 
 def set_custom_theme():
     st.set_page_config(
@@ -68,6 +74,8 @@ def set_custom_theme():
     """, unsafe_allow_html=True)
 
 def load_config():
+    import yaml
+
     load_env_variables()
     with open("config/config.yaml", "r") as f:
         config = yaml.safe_load(f)
@@ -79,29 +87,41 @@ def load_config():
     return config
 
 
+@st.cache_resource(show_spinner=False)
+def get_config():
+    """The config, read once per server process rather than on every rerun."""
+    return load_config()
+
+
 def initialize_services(config):
-    try:
-        # Initialize services only once
-        if "services_initialized" not in st.session_state:
-            sheets_handler = GoogleSheetsHandler(
-                config["google_sheets"]["credentials_file"]
-            )
-            llm_service = LLMService(config["api_keys"]["groq"])
-            search_service = SearchService(config["api_keys"]["serpapi"])
-
-            st.session_state["sheets_handler"] = sheets_handler
-            st.session_state["llm_service"] = llm_service
-            st.session_state["search_service"] = search_service
-            st.session_state["services_initialized"] = True
-
-        return (
-            st.session_state["sheets_handler"],
-            st.session_state["llm_service"],
-            st.session_state["search_service"],
-        )
-    except Exception as e:
-        st.error(f"Error initializing services: {str(e)}")
-        return None, None, None
+    """Builds the service pool; the search and LLM SDKs are first imported here."""
+    from services.service_pool import create_service_pool
+
+    return create_service_pool(config)
+
+
+@st.cache_resource(show_spinner="Starting search and LLM services...")
+def get_service_pool():
+    """Search and LLM services, rate limits and concurrency limits shared by every session."""
+    return initialize_services(get_config())
+
+
+def current_user():
+    """Who a job counts against: the signed-in email when the deployment has auth, else the browser session."""
+    email = st.experimental_user.get("email")
+    if email and email != PLACEHOLDER_EMAIL:
+        return email
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
+
+
+@st.cache_resource(show_spinner="Connecting to Google Sheets...")
+def get_sheets_handler():
+    from services.sheets_handler import GoogleSheetsHandler
+
+    return GoogleSheetsHandler(get_config()["google_sheets"]["credentials_file"])
 
 
 def extract_sheet_id_from_url(url: str) -> str:
@@ -120,6 +140,445 @@ def convert_df(df):
     return df.to_csv(index=False).encode("utf-8")
 
 
+@st.cache_resource(show_spinner=False)
+def get_job_store():
+    from services.job_store import create_job_store
+
+    return create_job_store(get_config().get("jobs", {}))
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    from services.job_queue import create_job_queue
+
+    return create_job_queue(get_job_store(), get_config().get("queue", {}))
+
+
+def open_sheet_writer(config):
+    sheets_config = config.get("google_sheets", {})
+    return get_sheets_handler().open_result_writer(
+        chunk_size=sheets_config.get("write_chunk_rows", 500),
+        flush_interval=sheets_config.get("write_flush_seconds", 5),
+    )
+
+
+def format_latency(latency):
+    if latency["p50"] is None:
+        return "–"
+    return f"{latency['p50']:.2f}s / {latency['p95']:.2f}s"
+
+
+def live_metrics_text(processed, elapsed):
+    return (
+        f"⚡ {processed / max(elapsed, 1e-9):.2f} entities/s · "
+        f"search p50/p95 {format_latency(metrics.latency('search'))} · "
+        f"LLM p50/p95 {format_latency(metrics.latency('llm'))}"
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_registry():
+    """Background jobs running or paused in this server process, for every session."""
+    from services.background_job import JobRegistry
+
+    return JobRegistry()
+
+
+def start_local_job(config, job_store, job_id):
+    """Runs a stored job on a background thread and keeps its handle in the session.
+
+    A job already running or paused in this process, e.g. started before a
+    browser refresh, is reattached (and resumed) instead of run twice.
+    """
+    running = st.session_state.get("background_job")
+    if running is not None and running.active and running.job_id != job_id:
+        raise Exception("A job is already running in this session; pause or cancel it first")
+    st.session_state.background_job = get_job_registry().run(
+        job_id, lambda: create_background_job(config, job_store, job_id)
+    )
+
+
+def create_background_job(config, job_store, job_id):
+    """Builds and starts a BackgroundJob on the shared services."""
+    from services.background_job import BackgroundJob
+
+    service_pool = get_service_pool()
+    params = job_store.get_job(job_id)["params"]
+    metrics_config = config.get("metrics") or {}
+    tracer = Tracer(metrics_config["trace_path"]) if metrics_config.get("trace_path") else None
+    llm_config = {**config.get("llm", {}), "structured_output": params.get("structured_output", False)}
+    engine = service_pool.create_engine({**config, "llm": llm_config}, tracer)
+
+    def on_close():
+        if tracer is not None:
+            tracer.close()
+        if metrics_config.get("json_path"):
+            metrics.write(metrics_config["json_path"])
+
+    # Incremental output is only complete at the end, so it is exported then
+    sheet_writer = None
+    if params.get("export_option") == "Google Sheets" and not params.get("incremental"):
+        sheet_writer = open_sheet_writer(config)
+    user = current_user()
+    job = BackgroundJob(
+        job_store,
+        job_id,
+        engine,
+        writer=sheet_writer,
+        guard=lambda: service_pool.job(user),
+        on_close=on_close,
+    )
+    try:
+        job.start()
+    except Exception:
+        if sheet_writer is not None:
+            sheet_writer.close()
+        on_close()
+        raise
+    return job
+
+
+def show_background_job(config, job_store):
+    """Progress, Pause / Resume / Cancel and partial export for this session's job.
+
+    While the job runs only this panel is redrawn, every
+    ``jobs.progress_seconds``, instead of the page on every entity.
+    """
+    job = st.session_state.get("background_job")
+    if job is None:
+        return
+    run_every = config.get("jobs", {}).get("progress_seconds", 1) if job.active else None
+    st.fragment(background_job_panel, run_every=run_every)(config, job_store, job, job.active)
+
+
+def background_job_panel(config, job_store, job, was_active):
+    progress = job.progress()
+    if was_active and not job.active:
+        # Redraw the whole page so the panel stops polling
+        st.rerun()
+
+    params = job_store.get_job(job.job_id)["params"]
+    st.subheader(f"⚙️ {params.get('source', 'Job')} · {', '.join(params.get('columns', []))}")
+    st.progress(progress["done"] / max(progress["total"], 1))
+    progress_cols = st.columns([2, 1])
+    count_text = f"{progress['done']}/{progress['total']} entities"
+    if progress["status"] == "running":
+        progress_cols[0].text(f"Processed {progress['entity']}" if progress["entity"] else "Starting...")
+    elif progress["status"] in ("pausing", "cancelling"):
+        progress_cols[0].text("Finishing the entities already running...")
+    elif progress["status"] == "paused":
+        progress_cols[0].info("⏸️ Paused")
+    elif progress["status"] == "cancelled":
+        progress_cols[0].warning(f"⏹️ Cancelled after {count_text}")
+    elif progress["status"] == "failed":
+        progress_cols[0].error(f"❌ Processing error: {progress['error']}")
+    else:
+        progress_cols[0].success("✨ Processing complete!")
+    progress_cols[1].text(f"Progress: {count_text}")
+    if progress["processed"]:
+        st.caption(live_metrics_text(progress["processed"], progress["elapsed"]))
+
+    if job.status == "complete":
+        show_job_results(config, job_store, job)
+        if st.button("✖️ Dismiss"):
+            del st.session_state.background_job
+            st.rerun()
+        return
+
+    control_cols = st.columns(3)
+    if job.status == "running" and control_cols[0].button("⏸️ Pause", use_container_width=True):
+        job.pause()
+        st.rerun()
+    if job.status == "paused" and control_cols[0].button("▶️ Resume", use_container_width=True):
+        try:
+            job.resume()
+        except Exception as e:
+            st.error(f"❌ {str(e)}")
+        else:
+            st.rerun()
+    if job.status in ("running", "pausing", "paused") and control_cols[1].button(
+        "⏹️ Cancel", use_container_width=True
+    ):
+        job.cancel()
+        st.rerun()
+    if job.finished and control_cols[1].button("✖️ Dismiss", use_container_width=True):
+        del st.session_state.background_job
+        st.rerun()
+    show_partial_export(config, job_store, job, control_cols[2])
+
+
+def show_partial_export(config, job_store, job, column):
+    """Exports the rows finished so far, which stay in the job store for a later resume.
+
+    What was exported is kept in session state, so it survives the panel's
+    redraws while the job runs.
+    """
+    from services.job_store import partial_rows
+
+    if job.writer is not None:
+        column.markdown(f"📤 Finished rows are in [Google Sheets]({job.writer.url})")
+        return
+    params = job_store.get_job(job.job_id)["params"]
+    partial = st.session_state.get("partial_export")
+    if partial is not None and partial["job_id"] != job.job_id:
+        partial = None
+    if params.get("export_option") == "Google Sheets":
+        if column.button("📤 Export partial results to Google Sheets", use_container_width=True):
+            with open_sheet_writer(config) as sheet_writer:
+                for row in partial_rows(job_store, job.job_id):
+                    sheet_writer.write(row)
+            partial = st.session_state.partial_export = {"job_id": job.job_id, "url": sheet_writer.url}
+        if partial is not None:
+            st.success(f"✅ Partial results exported to Google Sheets: [Open Sheet]({partial['url']})")
+        return
+    # Built on click rather than on every progress redraw
+    if column.button("📦 Prepare partial CSV", use_container_width=True):
+        rows = partial_rows(job_store, job.job_id)
+        partial = st.session_state.partial_export = {
+            "job_id": job.job_id,
+            "rows": len(rows),
+            "csv": convert_df(results_frame(rows, params)),
+        }
+    if partial is not None:
+        st.download_button(
+            label=f"📥 Download {partial['rows']} finished rows",
+            data=partial["csv"],
+            file_name="partial_results.csv",
+            mime="text/csv",
+        )
+
+
+def show_job_results(config, job_store, job):
+    """Exports a finished local job once, then offers its results on every rerun."""
+    if st.session_state.get("exported_job_id") != job.job_id:
+        sheet_url = job.writer.url if job.writer is not None else None
+        st.session_state.results_df, st.session_state.results_sheet_url = export_results(
+            config, job_store, job.job_id, job.rows, sheet_url
+        )
+        st.session_state.exported_job_id = job.job_id
+    show_run_stats(get_service_pool())
+    show_export(st.session_state.results_df, st.session_state.results_sheet_url)
+
+
+def show_run_stats(service_pool):
+    search_service = service_pool.search_service
+    llm_service = service_pool.llm_service
+
+    rate_text = f"Search rate: {search_service.rate_limiter.effective_rate:.1f}/min"
+    if llm_service.rate_limiter is not None:
+        rate_text += f" · LLM rate: {llm_service.rate_limiter.effective_rate:.1f}/min"
+    st.caption(rate_text)
+
+    cache_stats = llm_service.cache_stats()
+    if cache_stats:
+        st.caption(
+            f"LLM cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits, "
+            f"{cache_stats['misses']} misses "
+            f"({cache_stats['memory_entries']} in memory, {cache_stats['disk_entries']} on disk)"
+        )
+
+    prompt_stats = llm_service.prompt_stats()
+    if prompt_stats["calls"]:
+        st.caption(
+            f"LLM prompts: {prompt_stats['calls']} requests, "
+            f"~{prompt_stats['average_tokens']:.0f} tokens each (max ~{prompt_stats['max_tokens']})"
+        )
+
+    st.download_button(
+        label="📈 Download metrics (Prometheus)",
+        data=metrics.to_prometheus(),
+        file_name="quickdata_metrics.prom",
+        mime="text/plain",
+    )
+
+
+def track_queued_job(config, job_store, job_id):
+    """Submits a job to the worker queue if needed and follows it in this session."""
+    job_queue = get_job_queue()
+    if job_store.get_job(job_id)["status"] != "queued":
+        job_queue.submit(job_id, config.get("queue", {}).get("batch_size", 25))
+    st.session_state.queued_job_id = job_id
+    st.session_state.queued_first_done = None
+
+
+def show_queued_job(config, job_store):
+    """Progress and export of the queued job this session follows.
+
+    Like ``show_background_job``, only this panel is redrawn while workers
+    run the job, every ``queue.poll_seconds``.
+    """
+    job_id = st.session_state.get("queued_job_id")
+    if job_id is None:
+        return
+    job = job_store.get_job(job_id)
+    if job is None:
+        # Discarded from another session
+        del st.session_state.queued_job_id
+        return
+    queued = job["status"] == "queued"
+    run_every = config.get("queue", {}).get("poll_seconds", 2) if queued else None
+    st.fragment(queued_job_panel, run_every=run_every)(config, job_store, job_id, queued)
+
+
+def queued_job_panel(config, job_store, job_id, was_queued):
+    from services.job_store import stored_rows
+
+    job = job_store.get_job(job_id)
+    if was_queued and job["status"] != "queued":
+        # Redraw the whole page so the panel stops polling
+        st.rerun()
+    batches = get_job_queue().progress(job_id)
+
+    st.info("🛰️ Queued for workers; start them with `./quickdata-worker` on any machine sharing the job store")
+    st.progress(job["completed"] / max(job["total"], 1))
+    progress_cols = st.columns([2, 1])
+    progress_cols[1].text(f"Progress: {job['completed']}/{job['total']} entities")
+    # Entities/s since the first one finished, measured across panel redraws
+    now = time.monotonic()
+    first_done = st.session_state.get("queued_first_done")
+    if first_done is None and job["completed"]:
+        first_done = st.session_state.queued_first_done = (job["completed"], now)
+    rate = ""
+    if first_done is not None and now > first_done[1]:
+        rate = f" · {(job['completed'] - first_done[0]) / (now - first_done[1]):.2f} entities/s"
+
+    if job["status"] == "queued":
+        progress_cols[0].text(
+            f"{batches['leased']} batches running, {batches['pending']} waiting, "
+            f"{batches['done']} done{rate}"
+        )
+        if st.button("✖️ Stop following", help="Workers carry on; track the job again from Incomplete Jobs"):
+            del st.session_state.queued_job_id
+            st.rerun()
+        return
+
+    if job["status"] == "failed":
+        progress_cols[0].error(f"❌ {batches['failed']} batches failed; see the worker logs, then retry them")
+        if st.button("🔁 Retry failed batches"):
+            track_queued_job(config, job_store, job_id)
+            st.rerun()
+    else:
+        progress_cols[0].success("✨ Processing complete!")
+        if st.session_state.get("exported_job_id") != job_id:
+            st.session_state.results_df, st.session_state.results_sheet_url = export_results(
+                config, job_store, job_id, stored_rows(job_store, job_id)
+            )
+            st.session_state.exported_job_id = job_id
+        show_export(st.session_state.results_df, st.session_state.results_sheet_url)
+    if st.button("✖️ Dismiss", key="dismiss_queued_job"):
+        del st.session_state.queued_job_id
+        st.rerun()
+
+
+def run_and_export(config, job_store, job_id):
+    """Runs a stored job, in the background here or on queue workers, and exports as it asked."""
+    params = job_store.get_job(job_id)["params"]
+    if params.get("backend") == "queue":
+        track_queued_job(config, job_store, job_id)
+    else:
+        start_local_job(config, job_store, job_id)
+    # The job's panel sits at the top of the page
+    st.rerun()
+
+
+def results_frame(rows, params):
+    import pandas as pd
+
+    from services.structured_output import structured_frame
+
+    if params.get("structured_output"):
+        return structured_frame(rows, params["prompts"])
+    return pd.DataFrame(rows)
+
+
+def export_results(config, job_store, job_id, rows, sheet_url=None):
+    """Merges incremental results and writes them to Google Sheets if the job asked.
+
+    ``sheet_url`` is the sheet rows were already streamed to, if any.
+    Returns the results frame and the sheet's URL.
+    """
+    from services.incremental import IncrementalRun
+
+    params = job_store.get_job(job_id)["params"]
+    if params.get("incremental"):
+        rows = IncrementalRun.from_state(job_store, params["incremental"]).merge(rows)
+    if params.get("export_option") == "Google Sheets" and sheet_url is None:
+        with open_sheet_writer(config) as sheet_writer:
+            for row in rows:
+                sheet_writer.write(row)
+        sheet_url = sheet_writer.url
+    return results_frame(rows, params), sheet_url
+
+
+def show_export(results_df, sheet_url=None):
+    if sheet_url is not None:
+        st.success(f"✅ Results exported to Google Sheets: [Open Sheet]({sheet_url})")
+    else:
+        st.download_button(
+            label="📥 Download CSV",
+            data=convert_df(results_df),
+            file_name="results.csv",
+            mime="text/csv",
+        )
+
+
+def show_incomplete_jobs(config, job_store):
+    import pandas as pd
+
+    incomplete = job_store.incomplete_jobs()
+    background_job = st.session_state.get("background_job")
+    # Jobs followed by this session have their own panels
+    followed = {st.session_state.get("queued_job_id")}
+    if background_job is not None:
+        followed.add(background_job.job_id)
+    incomplete = [job for job in incomplete if job["id"] not in followed]
+    if not incomplete:
+        return
+
+    with st.expander(f"⏸️ Incomplete Jobs ({len(incomplete)})", expanded=True):
+        for job in incomplete:
+            params = job["params"]
+            col1, col2, col3 = st.columns([4, 1, 1])
+            with col1:
+                st.markdown(
+                    f"**{params.get('source', 'Unknown source')}** · {', '.join(params['columns'])} · "
+                    f"rows {params['start_row']}–{params['end_row']}  \n"
+                    f"{job['completed']}/{job['total']} entities done"
+                    f"{' by queue workers' if job['status'] == 'queued' else ''}"
+                    f"{' · ' + job['status'] if job['status'] in ('paused', 'cancelled') else ''} · "
+                    f"last update {pd.Timestamp(job['updated_at'], unit='s'):%Y-%m-%d %H:%M}"
+                )
+            with col2:
+                live_job = get_job_registry().get(job["id"])
+                if job["status"] == "queued":
+                    label = "📡 Track"
+                elif live_job is not None and live_job.active:
+                    # Still running, e.g. from before a refresh; follow it rather than start it again
+                    label = "📡 Follow"
+                else:
+                    label = "▶️ Resume"
+                if st.button(label, key=f"resume_{job['id']}"):
+                    st.session_state.resume_job_id = job["id"]
+            with col3:
+                # A running job must be cancelled from its panel before its results go
+                discard_disabled = live_job is not None and live_job.active
+                if st.button("🗑️ Discard", key=f"discard_{job['id']}", disabled=discard_disabled):
+                    if params.get("backend") == "queue":
+                        get_job_queue().cancel(job["id"])
+                    if live_job is not None:
+                        live_job.cancel()
+                    job_store.delete_job(job["id"])
+                    st.rerun()
+
+    job_id = st.session_state.pop("resume_job_id", None)
+    if job_id:
+        try:
+            run_and_export(config, job_store, job_id)
+        except Exception as e:
+            st.error(f"❌ Processing error: {str(e)}")
+            st.exception(e)
+
+
 def main():
     try:
         set_custom_theme()
@@ -156,16 +615,20 @@ def main():
             """)
             
         elif page == "Data Processing":
+            import pandas as pd
+
+            from services.csv_handler import count_csv_rows, iter_csv_chunks
+            from services.enrichment import plan_tasks
+            from services.incremental import IncrementalRun
+
             st.title("Data Processing")
-            
-            config = load_config()
-            services = initialize_services(config)
-            
-            if not all(services):
-                st.error("⚠️ Service initialization failed. Check configuration.")
-                return
-                
-            sheets_handler, llm_service, search_service = services
+
+            # Search, LLM and Sheets clients are only built once a job or sheet needs them
+            config = get_config()
+            job_store = get_job_store()
+            show_incomplete_jobs(config, job_store)
+            show_background_job(config, job_store)
+            show_queued_job(config, job_store)
             
             # Store loaded data in session state to persist between page switches
             if "loaded_df" not in st.session_state:
@@ -177,7 +640,13 @@ def main():
                 if data_source == "CSV Upload":
                     uploaded_file = st.file_uploader("Upload CSV file", type="csv", help="Upload your CSV file containing the entities")
                     if uploaded_file:
-                        st.session_state.loaded_df = pd.read_csv(uploaded_file)
+                        # Keep only a preview in memory; processing streams the file in chunks
+                        if st.session_state.get("csv_file_id") != uploaded_file.file_id:
+                            st.session_state.loaded_df = pd.read_csv(uploaded_file, nrows=PREVIEW_ROWS)
+                            st.session_state.total_rows = count_csv_rows(uploaded_file)
+                            st.session_state.csv_file = uploaded_file
+                            st.session_state.csv_file_id = uploaded_file.file_id
+                            st.session_state.data_source_name = uploaded_file.name
                         st.success("✅ CSV file loaded successfully!")
                 else:
                     sheet_url = st.text_input("Enter Google Sheet URL", help="Paste the full URL of your Google Sheet")
@@ -185,19 +654,24 @@ def main():
                         try:
                             with st.spinner("📊 Loading sheet data..."):
                                 sheet_id = extract_sheet_id_from_url(sheet_url)
-                                st.session_state.loaded_df = sheets_handler.get_sheet_data(sheet_id)
+                                st.session_state.loaded_df = get_sheets_handler().get_sheet_data(sheet_id)
+                                st.session_state.total_rows = len(st.session_state.loaded_df)
+                                st.session_state.csv_file = None
+                                st.session_state.csv_file_id = None
+                                st.session_state.data_source_name = f"Google Sheet {sheet_id}"
                             st.success("✅ Sheet data loaded successfully!")
                         except Exception as e:
                             st.error(f"❌ Error: {str(e)}")
             
             if st.session_state.loaded_df is not None:
                 df = st.session_state.loaded_df  # Use the persisted dataframe
+                total_rows = st.session_state.total_rows
                 with st.expander("", expanded=True):
                     # Show data summary
                     st.markdown("### 📊 Data Summary")
                     col1, col2 = st.columns(2)
                     with col1:
-                        st.info(f"Total Rows: {len(df)}")
+                        st.info(f"Total Rows: {total_rows}")
                     with col2:
                         st.info(f"Total Columns: {len(df.columns)}")
                     
@@ -223,7 +697,6 @@ def main():
                         st.markdown("### 📏 Data Range")
                         col1, col2 = st.columns(2)
                         with col1:
-                            total_rows = len(df)
                             start_row, end_row = st.slider(
                                 "Select row range",
                                 0, total_rows, (0, total_rows),
@@ -269,64 +742,100 @@ def main():
                             horizontal=True
                         )
 
+                        structured_output = st.checkbox(
+                            "🧩 One column per prompt",
+                            value=config.get("llm", {}).get("structured_output", False),
+                            help="Ask the model for JSON and put each answer in its own typed column",
+                        )
+                        incremental_mode = st.checkbox(
+                            "♻️ Only process new or changed rows",
+                            help="Reuse results from earlier runs on this source for rows whose "
+                            "selected values and prompts have not changed",
+                        )
+                        key_column = None
+                        if incremental_mode:
+                            key_choice = st.selectbox(
+                                "Identify rows by",
+                                ["Row number"] + list(df.columns),
+                                help="Pick a unique ID column if rows can move or be deleted",
+                            )
+                            key_column = None if key_choice == "Row number" else key_choice
+
+                        backend = st.radio(
+                            "⚙️ Run on",
+                            ["This session", "Worker queue"],
+                            horizontal=True,
+                            help="The worker queue splits the job into batches for `./quickdata-worker` "
+                            "processes, which can run on several machines",
+                        )
+
                         # Process button with count summary
-                        total_to_process = len(df.iloc[start_row:end_row]) * len(selected_columns)
+                        total_to_process = (end_row - start_row) * len(selected_columns)
                         st.info(f"🎯 Will process {total_to_process} items")
                         
                         if st.button("🚀 Start Processing", type="primary", use_container_width=True):
                             try:
-                                with st.spinner("Processing data..."):
-                                    progress_bar = st.progress(0)
-                                    progress_cols = st.columns([2, 1])
-                                    status_text = progress_cols[0].empty()
-                                    count_text = progress_cols[1].empty()
-                                    
-                                    results = []
+                                source_name = st.session_state.get("data_source_name", data_source)
+                                incremental = None
+                                read_columns = list(selected_columns)
+                                if incremental_mode:
+                                    incremental = IncrementalRun(
+                                        job_store,
+                                        source_name,
+                                        selected_columns,
+                                        prompts,
+                                        prompt_template,
+                                        key_column,
+                                        structured_output,
+                                        whole_source=(start_row, end_row) == (0, total_rows),
+                                    )
+                                    read_columns = incremental.read_columns
+
+                                csv_file = st.session_state.get("csv_file")
+                                if csv_file is not None:
+                                    selected_data = iter_csv_chunks(
+                                        csv_file, read_columns, start_row, end_row
+                                    )
+                                else:
                                     selected_data = df.iloc[start_row:end_row]
-                                    total = len(selected_data) * len(selected_columns)
-                                    current = 0
-                                    
-                                    for column in selected_columns:
-                                        for entity in selected_data[column].dropna():
-                                            status_text.text(f"Processing {entity}...")
-                                            count_text.text(f"Progress: {current + 1}/{total} entities")
-                                            progress_bar.progress((current + 1) / total)
-                                            
-                                            query = prompt_template.replace("{entity}", str(entity))
-                                            search_results = search_service.search(query)
-                                            extracted_info = llm_service.extract_multiple_information(
-                                                search_results, prompts
-                                            )
-                                            
-                                            # Add single result with all sources
-                                            sources = [result["url"] for result in search_results]
-                                            results.append({
-                                                "Column": column,
-                                                "Entity": entity,
-                                                "Sources": " | ".join(sources),
-                                                "Extracted Information": extracted_info["result"]
-                                            })
-                                            current += 1
-                                    
-                                    progress_bar.progress(100)
-                                    status_text.success("✨ Processing complete!")
-                                    count_text.text(f"Completed: {total}/{total} entities")
-                                    
-                                    # Store results in session state
-                                    st.session_state.results_df = pd.DataFrame(results)
-                                    
-                                    # Export results based on user selection
-                                    results_df = pd.DataFrame(results)
-                                    if export_option == "Google Sheets":
-                                        sheet_url = sheets_handler.export_results(results_df)
-                                        st.success(f"✅ Results exported to Google Sheets: [Open Sheet]({sheet_url})")
-                                    else:
-                                        st.download_button(
-                                            label="📥 Download CSV",
-                                            data=convert_df(results_df),
-                                            file_name="results.csv",
-                                            mime="text/csv",
-                                        )
+                                if incremental is not None:
+                                    selected_data = incremental.filter_changed(selected_data)
+                                dedupe_config = config.get("processing", {}).get("dedupe", {})
+                                plan = plan_tasks(
+                                    selected_data,
+                                    selected_columns,
+                                    prompt_template,
+                                    dedupe=dedupe_config.get("enabled", True),
+                                    casefold=dedupe_config.get("casefold", True),
+                                    collapse_whitespace=dedupe_config.get("collapse_whitespace", True),
+                                )
+                                if incremental is not None:
+                                    st.info(
+                                        f"♻️ Enriching {incremental.changed_rows} new or changed rows; "
+                                        f"reusing earlier results for {incremental.reused_rows} unchanged rows"
+                                    )
+                                if plan.calls_saved:
+                                    st.info(
+                                        f"♻️ {len(plan.cells)} cells contain {len(plan.tasks)} unique entities; "
+                                        f"saving {plan.calls_saved} search and LLM calls"
+                                    )
+
+                                job_id = job_store.create_job(
+                                    {
+                                        "source": source_name,
+                                        "columns": list(selected_columns),
+                                        "start_row": start_row,
+                                        "end_row": end_row,
+                                        "query_template": prompt_template,
+                                        "prompts": prompts,
+                                        "export_option": export_option,
+                                        "structured_output": structured_output,
+                                        "incremental": incremental.state() if incremental else None,
+                                        "backend": "queue" if backend == "Worker queue" else "local",
+                                    },
+                                    plan,
+                                )
+                                run_and_export(config, job_store, job_id)
 
                             except Exception as e:
                                 st.error(f"❌ Processing error: {str(e)}")
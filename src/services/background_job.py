@@ -0,0 +1,208 @@
+import threading
+import time
+from contextlib import ExitStack, closing, nullcontext
+from typing import Any, Callable, ContextManager, Dict, List, Optional
+
+from services.enrichment import EnrichmentEngine
+from services.job_store import JobStore, iter_job
+
+
+class JobInterrupted(Exception):
+    """Stops a background job's engine when it is paused or cancelled."""
+
+
+class BackgroundJob:
+    """Runs a stored job on a background thread that can be paused, resumed or cancelled.
+
+    The dashboard keeps the handle in session state and reads ``progress()``
+    on a timer instead of redrawing the page for every entity. Pausing and
+    cancelling stop the engine: nothing new starts, and entities already
+    running are recorded before the thread ends. Every result is in the job
+    store, so ``resume()`` carries on where the job stopped, and
+    ``partial_rows`` exports what is there at any time.
+
+    Finished rows go to ``writer`` (e.g. a SheetResultWriter) in sheet order,
+    each once, and are kept in ``rows``. ``guard()`` is entered for every
+    run, e.g. a ServicePool job slot, so a paused job holds none. The writer
+    is flushed when the job pauses, and closed (with ``on_close`` called)
+    when it completes, fails or is cancelled.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        job_id: str,
+        engine: EnrichmentEngine,
+        writer=None,
+        guard: Optional[Callable[[], ContextManager]] = None,
+        on_close: Optional[Callable[[], None]] = None,
+    ):
+        self.store = store
+        self.job_id = job_id
+        self.engine = engine
+        self.writer = writer
+        self.guard = guard or nullcontext
+        self.on_close = on_close
+        self.rows: List[Dict[str, Any]] = []
+        self.status = "new"
+        self.error: Optional[str] = None
+        job = store.get_job(job_id)
+        self.done = job["completed"]
+        self.total = job["total"]
+        self.entity: Optional[str] = None
+        # Entities finished and seconds spent running, over all runs of this handle
+        self.processed = 0
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self._stop: Optional[str] = None
+        self._started = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("running", "pausing", "cancelling")
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("complete", "cancelled", "failed")
+
+    def start(self):
+        """Starts (or restarts) the job; the guard's errors are raised here."""
+        with self.lock:
+            if self.active or self.finished:
+                raise Exception(f"Job {self.job_id} is already {self.status}")
+            stack = ExitStack()
+            stack.enter_context(self.guard())
+            self.status = "running"
+            self._started = time.monotonic()
+            self.thread = threading.Thread(target=self._run, args=(stack,), daemon=True)
+            self.thread.start()
+
+    def pause(self):
+        with self.lock:
+            if self.status == "running":
+                self._stop = "paused"
+                self.status = "pausing"
+
+    def resume(self):
+        if self.status == "paused":
+            self.start()
+
+    def cancel(self):
+        with self.lock:
+            if self.status in ("running", "pausing"):
+                self._stop = "cancelled"
+                self.status = "cancelling"
+                return
+            if self.status not in ("new", "paused"):
+                return
+            self.status = "cancelled"
+        self.store.set_status(self.job_id, "cancelled")
+        self._close()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the current run to stop; False if it is still going after ``timeout``."""
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.active
+
+    def progress(self) -> Dict[str, Any]:
+        with self.lock:
+            elapsed = self.elapsed + (time.monotonic() - self._started if self.active else 0)
+            return {
+                "status": self.status,
+                "done": self.done,
+                "total": self.total,
+                "entity": self.entity,
+                "processed": self.processed,
+                "elapsed": elapsed,
+                "error": self.error,
+            }
+
+    def _check(self):
+        if self._stop is not None:
+            raise JobInterrupted(self._stop)
+
+    def _progress(self, done: int, total: int, row: Dict[str, Any]):
+        with self.lock:
+            self.done = done
+            self.total = total
+            self.entity = row["Entity"]
+            self.processed += 1
+        self._check()
+
+    def _run(self, stack: ExitStack):
+        try:
+            with stack, closing(iter_job(self.engine, self.store, self.job_id, self._progress)) as rows:
+                for position, row in enumerate(rows):
+                    # A resumed run starts over from the first row; skip those already written
+                    if position >= len(self.rows):
+                        self.rows.append(row)
+                        if self.writer is not None:
+                            self.writer.write(row)
+                    self._check()
+            status = "complete"
+        except JobInterrupted as e:
+            status = str(e)
+            self.store.set_status(self.job_id, status)
+            # Entities drained while stopping were recorded without progress callbacks
+            with self.lock:
+                self.done = self.store.get_job(self.job_id)["completed"]
+        except Exception as e:
+            status = "failed"
+            self.error = str(e)
+
+        try:
+            if status != "paused":
+                self._close()
+            elif hasattr(self.writer, "flush"):
+                # Buffered rows would otherwise be missing from the sheet for the whole pause
+                self.writer.flush()
+        except Exception as e:
+            status = "failed"
+            self.error = str(e)
+        with self.lock:
+            self.elapsed += time.monotonic() - self._started
+            self._stop = None
+            self.status = status
+
+    def _close(self):
+        try:
+            if self.writer is not None:
+                self.writer.close()
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+
+class JobRegistry:
+    """The live BackgroundJob of each job, shared by every session of a server process.
+
+    A run outlives the session that started it (a browser refresh, another
+    tab), so a job is reattached to its live handle instead of being run a
+    second time over the same entities.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, BackgroundJob] = {}
+        self.lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[BackgroundJob]:
+        """The job's handle while it is running or paused, else None."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        return job if job is not None and not job.finished else None
+
+    def run(self, job_id: str, start: Callable[[], BackgroundJob]) -> BackgroundJob:
+        """Resumes the job's live handle, or registers the one ``start()`` creates and starts."""
+        with self.lock:
+            for other_id in [other_id for other_id, job in self.jobs.items() if job.finished]:
+                del self.jobs[other_id]
+            job = self.jobs.get(job_id)
+            if job is None:
+                job = start()
+                self.jobs[job_id] = job
+            elif job.status == "paused":
+                job.resume()
+            return job
@@ -1,4 +1,13 @@
+from typing import Dict, Iterator, List, Optional
+
 import pandas as pd
+import pyarrow.csv as pa_csv
+
+# Bytes of CSV text parsed per chunk; peak memory of a streaming read scales with this
+DEFAULT_BLOCK_SIZE = 1 << 20
+# Quoted cells may span lines (addresses, notes), as pd.read_csv allows
+PARSE_OPTIONS = pa_csv.ParseOptions(newlines_in_values=True)
+
 
 def read_csv(file_path):
     """Reads a CSV file and returns a DataFrame."""
@@ -9,10 +18,81 @@ def read_csv(file_path):
         print(f"Error reading CSV file: {e}")
         return None
 
+
+def _rewind(file):
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+
+def read_csv_header(file) -> List[str]:
+    """Returns the column names, parsing only the first block of the file."""
+    _rewind(file)
+    reader = pa_csv.open_csv(
+        file, read_options=pa_csv.ReadOptions(block_size=1 << 16), parse_options=PARSE_OPTIONS
+    )
+    names = reader.schema.names
+    reader.close()
+    _rewind(file)
+    return names
+
+
+def count_csv_rows(file, block_size: int = DEFAULT_BLOCK_SIZE) -> int:
+    """Counts data rows without keeping more than one block in memory."""
+    first_column = read_csv_header(file)[0]
+    return sum(
+        len(chunk) for chunk in iter_csv_chunks(file, [first_column], block_size=block_size)
+    )
+
+
+def iter_csv_chunks(
+    file,
+    columns: Optional[List[str]] = None,
+    start_row: int = 0,
+    end_row: Optional[int] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    dtype: Optional[Dict[str, str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Streams a CSV file as DataFrames of roughly ``block_size`` bytes each.
+
+    Only ``columns`` are converted, and rows before ``start_row`` are skipped
+    by the parser. Selected columns default to the ``string`` type so that
+    entity columns parse the same way in every chunk; ``dtype`` overrides
+    this per column with pyarrow type names (``"int64"``, ``"float64"`` ...).
+    Each chunk is indexed by its position in the file, like ``pd.read_csv``.
+    """
+    _rewind(file)
+    column_types = {column: "string" for column in columns or []}
+    column_types.update(dtype or {})
+    reader = pa_csv.open_csv(
+        file,
+        read_options=pa_csv.ReadOptions(block_size=block_size, skip_rows_after_names=start_row),
+        parse_options=PARSE_OPTIONS,
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types=column_types,
+            strings_can_be_null=True,
+        ),
+    )
+    offset = start_row
+    try:
+        for batch in reader:
+            if end_row is not None and offset + batch.num_rows > end_row:
+                batch = batch.slice(0, max(end_row - offset, 0))
+            if batch.num_rows:
+                chunk = batch.to_pandas()
+                chunk.index = pd.RangeIndex(offset, offset + batch.num_rows)
+                yield chunk
+            offset += batch.num_rows
+            if end_row is not None and offset >= end_row:
+                break
+    finally:
+        reader.close()
+
+
 def process_csv_data(data):
     """Processes the DataFrame and returns cleaned data."""
     if data is not None:
         # Example processing: drop rows with any missing values
         cleaned_data = data.dropna()
         return cleaned_data
-    return None
\ No newline at end of file
+    return None
@@ -0,0 +1,448 @@
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import pandas as pd
+
+from services.structured_output import parse_answers, structured_row
+from utils.metrics import EntityTrace, Tracer, active_trace, metrics
+
+
+@dataclass
+class EnrichmentTask:
+    column: str
+    entity: Any
+    query: str
+    row: Any = None
+
+
+@dataclass
+class EnrichmentPlan:
+    """Unique tasks to run and, for every non-empty cell, which task answers it."""
+
+    tasks: List[EnrichmentTask]
+    cells: List[EnrichmentTask]
+    assignments: List[int]
+
+    @property
+    def calls_saved(self) -> int:
+        return len(self.cells) - len(self.tasks)
+
+    def fan_out(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies one result row per unique task onto every originating cell.
+
+        ``rows`` must be in task order; the output is in sheet order.
+        """
+        return list(self.iter_fan_out(rows))
+
+    def iter_fan_out(self, rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Streaming ``fan_out``: yields each cell as soon as its task's row arrives.
+
+        Tasks are first occurrences in sheet order, so every cell can be
+        emitted right after the task it maps to, without waiting for the rest.
+        """
+        received: List[Dict[str, Any]] = []
+        cells = iter(zip(self.cells, self.assignments))
+        pending = next(cells, None)
+        for row in rows:
+            received.append(row)
+            while pending is not None and pending[1] < len(received):
+                cell, task_index = pending
+                yield {**received[task_index], "Row": cell.row, "Column": cell.column, "Entity": cell.entity}
+                pending = next(cells, None)
+
+
+def normalize_entity(
+    entity: Any, casefold: bool = True, collapse_whitespace: bool = True
+) -> str:
+    text = str(entity)
+    text = " ".join(text.split()) if collapse_whitespace else text.strip()
+    return text.casefold() if casefold else text
+
+
+def build_tasks(
+    data: Union[pd.DataFrame, Iterable[pd.DataFrame]], columns: List[str], query_template: str
+) -> List[EnrichmentTask]:
+    """Builds one task per non-empty cell, column by column, in sheet order.
+
+    ``data`` may also be an iterable of row chunks, e.g. from
+    ``csv_handler.iter_csv_chunks``, so the whole file is never loaded.
+    """
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    by_column: Dict[str, List[EnrichmentTask]] = {column: [] for column in columns}
+    for chunk in chunks:
+        for column in columns:
+            for row, entity in chunk[column].dropna().items():
+                query = query_template.replace("{entity}", str(entity))
+                by_column[column].append(
+                    EnrichmentTask(column=column, entity=entity, query=query, row=row)
+                )
+    return [task for column in columns for task in by_column[column]]
+
+
+def plan_tasks(
+    data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    columns: List[str],
+    query_template: str,
+    dedupe: bool = True,
+    casefold: bool = True,
+    collapse_whitespace: bool = True,
+) -> EnrichmentPlan:
+    """Collapses cells holding the same entity so each is searched only once.
+
+    Entities are compared after optional case and whitespace folding; the
+    first occurrence decides the query text.
+    """
+    cells = build_tasks(data, columns, query_template)
+    if not dedupe:
+        return EnrichmentPlan(tasks=cells, cells=cells, assignments=list(range(len(cells))))
+
+    unique: Dict[str, int] = {}
+    tasks: List[EnrichmentTask] = []
+    assignments: List[int] = []
+    for cell in cells:
+        key = normalize_entity(cell.entity, casefold, collapse_whitespace)
+        if key not in unique:
+            unique[key] = len(tasks)
+            tasks.append(cell)
+        assignments.append(unique[key])
+    return EnrichmentPlan(tasks=tasks, cells=cells, assignments=assignments)
+
+
+def create_engine(
+    search_service, llm_service, config: Dict, tracer: Optional[Tracer] = None, **overrides
+) -> "EnrichmentEngine":
+    """Builds an EnrichmentEngine from the ``processing`` and ``search`` config.
+
+    ``overrides`` are EnrichmentEngine arguments that take precedence over the
+    config, e.g. the shared slots and per-user limits of a ServicePool.
+    """
+    processing_config = config.get("processing", {})
+    options = {
+        "max_workers": processing_config.get("max_workers", 8),
+        "search_concurrency": processing_config.get("search_concurrency", 4),
+        "llm_concurrency": processing_config.get("llm_concurrency", 4),
+        "max_results": config.get("search", {}).get("max_results", 3),
+        "llm_batch_size": processing_config.get("llm_batch_size", 1),
+        "llm_batch_token_budget": processing_config.get("llm_batch_token_budget", 6000),
+        "structured_output": config.get("llm", {}).get("structured_output", False),
+        "tracer": tracer,
+        "prefetch": processing_config.get("prefetch", 0),
+    }
+    options.update(overrides)
+    return EnrichmentEngine(search_service, llm_service, **options)
+
+
+class EnrichmentEngine:
+    """Runs the search -> extract pipeline for many entities on a worker pool.
+
+    Search and LLM calls get their own concurrency limits so a slow stage
+    cannot monopolise the pool. The search service's RateLimiter is still
+    honoured because every search goes through ``SearchService.search``.
+
+    With ``llm_batch_size`` > 1, searched entities are grouped and sent to
+    ``LLMService.extract_batch`` so several share one completion. Searches
+    run at most one batch (plus ``search_concurrency`` and ``prefetch``)
+    ahead of extraction, so each batch starts as soon as it fills.
+
+    With ``structured_output``, rows get one column per prompt instead of a
+    single "Extracted Information" text (see ``services.structured_output``).
+
+    With a ``tracer``, every unbatched entity gets a trace line with the time
+    spent searching, waiting for rate limits and extracting.
+
+    ``search_slots`` and ``llm_slots`` replace the engine's own concurrency
+    limits with semaphores shared by several engines (see ``ServicePool``).
+
+    With ``prefetch`` > 0 (and no LLM batching), search and extraction run as
+    two pipelined stages: searches run up to ``prefetch`` entities ahead of
+    the LLM, and their results wait in a bounded queue until a completion
+    slot frees up. A full queue stops new searches.
+
+    When an unbatched run is closed early, nothing new starts and entities
+    already running are still recorded through ``on_result``.
+    """
+
+    def __init__(
+        self,
+        search_service,
+        llm_service,
+        max_workers: int = 8,
+        search_concurrency: int = 4,
+        llm_concurrency: int = 4,
+        max_results: int = 3,
+        llm_batch_size: int = 1,
+        llm_batch_token_budget: int = 6000,
+        structured_output: bool = False,
+        tracer: Optional[Tracer] = None,
+        search_slots: Optional[threading.Semaphore] = None,
+        llm_slots: Optional[threading.Semaphore] = None,
+        prefetch: int = 0,
+    ):
+        if min(max_workers, search_concurrency, llm_concurrency, llm_batch_size) < 1:
+            raise ValueError("Worker, concurrency and batch limits must be at least 1")
+        if prefetch < 0:
+            raise ValueError("prefetch cannot be negative")
+        self.search_service = search_service
+        self.llm_service = llm_service
+        self.max_workers = max_workers
+        self.search_concurrency = search_concurrency
+        self.llm_concurrency = llm_concurrency
+        self.prefetch = prefetch
+        self.max_results = max_results
+        self.llm_batch_size = llm_batch_size
+        self.llm_batch_token_budget = llm_batch_token_budget
+        self.structured_output = structured_output
+        self.tracer = tracer
+        self._search_slots = search_slots or threading.BoundedSemaphore(search_concurrency)
+        self._llm_slots = llm_slots or threading.BoundedSemaphore(llm_concurrency)
+
+    def _search(self, task: EnrichmentTask) -> list:
+        with self._search_slots:
+            return self.search_service.search(task.query, max_results=self.max_results)
+
+    def process(self, task: EnrichmentTask, prompts: List[str]) -> Dict[str, Any]:
+        trace = self.tracer.trace(task.entity, task.column) if self.tracer else nullcontext()
+        with trace:
+            return self._process(task, prompts)
+
+    def _process(self, task: EnrichmentTask, prompts: List[str]) -> Dict[str, Any]:
+        try:
+            search_results = self._search(task)
+        except Exception as e:
+            return self._result(task, [], self._error(e), prompts)
+        return self._extract(task, search_results, prompts)
+
+    def _extract(self, task: EnrichmentTask, search_results: list, prompts: List[str]) -> Dict[str, Any]:
+        with self._llm_slots:
+            if self.structured_output:
+                extracted_info = self.llm_service.extract_structured(search_results, prompts)
+            else:
+                extracted_info = self.llm_service.extract_multiple_information(
+                    search_results, prompts
+                )
+        return self._result(task, search_results, extracted_info, prompts)
+
+    def run(
+        self,
+        tasks: List[EnrichmentTask],
+        prompts: List[str],
+        on_progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yields result rows in task order while work completes out of order.
+
+        ``on_result(index, row)`` and then ``on_progress(completed, total, row)``
+        fire once per finished task, as soon as it finishes, on the caller's
+        thread, so it is safe to update Streamlit widgets from them.
+        """
+        total = len(tasks)
+        if total == 0:
+            return
+
+        finished: Dict[int, Dict[str, Any]] = {}
+        next_index = 0
+        completed = 0
+
+        def drained(index: int, row: Dict[str, Any]):
+            metrics.inc("quickdata_entities_total")
+            if on_result:
+                on_result(index, row)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if self.llm_batch_size > 1:
+                completions = self._complete_in_batches(executor, tasks, prompts)
+            elif self.prefetch:
+                completions = self._complete_pipelined(executor, tasks, prompts, drained)
+            else:
+                completions = self._complete_individually(executor, tasks, prompts, drained)
+            try:
+                for index, row in completions:
+                    finished[index] = row
+                    completed += 1
+                    metrics.inc("quickdata_entities_total")
+                    if on_result:
+                        on_result(index, row)
+                    if on_progress:
+                        on_progress(completed, total, row)
+
+                    while next_index in finished:
+                        yield finished.pop(next_index)
+                        next_index += 1
+            finally:
+                # Stops (and unless batched, drains) the stages before the pool shuts down
+                completions.close()
+
+    def _complete_individually(self, executor, tasks, prompts, drained):
+        futures = {
+            executor.submit(self.process, task, prompts): index
+            for index, task in enumerate(tasks)
+        }
+        yielded = set()
+        try:
+            for future in as_completed(futures):
+                yielded.add(future)
+                yield futures[future], future.result()
+        finally:
+            # Cancel everything queued first, then keep the rows of entities
+            # already running: the pool waits for them anyway
+            running = [
+                (future, index)
+                for future, index in futures.items()
+                if future not in yielded and not future.cancel()
+            ]
+            for future, index in running:
+                try:
+                    row = future.result()
+                except Exception:
+                    continue
+                drained(index, row)
+
+    def _traced(self, trace: Optional[EntityTrace], function, *args):
+        with active_trace(trace):
+            return function(*args)
+
+    def _finish_trace(self, trace: Optional[EntityTrace]):
+        if trace is not None:
+            self.tracer.write(trace)
+
+    def _complete_pipelined(self, executor, tasks, prompts, drained):
+        pending = deque(range(len(tasks)))
+        # Searched entities waiting for a completion slot: the queue between the stages
+        ready = deque()
+        searching = {}
+        extracting = {}
+        try:
+            while pending or ready or searching or extracting:
+                # Extraction goes first: it empties the queue and makes room for searches
+                while ready and len(extracting) < self.llm_concurrency and len(searching) + len(extracting) < self.max_workers:
+                    index, search_results, trace = ready.popleft()
+                    future = executor.submit(self._traced, trace, self._extract, tasks[index], search_results, prompts)
+                    extracting[future] = (index, trace)
+                while (
+                    pending
+                    and len(searching) < self.search_concurrency
+                    and len(searching) + len(ready) < self.prefetch
+                    and len(searching) + len(extracting) < self.max_workers
+                ):
+                    index = pending.popleft()
+                    trace = EntityTrace(tasks[index].entity, tasks[index].column) if self.tracer else None
+                    searching[executor.submit(self._traced, trace, self._search, tasks[index])] = (index, trace)
+
+                done, _ = wait([*searching, *extracting], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in searching:
+                        index, trace = searching.pop(future)
+                        try:
+                            ready.append((index, future.result(), trace))
+                        except Exception as e:
+                            self._finish_trace(trace)
+                            yield index, self._result(tasks[index], [], self._error(e), prompts)
+                    else:
+                        index, trace = extracting.pop(future)
+                        self._finish_trace(trace)
+                        yield index, future.result()
+        finally:
+            # Cancelled or failed: start nothing new, and keep completions that were already paid for
+            for future in searching:
+                future.cancel()
+            running = [(future, job) for future, job in extracting.items() if not future.cancel()]
+            for future, (index, trace) in running:
+                try:
+                    row = future.result()
+                except Exception:
+                    continue
+                self._finish_trace(trace)
+                drained(index, row)
+
+    def _complete_in_batches(self, executor, tasks, prompts):
+        pending = deque(range(len(tasks)))
+        # Searched entities not yet in a batch; a filling batch never idles the search slots
+        ready = []
+        lookahead = self.llm_batch_size + self.search_concurrency + self.prefetch
+        searching = {}
+        extracting = {}
+        try:
+            while pending or ready or searching or extracting:
+                # Flush full batches, and the remainder once every search is in
+                while (
+                    (len(ready) >= self.llm_batch_size or (ready and not pending and not searching))
+                    and len(extracting) < self.llm_concurrency
+                    and len(searching) + len(extracting) < self.max_workers
+                ):
+                    batch = ready[: self.llm_batch_size]
+                    ready = ready[self.llm_batch_size:]
+                    extracting[executor.submit(self._extract_batch, tasks, batch, prompts)] = batch
+                while (
+                    pending
+                    and len(searching) < self.search_concurrency
+                    and len(searching) + len(ready) < lookahead
+                    and len(searching) + len(extracting) < self.max_workers
+                ):
+                    index = pending.popleft()
+                    searching[executor.submit(self._search, tasks[index])] = index
+
+                done, _ = wait([*searching, *extracting], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in searching:
+                        index = searching.pop(future)
+                        try:
+                            ready.append((index, future.result()))
+                        except Exception as e:
+                            yield index, self._result(tasks[index], [], self._error(e), prompts)
+                    else:
+                        extracting.pop(future)
+                        yield from future.result()
+        finally:
+            for future in [*searching, *extracting]:
+                future.cancel()
+
+    def _extract_batch(self, tasks, batch, prompts):
+        with self._llm_slots:
+            extracted = self.llm_service.extract_batch(
+                [(tasks[index].entity, search_results) for index, search_results in batch],
+                prompts,
+                max_entities=self.llm_batch_size,
+                max_prompt_tokens=self.llm_batch_token_budget,
+            )
+        return [
+            (index, self._result(tasks[index], search_results, info, prompts))
+            for (index, search_results), info in zip(batch, extracted)
+        ]
+
+    @staticmethod
+    def _error(error: Exception) -> Dict[str, Any]:
+        return {"result": str(error), "status": "error"}
+
+    def _result(
+        self, task: EnrichmentTask, search_results: list, info: Dict[str, Any], prompts: List[str]
+    ) -> Dict[str, Any]:
+        if not self.structured_output:
+            return self._row(task, search_results, info["result"])
+
+        base = self._row(task, search_results)
+        if info.get("status") == "error":
+            return structured_row(base, prompts, None, info["result"])
+        answers = info.get("answers")
+        if answers is None:
+            # Batched and cached text answers are numbered lists
+            answers, _ = parse_answers(info["result"], len(prompts))
+        if answers is None:
+            return structured_row(base, prompts, None, f"Unparseable answer: {info['result']}")
+        return structured_row(base, prompts, answers)
+
+    @staticmethod
+    def _row(task: EnrichmentTask, search_results: list, extracted: Optional[str] = None) -> Dict[str, Any]:
+        sources = [result["url"] for result in search_results]
+        row = {
+            "Row": task.row,
+            "Column": task.column,
+            "Entity": task.entity,
+            "Sources": " | ".join(sources),
+        }
+        if extracted is not None:
+            row["Extracted Information"] = extracted
+        return row
@@ -0,0 +1,156 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import pandas as pd
+
+from services.job_store import JobStore
+
+
+def settings_fingerprint(
+    columns: List[str], prompts: List[str], query_template: str, structured_output: bool = False
+) -> str:
+    """Changes whenever the columns, prompts, query template or output shape of a run change."""
+    payload = [list(columns), list(prompts), query_template]
+    if structured_output:
+        payload.append("structured")
+    payload = json.dumps(payload)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint_rows(chunk: pd.DataFrame, columns: List[str], settings: str) -> List[str]:
+    """One fingerprint per row of ``chunk``, hashed with pandas' vectorised row hashing.
+
+    Values are compared as text and missing cells as "", so a number read as
+    ``5`` from one source and ``"5"`` from another still matches.
+    """
+    values = chunk[columns].astype(object)
+    values = values.where(values.notna(), "").astype(str)
+    hashes = pd.util.hash_pandas_object(values, index=False)
+    return [f"{settings}-{int(value):016x}" for value in hashes]
+
+
+class IncrementalRun:
+    """Enriches only rows that are new or changed since the last run of a source.
+
+    ``filter_changed`` fingerprints the selected columns of every row (plus
+    the prompt set) and passes on only rows whose fingerprint differs from
+    the stored one. ``merge`` then combines the new results with the saved
+    results of unchanged rows and stores the outcome for the next run.
+
+    Rows are identified by ``key_column`` if given, otherwise by row number,
+    which is right for sheets that only ever grow at the bottom.
+
+    Saved results of rows outside the selection are kept, so narrowing the
+    row range and widening it again reuses them. Only a ``whole_source``
+    run, which sees every row, forgets rows that are gone.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        source: str,
+        columns: List[str],
+        prompts: List[str],
+        query_template: str,
+        key_column: Optional[str] = None,
+        structured_output: bool = False,
+        whole_source: bool = False,
+    ):
+        self.store = store
+        self.source = source
+        self.columns = list(columns)
+        self.prompts = list(prompts)
+        self.query_template = query_template
+        self.key_column = key_column
+        self.structured_output = structured_output
+        self.whole_source = whole_source
+        self.settings = settings_fingerprint(self.columns, self.prompts, query_template, structured_output)
+        # row key -> [row label, fingerprint, changed], in sheet order
+        self.rows: Dict[str, List[Any]] = {}
+
+    @property
+    def read_columns(self) -> List[str]:
+        """Columns a chunked reader must load for this run."""
+        if self.key_column and self.key_column not in self.columns:
+            return self.columns + [self.key_column]
+        return self.columns
+
+    @property
+    def changed_rows(self) -> int:
+        return sum(1 for _, _, changed in self.rows.values() if changed)
+
+    @property
+    def reused_rows(self) -> int:
+        return len(self.rows) - self.changed_rows
+
+    def filter_changed(
+        self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]]
+    ) -> Iterator[pd.DataFrame]:
+        previous = self.store.row_fingerprints(self.source)
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        for chunk in chunks:
+            fingerprints = fingerprint_rows(chunk, self.columns, self.settings)
+            keys = chunk[self.key_column] if self.key_column else chunk.index
+            changed = []
+            for label, key, fingerprint in zip(chunk.index, keys, fingerprints):
+                key = str(key)
+                if key in self.rows:
+                    raise Exception(f"Key column {self.key_column} has duplicate value: {key}")
+                is_changed = previous.get(key) != fingerprint
+                self.rows[key] = [label, fingerprint, is_changed]
+                changed.append(is_changed)
+            if any(changed):
+                yield chunk[changed]
+
+    def merge(self, new_cells: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns results for every current row, in sheet order, and saves them."""
+        by_label: Dict[Any, List[Dict[str, Any]]] = {}
+        for cell in new_cells:
+            by_label.setdefault(cell["Row"], []).append(cell)
+        previous = self.store.row_cells(self.source)
+
+        merged = []
+        saved = {}
+        for key, (label, fingerprint, changed) in self.rows.items():
+            if changed:
+                cells = by_label.get(label, [])
+                saved[key] = (fingerprint, cells)
+            else:
+                cells = [{**cell, "Row": label} for cell in previous.get(key, [])]
+            merged.extend(cells)
+        self.store.save_row_results(self.source, saved, keep=list(self.rows) if self.whole_source else None)
+
+        # Same column-by-column order as a full run
+        column_order = {column: i for i, column in enumerate(self.columns)}
+        row_order = {label: i for i, (label, _, _) in enumerate(self.rows.values())}
+        merged.sort(key=lambda cell: (column_order[cell["Column"]], row_order[cell["Row"]]))
+        return merged
+
+    def state(self) -> Dict[str, Any]:
+        """JSON-serialisable state, so a resumed job can still merge its results."""
+        return {
+            "source": self.source,
+            "columns": self.columns,
+            "prompts": self.prompts,
+            "query_template": self.query_template,
+            "key_column": self.key_column,
+            "structured_output": self.structured_output,
+            "whole_source": self.whole_source,
+            "rows": [[key, *row] for key, row in self.rows.items()],
+        }
+
+    @classmethod
+    def from_state(cls, store: JobStore, state: Dict[str, Any]) -> "IncrementalRun":
+        run = cls(
+            store,
+            state["source"],
+            state["columns"],
+            state["prompts"],
+            state["query_template"],
+            state.get("key_column"),
+            state.get("structured_output", False),
+            state.get("whole_source", False),
+        )
+        run.rows = {key: [label, fingerprint, changed] for key, label, fingerprint, changed in state["rows"]}
+        return run
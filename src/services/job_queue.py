@@ -0,0 +1,282 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from services.enrichment import EnrichmentEngine, EnrichmentPlan
+from services.job_store import JobStore
+from utils.helpers import handle_error
+
+
+def create_job_queue(store: JobStore, queue_config: Optional[Dict]) -> "JobQueue":
+    """Builds the queue described by the ``queue`` config on the job store's file."""
+    queue_config = queue_config or {}
+    return JobQueue(
+        store,
+        lease_seconds=queue_config.get("lease_seconds", 120),
+        max_attempts=queue_config.get("max_attempts", 3),
+    )
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+@dataclass
+class Lease:
+    job_id: str
+    batch: int
+    task_indexes: List[int]
+    attempts: int
+
+
+class JobQueue:
+    """Splits stored jobs into entity batches that worker processes lease.
+
+    The queue lives next to the jobs in the job store's SQLite file, so any
+    process (or host, over a shared filesystem) that can open it can work.
+    A lease lasts ``lease_seconds`` and is renewed by the worker's heartbeat;
+    when a worker dies its batch becomes visible again once the lease runs
+    out. Batches that fail ``max_attempts`` times are marked failed, and so
+    is their job. Results go straight to the job store, so a re-leased batch
+    skips the entities its previous worker already finished.
+    """
+
+    def __init__(self, store: JobStore, lease_seconds: float = 120, max_attempts: int = 3):
+        if lease_seconds <= 0 or max_attempts < 1:
+            raise ValueError("lease_seconds must be positive and max_attempts at least 1")
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = Lock()
+        self.conn = sqlite3.connect(store.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue_batches (
+                job_id TEXT NOT NULL,
+                batch INTEGER NOT NULL,
+                task_indexes TEXT NOT NULL,
+                status TEXT NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                PRIMARY KEY (job_id, batch)
+            )
+            """
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock up front, so two workers cannot lease the same batch
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def submit(self, job_id: str, batch_size: int = 25) -> int:
+        """Queues every entity of the job without a result; returns the number of batches."""
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        plan = self.store.load_plan(job_id)
+        done = self.store.completed_results(job_id)
+        remaining = [index for index in range(len(plan.tasks)) if index not in done]
+        batches = [remaining[i : i + batch_size] for i in range(0, len(remaining), batch_size)]
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM queue_batches WHERE job_id = ?", (job_id,))
+            conn.executemany(
+                "INSERT INTO queue_batches (job_id, batch, task_indexes, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, batch, json.dumps(indexes)) for batch, indexes in enumerate(batches)],
+            )
+        self.store.set_status(job_id, "queued" if batches else "complete")
+        return len(batches)
+
+    def lease(self, worker_id: str) -> Optional[Lease]:
+        """Claims the oldest pending (or abandoned) batch, or returns None if there is none."""
+        failed_jobs = set()
+        lease = None
+        with self._transaction() as conn:
+            now = time.time()
+            while lease is None:
+                row = conn.execute(
+                    "SELECT job_id, batch, task_indexes, attempts FROM queue_batches "
+                    "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY rowid LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    break
+                job_id, batch, task_indexes, attempts = row
+                if attempts >= self.max_attempts:
+                    # Its last worker vanished without releasing it
+                    conn.execute(
+                        "UPDATE queue_batches SET status = 'failed', lease_owner = NULL, "
+                        "error = 'lease expired' WHERE job_id = ? AND batch = ?",
+                        (job_id, batch),
+                    )
+                    failed_jobs.add(job_id)
+                    continue
+                conn.execute(
+                    "UPDATE queue_batches SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE job_id = ? AND batch = ?",
+                    (worker_id, now + self.lease_seconds, job_id, batch),
+                )
+                lease = Lease(job_id, batch, json.loads(task_indexes), attempts + 1)
+        for job_id in failed_jobs:
+            self.store.set_status(job_id, "failed")
+        return lease
+
+    def heartbeat(self, lease: Lease, worker_id: str) -> bool:
+        """Extends the lease; False means it expired and another worker may have it."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE queue_batches SET lease_expires = ? "
+                "WHERE job_id = ? AND batch = ? AND status = 'leased' AND lease_owner = ?",
+                (time.time() + self.lease_seconds, lease.job_id, lease.batch, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, lease: Lease, worker_id: str):
+        """Marks the batch done, and the job complete once all of its batches are."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE queue_batches SET status = 'done', lease_owner = NULL, error = NULL "
+                "WHERE job_id = ? AND batch = ? AND lease_owner = ?",
+                (lease.job_id, lease.batch, worker_id),
+            )
+            batches, done = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(status = 'done'), 0) FROM queue_batches WHERE job_id = ?",
+                (lease.job_id,),
+            ).fetchone()
+        # A cancelled job has no batches left and stays as it was
+        if batches and done == batches:
+            self.store.set_status(lease.job_id, "complete")
+
+    def release(self, lease: Lease, worker_id: str, error: Optional[str] = None):
+        """Hands the batch back for another attempt, or fails it after ``max_attempts``."""
+        failed = lease.attempts >= self.max_attempts
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE queue_batches SET status = ?, lease_owner = NULL, lease_expires = NULL, error = ? "
+                "WHERE job_id = ? AND batch = ? AND lease_owner = ?",
+                ("failed" if failed else "pending", error, lease.job_id, lease.batch, worker_id),
+            )
+        if failed:
+            self.store.set_status(lease.job_id, "failed")
+
+    def cancel(self, job_id: str):
+        """Drops the job's batches; workers holding one finish it but lease no more."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM queue_batches WHERE job_id = ?", (job_id,))
+
+    def progress(self, job_id: str) -> Dict[str, int]:
+        """Batches of the job by status."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM queue_batches WHERE job_id = ? GROUP BY status",
+                (job_id,),
+            ).fetchall()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class QueueWorker:
+    """Leases batches from a JobQueue and runs them through the enrichment engine.
+
+    ``make_engine(params)`` builds the engine for a job from its stored
+    parameters. Every result is recorded in the job store as it finishes,
+    and the lease is renewed in the background while the batch runs.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        queue: JobQueue,
+        make_engine: Callable[[Dict[str, Any]], EnrichmentEngine],
+        worker_id: Optional[str] = None,
+        on_batch: Optional[Callable[[Lease, int], None]] = None,
+    ):
+        self.store = store
+        self.queue = queue
+        self.make_engine = make_engine
+        self.worker_id = worker_id or default_worker_id()
+        self.on_batch = on_batch
+        self.processed = 0
+        self._plans: Dict[str, EnrichmentPlan] = {}
+
+    def _plan(self, job_id: str) -> EnrichmentPlan:
+        if job_id not in self._plans:
+            self._plans[job_id] = self.store.load_plan(job_id)
+        return self._plans[job_id]
+
+    def _keep_alive(self, lease: Lease, stop: Event):
+        while not stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(lease, self.worker_id):
+                return
+
+    def run_once(self) -> bool:
+        """Processes one batch; returns False if the queue had nothing to lease."""
+        lease = self.queue.lease(self.worker_id)
+        if lease is None:
+            return False
+
+        stop = Event()
+        heartbeat = Thread(target=self._keep_alive, args=(lease, stop), daemon=True)
+        heartbeat.start()
+        try:
+            job = self.store.get_job(lease.job_id)
+            plan = self._plan(lease.job_id)
+            done = self.store.completed_results(lease.job_id)
+            indexes = [index for index in lease.task_indexes if index not in done]
+
+            def record(position: int, row: Dict[str, Any]):
+                self.store.record_result(lease.job_id, indexes[position], row)
+
+            engine = self.make_engine(job["params"])
+            for _ in engine.run([plan.tasks[index] for index in indexes], job["params"]["prompts"], on_result=record):
+                pass
+        except Exception as e:
+            self.queue.release(lease, self.worker_id, str(e))
+            raise
+        except BaseException:
+            self.queue.release(lease, self.worker_id, "worker stopped")
+            raise
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        self.queue.complete(lease, self.worker_id)
+        self.processed += len(indexes)
+        if self.on_batch:
+            self.on_batch(lease, len(indexes))
+        return True
+
+    def run(self, poll_seconds: float = 2, idle_exit: Optional[float] = None):
+        """Works until interrupted, or until the queue has been empty for ``idle_exit`` seconds."""
+        idle_since = time.monotonic()
+        while True:
+            try:
+                if self.run_once():
+                    idle_since = time.monotonic()
+                    continue
+            except Exception as e:
+                # The batch went back to the queue; keep serving the others
+                handle_error(e, stage="worker")
+                idle_since = time.monotonic()
+            if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                return
+            time.sleep(poll_seconds)
@@ -0,0 +1,297 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from services.enrichment import EnrichmentEngine, EnrichmentPlan, EnrichmentTask
+
+
+def _json_default(value: Any):
+    # numpy / pandas scalars coming out of DataFrames
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default)
+
+
+def create_job_store(jobs_config: Dict) -> "JobStore":
+    """Builds the job store described by the ``jobs`` config."""
+    return JobStore(os.path.join(jobs_config.get("directory", ".cache"), "jobs.sqlite3"))
+
+
+class JobStore:
+    """SQLite record of enrichment jobs and every result they have produced.
+
+    A job stores its parameters and its full plan, so it can be resumed
+    without the original upload. Results are written as each entity
+    finishes; resuming skips those entities.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Workers in other processes share the file (see services.job_queue)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                job_id TEXT NOT NULL,
+                task_index INTEGER NOT NULL,
+                row TEXT NOT NULL,
+                PRIMARY KEY (job_id, task_index)
+            );
+            CREATE TABLE IF NOT EXISTS row_results (
+                source TEXT NOT NULL,
+                row_key TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                cells TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source, row_key)
+            );
+            """
+        )
+        self.conn.commit()
+
+    def create_job(self, params: Dict[str, Any], plan: EnrichmentPlan) -> str:
+        job_id = uuid.uuid4().hex
+        plan_data = {
+            "tasks": [vars(task) for task in plan.tasks],
+            "cells": [vars(cell) for cell in plan.cells],
+            "assignments": plan.assignments,
+        }
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, params, plan, total, created_at, updated_at) "
+                "VALUES (?, 'running', ?, ?, ?, ?, ?)",
+                (job_id, _dumps(params), _dumps(plan_data), len(plan.tasks), now, now),
+            )
+            self.conn.commit()
+        return job_id
+
+    def load_plan(self, job_id: str) -> EnrichmentPlan:
+        with self.lock:
+            row = self.conn.execute("SELECT plan FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown job: {job_id}")
+        data = json.loads(row[0])
+        return EnrichmentPlan(
+            tasks=[EnrichmentTask(**task) for task in data["tasks"]],
+            cells=[EnrichmentTask(**cell) for cell in data["cells"]],
+            assignments=data["assignments"],
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        jobs = self._select("WHERE jobs.id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        if status is None:
+            return self._select("", ())
+        return self._select("WHERE jobs.status = ?", (status,))
+
+    def incomplete_jobs(self) -> List[Dict[str, Any]]:
+        return self._select("WHERE jobs.status != 'complete'", ())
+
+    def _select(self, where: str, args: tuple) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT jobs.id, jobs.status, jobs.params, jobs.total, jobs.created_at, "
+                "jobs.updated_at, COUNT(results.task_index) FROM jobs "
+                "LEFT JOIN results ON results.job_id = jobs.id "
+                f"{where} GROUP BY jobs.id ORDER BY jobs.created_at DESC",
+                args,
+            ).fetchall()
+        return [
+            {
+                "id": job_id,
+                "status": status,
+                "params": json.loads(params),
+                "total": total,
+                "completed": completed,
+                "created_at": created_at,
+                "updated_at": updated_at,
+            }
+            for job_id, status, params, total, created_at, updated_at, completed in rows
+        ]
+
+    def record_result(self, job_id: str, task_index: int, row: Dict[str, Any]):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (job_id, task_index, row) VALUES (?, ?, ?)",
+                (job_id, task_index, _dumps(row)),
+            )
+            self.conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id)
+            )
+            self.conn.commit()
+
+    def completed_results(self, job_id: str) -> Dict[int, Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT task_index, row FROM results WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {task_index: json.loads(row) for task_index, row in rows}
+
+    def set_status(self, job_id: str, status: str):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                (status, time.time(), job_id),
+            )
+            self.conn.commit()
+
+    def delete_job(self, job_id: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+            self.conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self.conn.commit()
+
+    def row_fingerprints(self, source: str) -> Dict[str, str]:
+        """Fingerprint of every source row whose results were saved by a previous run."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT row_key, fingerprint FROM row_results WHERE source = ?", (source,)
+            ).fetchall()
+        return dict(rows)
+
+    def row_cells(self, source: str) -> Dict[str, List[Dict[str, Any]]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT row_key, cells FROM row_results WHERE source = ?", (source,)
+            ).fetchall()
+        return {row_key: json.loads(cells) for row_key, cells in rows}
+
+    def save_row_results(
+        self,
+        source: str,
+        results: Dict[str, Tuple[str, List[Dict[str, Any]]]],
+        keep: Optional[List[str]] = None,
+    ):
+        """Stores ``{row_key: (fingerprint, cells)}``; with ``keep``, forgets every other row."""
+        now = time.time()
+        with self.lock:
+            if keep is not None:
+                existing = {
+                    row_key
+                    for (row_key,) in self.conn.execute(
+                        "SELECT row_key FROM row_results WHERE source = ?", (source,)
+                    )
+                }
+                self.conn.executemany(
+                    "DELETE FROM row_results WHERE source = ? AND row_key = ?",
+                    [(source, row_key) for row_key in existing - set(keep)],
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO row_results (source, row_key, fingerprint, cells, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (source, row_key, fingerprint, _dumps(cells), now)
+                    for row_key, (fingerprint, cells) in results.items()
+                ],
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def iter_job(
+    engine: EnrichmentEngine,
+    store: JobStore,
+    job_id: str,
+    on_progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Runs (or resumes) a stored job, yielding fanned-out rows in sheet order.
+
+    Entities already recorded for the job are not processed again. Each new
+    result is persisted the moment it finishes, so a crash loses at most the
+    entities that were in flight. Rows are yielded as soon as every earlier
+    cell is known, so they can be exported while the job runs.
+    """
+    job = store.get_job(job_id)
+    if job is None:
+        raise KeyError(f"Unknown job: {job_id}")
+    plan = store.load_plan(job_id)
+    done = store.completed_results(job_id)
+    remaining = [index for index in range(len(plan.tasks)) if index not in done]
+
+    store.set_status(job_id, "running")
+
+    def record(position: int, row: Dict[str, Any]):
+        store.record_result(job_id, remaining[position], row)
+
+    def progress(completed: int, total: int, row: Dict[str, Any]):
+        if on_progress:
+            on_progress(len(done) + completed, len(plan.tasks), row)
+
+    def task_rows():
+        new_rows = engine.run(
+            [plan.tasks[index] for index in remaining],
+            job["params"]["prompts"],
+            on_progress=progress,
+            on_result=record,
+        )
+        for index in range(len(plan.tasks)):
+            yield done[index] if index in done else next(new_rows)
+        # Let the engine shut its pool down
+        next(new_rows, None)
+
+    try:
+        yield from plan.iter_fan_out(task_rows())
+    except BaseException:
+        store.set_status(job_id, "failed")
+        raise
+
+    store.set_status(job_id, "complete")
+
+
+def run_job(
+    engine: EnrichmentEngine,
+    store: JobStore,
+    job_id: str,
+    on_progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Runs (or resumes) a stored job and returns all of its fanned-out rows."""
+    return list(iter_job(engine, store, job_id, on_progress))
+
+
+def stored_rows(store: JobStore, job_id: str) -> List[Dict[str, Any]]:
+    """Fanned-out rows of a job whose entities were all recorded, e.g. by queue workers."""
+    plan = store.load_plan(job_id)
+    done = store.completed_results(job_id)
+    missing = len(plan.tasks) - len(done)
+    if missing:
+        raise Exception(f"Job {job_id} still has {missing} entities without results")
+    return plan.fan_out([done[index] for index in range(len(plan.tasks))])
+
+
+def partial_rows(store: JobStore, job_id: str) -> List[Dict[str, Any]]:
+    """Fanned-out rows, in sheet order, of the cells whose entity already has a result."""
+    plan = store.load_plan(job_id)
+    done = store.completed_results(job_id)
+    return [
+        {**done[task_index], "Row": cell.row, "Column": cell.column, "Entity": cell.entity}
+        for cell, task_index in zip(plan.cells, plan.assignments)
+        if task_index in done
+    ]
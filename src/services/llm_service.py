@@ -1,11 +1,294 @@
-from typing import Any, Dict
+import asyncio
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
 import groq
-from tenacity import retry, stop_after_attempt, wait_exponential
+import httpx
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+    wait_random_exponential,
+)
+
+from services.prompt_builder import (
+    PromptBuilder,
+    PromptStats,
+    create_prompt_builder,
+    estimate_tokens,
+)
+from services.structured_output import (
+    REPAIR_PROMPT,
+    STRUCTURED_SYSTEM_PROMPT,
+    format_answer,
+    parse_answers,
+)
+from utils.disk_cache import DiskCache, TieredCache
+from utils.helpers import handle_error
+from utils.metrics import metrics
+from utils.quota_ledger import QuotaLedger
+from utils.rate_limiter import RateLimiter, create_rate_limiter
+
+
+def create_llm_cache(llm_config: Dict) -> Optional[TieredCache]:
+    """Builds the response cache described by the ``llm.cache`` config."""
+    cache_config = llm_config.get("cache") or {}
+    if not cache_config.get("enabled", False):
+        return None
+    disk = None
+    if cache_config.get("persist", True):
+        disk = DiskCache(
+            os.path.join(cache_config.get("directory", ".cache"), "llm.sqlite3"),
+            ttl=cache_config.get("ttl_seconds"),
+            max_entries=cache_config.get("max_disk_entries"),
+        )
+    return TieredCache(cache_config.get("max_memory_entries", 1024), disk)
+
+
+def create_llm_service(
+    api_key: str, llm_config: Dict, quota_ledger: Optional[QuotaLedger] = None
+) -> "LLMService":
+    """Builds an LLMService with the cache and rate limit from the ``llm`` config.
+
+    With a ``quota_ledger`` the Groq rate limit is shared with other processes.
+    """
+    rate_limiter = None
+    if "rate_limit" in llm_config:
+        rate_limiter = create_rate_limiter(
+            llm_config["rate_limit"],
+            llm_config.get("rate_limit_period", 60),
+            llm_config.get("adaptive_rate"),
+            quota_ledger,
+            "groq",
+        )
+    return LLMService(
+        api_key,
+        cache=create_llm_cache(llm_config),
+        rate_limiter=rate_limiter,
+        prompt_builder=create_prompt_builder(llm_config),
+        max_connections=llm_config.get("max_connections"),
+    )
+
+
+EXTRACT_SYSTEM_PROMPT = """Extract the requested information from the search results. 
+            If the information is not found, return "Not found". Be precise and concise."""
+
+EXTRACT_MULTIPLE_SYSTEM_PROMPT = """Extract multiple pieces of information from the search results. 
+            For each prompt, provide a separate answer. If information is not found, return "Not found"."""
+
+EXTRACT_BATCH_SYSTEM_PROMPT = """Extract information about several entities from their search results.
+Answer every prompt for every entity, using only that entity's search results; {entity} in a prompt means the entity itself.
+If information is not found, answer "Not found".
+Reply with a single JSON object and nothing else, mapping each entity number to a list with one answer string per prompt, e.g. {"1": ["answer 1", "answer 2"]}."""
+
+# Failures worth another attempt; anything else (bad request, auth) is final
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.APIConnectionError,
+    groq.InternalServerError,
+)
+
+
+def build_multiple_prompt(formatted_results: str, prompt_templates: list) -> str:
+    # The instructions travel once, as the system message
+    prompts_text = "\n".join([f"{i+1}. {p}" for i, p in enumerate(prompt_templates)])
+    return f"Search results:\n{formatted_results}\n\nExtract:\n{prompts_text}"
+
+
+def build_batch_block(number: int, entity: Any, formatted_results: str) -> str:
+    return f"### Entity {number}: {entity}\nSearch results:\n{formatted_results}"
+
+
+def build_batch_prompt(blocks: Sequence[str], prompt_templates: list) -> str:
+    prompts_text = "\n".join([f"{i+1}. {p}" for i, p in enumerate(prompt_templates)])
+    return "\n\n".join(blocks) + f"\n\nPrompts:\n{prompts_text}"
+
+
+def parse_batch_response(text: str, count: int, prompt_count: int) -> Dict[int, List[str]]:
+    """Returns answers per entity number (1-based); entities with bad answers are omitted."""
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
 
-class LLMService:
-    def __init__(self, api_key: str, model: str = "mixtral-8x7b-32768"):
+    answers = {}
+    for number in range(1, count + 1):
+        value = data.get(str(number))
+        if isinstance(value, str) and prompt_count == 1:
+            value = [value]
+        if isinstance(value, list) and len(value) == prompt_count:
+            answers[number] = [str(answer) for answer in value]
+    return answers
+
+
+def format_answers(answers: List[str]) -> str:
+    return "\n".join(f"{i+1}. {answer}" for i, answer in enumerate(answers))
+
+
+class _BaseLLMService:
+    def __init__(
+        self,
+        model: str,
+        cache: Optional[TieredCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        prompt_builder: Optional[PromptBuilder] = None,
+    ):
         self.model = model
-        self.client = groq.Groq(api_key=api_key)
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        self.prompt_sizes = PromptStats()
+
+    def _cache_key(
+        self, system_prompt: str, formatted_results: str, prompt_templates: List[str]
+    ) -> str:
+        payload = json.dumps(
+            [self.model, system_prompt, formatted_results, prompt_templates]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cached(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if cache_key is None:
+            return None
+        try:
+            cached = self.cache.get(cache_key)
+        except Exception as e:
+            # e.g. "database is locked" with many workers; ask the model as if it missed
+            handle_error(e, stage="llm_cache")
+            cached = None
+        metrics.cache_result("llm", cached is not None)
+        return dict(cached) if cached is not None else None
+
+    def _messages(self, system_prompt: str, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _success(self, response, cache_key: Optional[str]) -> Dict[str, Any]:
+        result = {"result": response.choices[0].message.content, "status": "success"}
+        self._store(cache_key, result)
+        return result
+
+    def _store(self, cache_key: Optional[str], result: Dict[str, Any]):
+        if cache_key is None:
+            return
+        try:
+            self.cache.set(cache_key, result)
+        except Exception as e:
+            # The completion is paid for; losing the cache entry must not fail it
+            handle_error(e, stage="llm_cache")
+
+    def _key_for(
+        self, system_prompt: str, formatted_results: str, prompt_templates: List[str]
+    ) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self._cache_key(system_prompt, formatted_results, prompt_templates)
+
+    @staticmethod
+    def _record_usage(response):
+        usage = getattr(response, "usage", None)
+        for kind in ("prompt", "completion"):
+            tokens = getattr(usage, f"{kind}_tokens", None)
+            if isinstance(tokens, int):
+                metrics.inc("quickdata_llm_tokens_total", tokens, kind=kind)
+        return response
+
+    def _observe_throttle(self, error: groq.RateLimitError):
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(429, error.response.headers)
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self.cache.stats() if self.cache is not None else {}
+
+    def prompt_stats(self) -> Dict[str, float]:
+        """Estimated prompt tokens over every completion request sent so far."""
+        return self.prompt_sizes.as_dict()
+
+
+class LLMService(_BaseLLMService):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "mixtral-8x7b-32768",
+        cache: Optional[TieredCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_attempts: int = 3,
+        prompt_builder: Optional[PromptBuilder] = None,
+        max_connections: Optional[int] = None,
+        max_backoff: float = 10.0,
+    ):
+        super().__init__(model, cache, rate_limiter, prompt_builder)
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        client_options = {}
+        if max_connections is not None:
+            # Caps the sockets every thread using this service shares; same timeouts as the SDK
+            client_options["http_client"] = httpx.Client(
+                timeout=httpx.Timeout(60.0, connect=5.0),
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            )
+        if rate_limiter is None:
+            self.client = groq.Groq(api_key=api_key, **client_options)
+        else:
+            # Retries go through _create, paced by the limiter and backoff instead of the SDK
+            self.client = groq.Groq(api_key=api_key, max_retries=0, **client_options)
+
+    def _create(self, messages: List[Dict[str, str]]):
+        self.prompt_sizes.record(messages)
+        if self.rate_limiter is None:
+            with metrics.track("llm"):
+                response = self.client.chat.completions.create(model=self.model, messages=messages)
+            return self._record_usage(response)
+
+        for attempt in Retrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_random_exponential(multiplier=0.5, max=self.max_backoff),
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            reraise=True,
+        ):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1:
+                    metrics.inc("quickdata_retries_total", stage="llm")
+                with metrics.timer("quickdata_rate_limit_wait_seconds", stage="llm"):
+                    self.rate_limiter.wait()
+                try:
+                    with metrics.track("llm"):
+                        raw = self.client.chat.completions.with_raw_response.create(
+                            model=self.model, messages=messages
+                        )
+                except groq.RateLimitError as e:
+                    self._observe_throttle(e)
+                    raise
+                self.rate_limiter.observe(raw.status_code, raw.headers)
+                return self._record_usage(raw.parse())
+
+    def _complete(
+        self,
+        system_prompt: str,
+        formatted_results: str,
+        prompt_templates: List[str],
+        prompt: str,
+    ) -> Dict[str, Any]:
+        cache_key = self._key_for(system_prompt, formatted_results, prompt_templates)
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
+
+        response = self._create(self._messages(system_prompt, prompt))
+        return self._success(response, cache_key)
 
     @retry(
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
@@ -14,24 +297,14 @@ class LLMService:
         self, search_results: list, prompt_template: str
     ) -> Dict[str, Any]:
         try:
-            formatted_results = "\n".join(
-                [f"URL: {r['url']}\nContent: {r['snippet']}" for r in search_results]
-            )
-
-            system_prompt = """Extract the requested information from the search results. 
-            If the information is not found, return "Not found". Be precise and concise."""
+            formatted_results = self.prompt_builder.format_results(search_results)
+            system_prompt = EXTRACT_SYSTEM_PROMPT
 
-            prompt = f"{system_prompt}\n\nSearch results:\n{formatted_results}\n\nExtract: {prompt_template}"
+            prompt = f"Search results:\n{formatted_results}\n\nExtract: {prompt_template}"
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ]
+            return self._complete(
+                system_prompt, formatted_results, [prompt_template], prompt
             )
-
-            return {"result": response.choices[0].message.content, "status": "success"}
         except Exception as e:
             return {"result": str(e), "status": "error"}
 
@@ -39,24 +312,225 @@ class LLMService:
         self, search_results: list, prompt_templates: list
     ) -> Dict[str, Any]:
         try:
-            formatted_results = "\n".join(
-                [f"URL: {r['url']}\nContent: {r['snippet']}" for r in search_results]
+            formatted_results = self.prompt_builder.format_results(search_results)
+            prompt = build_multiple_prompt(formatted_results, prompt_templates)
+
+            return self._complete(
+                EXTRACT_MULTIPLE_SYSTEM_PROMPT,
+                formatted_results,
+                list(prompt_templates),
+                prompt,
             )
+        except Exception as e:
+            return {"result": str(e), "status": "error", "error_type": type(e).__name__}
 
-            system_prompt = """Extract multiple pieces of information from the search results. 
-            For each prompt, provide a separate answer. If information is not found, return "Not found"."""
+    def extract_structured(
+        self, search_results: list, prompt_templates: list
+    ) -> Dict[str, Any]:
+        """Like ``extract_multiple_information``, with one typed answer per prompt.
 
-            prompts_text = "\n".join([f"{i+1}. {p}" for i, p in enumerate(prompt_templates)])
-            prompt = f"{system_prompt}\n\nSearch results:\n{formatted_results}\n\nExtract:\n{prompts_text}"
+        The model is asked for JSON keyed by prompt number; ``answers`` holds
+        the validated values in prompt order. Replies that need fixing are
+        repaired locally by ``parse_answers``; the model is only asked again
+        when nothing usable can be read from the reply.
+        """
+        try:
+            formatted_results = self.prompt_builder.format_results(search_results)
+            cache_key = self._key_for(
+                STRUCTURED_SYSTEM_PROMPT, formatted_results, list(prompt_templates)
+            )
+            cached = self._cached(cache_key)
+            if cached is not None:
+                return cached
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
+            messages = self._messages(
+                STRUCTURED_SYSTEM_PROMPT, build_multiple_prompt(formatted_results, prompt_templates)
+            )
+            text = self._create(messages).choices[0].message.content
+            answers, parsed = parse_answers(text, len(prompt_templates))
+            if answers is None:
+                messages += [
+                    {"role": "assistant", "content": text or ""},
+                    {"role": "user", "content": REPAIR_PROMPT},
                 ]
+                text = self._create(messages).choices[0].message.content
+                answers, parsed = parse_answers(text, len(prompt_templates))
+            if answers is None:
+                return {"result": text, "status": "error", "error_type": "InvalidJSON"}
+
+            result = {
+                "result": format_answers([format_answer(answer) for answer in answers]),
+                "answers": answers,
+                "parsed": parsed,
+                "status": "success",
+            }
+            self._store(cache_key, result)
+            return result
+        except Exception as e:
+            return {"result": str(e), "status": "error", "error_type": type(e).__name__}
+
+    def extract_batch(
+        self,
+        items: Sequence[Tuple[Any, list]],
+        prompt_templates: list,
+        max_entities: int = 8,
+        max_prompt_tokens: int = 6000,
+    ) -> List[Dict[str, Any]]:
+        """Extracts ``prompt_templates`` for many ``(entity, search_results)`` pairs.
+
+        Entities are packed into as few completions as the ``max_entities`` and
+        ``max_prompt_tokens`` limits allow, and the model answers in JSON keyed
+        by entity number. Entities whose answers can't be parsed are retried
+        one at a time with ``extract_multiple_information``. Results are in
+        input order.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        pending = []
+        for index, (entity, search_results) in enumerate(items):
+            formatted_results = self.prompt_builder.format_results(search_results)
+            # The entity is part of its batch block, so it is part of the key
+            cache_key = self._key_for(
+                EXTRACT_BATCH_SYSTEM_PROMPT, f"{entity}\n{formatted_results}", list(prompt_templates)
             )
+            results[index] = self._cached(cache_key)
+            if results[index] is None:
+                pending.append((index, entity, formatted_results, cache_key))
+
+        overhead = estimate_tokens(EXTRACT_BATCH_SYSTEM_PROMPT + build_batch_prompt([], prompt_templates))
+        batch, batch_tokens = [], overhead
+        for item in pending:
+            tokens = estimate_tokens(build_batch_block(len(batch) + 1, item[1], item[2]))
+            if batch and (len(batch) >= max_entities or batch_tokens + tokens > max_prompt_tokens):
+                self._run_batch(batch, prompt_templates, items, results)
+                batch, batch_tokens = [], overhead
+            batch.append(item)
+            batch_tokens += tokens
+        if batch:
+            self._run_batch(batch, prompt_templates, items, results)
+        return results
 
-            return {"result": response.choices[0].message.content, "status": "success"}
+    def _run_batch(self, batch, prompt_templates, items, results):
+        if len(batch) == 1:
+            index = batch[0][0]
+            results[index] = self.extract_multiple_information(items[index][1], prompt_templates)
+            return
+
+        blocks = [
+            build_batch_block(number, entity, formatted_results)
+            for number, (_, entity, formatted_results, _) in enumerate(batch, start=1)
+        ]
+        prompt = build_batch_prompt(blocks, prompt_templates)
+        try:
+            response = self._create(self._messages(EXTRACT_BATCH_SYSTEM_PROMPT, prompt))
+            answers = parse_batch_response(
+                response.choices[0].message.content, len(batch), len(prompt_templates)
+            )
+        except Exception:
+            answers = {}
+
+        for number, (index, _, _, cache_key) in enumerate(batch, start=1):
+            if number in answers:
+                results[index] = {"result": format_answers(answers[number]), "status": "success"}
+                self._store(cache_key, results[index])
+            else:
+                results[index] = self.extract_multiple_information(items[index][1], prompt_templates)
+
+
+class AsyncLLMService(_BaseLLMService):
+    """asyncio LLM client built on ``groq.AsyncGroq``.
+
+    At most ``max_in_flight`` completions run at once. Retries use jittered
+    exponential backoff and give their slot back while they wait, so one
+    throttled request never holds up the rest of a batch.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "mixtral-8x7b-32768",
+        cache: Optional[TieredCache] = None,
+        base_url: Optional[str] = None,
+        max_in_flight: int = 4,
+        max_attempts: int = 3,
+        timeout: float = 60.0,
+        max_backoff: float = 10.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        prompt_builder: Optional[PromptBuilder] = None,
+    ):
+        super().__init__(model, cache, rate_limiter, prompt_builder)
+        self.client = groq.AsyncGroq(
+            api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0
+        )
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def _create(self, messages: List[Dict[str, str]]):
+        self.prompt_sizes.record(messages)
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_random_exponential(multiplier=0.5, max=self.max_backoff),
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            reraise=True,
+        ):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1:
+                    metrics.inc("quickdata_retries_total", stage="llm")
+                if self.rate_limiter is not None:
+                    with metrics.timer("quickdata_rate_limit_wait_seconds", stage="llm"):
+                        await self.rate_limiter.wait_async()
+                async with self._slots:
+                    try:
+                        with metrics.track("llm"):
+                            raw = await self.client.chat.completions.with_raw_response.create(
+                                model=self.model, messages=messages
+                            )
+                    except groq.RateLimitError as e:
+                        self._observe_throttle(e)
+                        raise
+                if self.rate_limiter is not None:
+                    self.rate_limiter.observe(raw.status_code, raw.headers)
+                return self._record_usage(await raw.parse())
+
+    async def extract_multiple_information(
+        self, search_results: list, prompt_templates: list
+    ) -> Dict[str, Any]:
+        try:
+            formatted_results = self.prompt_builder.format_results(search_results)
+            cache_key = self._key_for(
+                EXTRACT_MULTIPLE_SYSTEM_PROMPT, formatted_results, list(prompt_templates)
+            )
+            cached = self._cached(cache_key)
+            if cached is not None:
+                return cached
+
+            prompt = build_multiple_prompt(formatted_results, prompt_templates)
+            response = await self._create(
+                self._messages(EXTRACT_MULTIPLE_SYSTEM_PROMPT, prompt)
+            )
+            return self._success(response, cache_key)
         except Exception as e:
             return {"result": str(e), "status": "error", "error_type": type(e).__name__}
+
+    async def extract_many(
+        self, batch: List[list], prompt_templates: list
+    ) -> List[Dict[str, Any]]:
+        """Extracts ``prompt_templates`` for every search result list in ``batch``.
+
+        Results come back in input order; failures are reported per item.
+        """
+        return await asyncio.gather(
+            *(
+                self.extract_multiple_information(search_results, prompt_templates)
+                for search_results in batch
+            )
+        )
+
+    async def aclose(self):
+        await self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -0,0 +1,103 @@
+import threading
+from typing import Dict, List
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def format_search_results(search_results: list) -> str:
+    return "\n".join(
+        [f"URL: {r['url']}\nContent: {r['snippet']}" for r in search_results]
+    )
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts ``text`` to about ``max_tokens`` tokens, at a word boundary where possible."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,;:.") + "…"
+
+
+def create_prompt_builder(llm_config: Dict) -> "PromptBuilder":
+    """Builds a PromptBuilder from the ``llm.prompt`` config."""
+    prompt_config = llm_config.get("prompt") or {}
+    return PromptBuilder(
+        max_snippet_tokens=prompt_config.get("max_snippet_tokens", 120),
+        max_context_tokens=prompt_config.get("max_context_tokens", 1000),
+    )
+
+
+class PromptBuilder:
+    """Compacts search results into the context sent with every completion.
+
+    Empty snippets and repeats (same URL, or the same text after case and
+    whitespace folding, as mirrors and syndicated pages often return) are
+    dropped. Each snippet is trimmed to ``max_snippet_tokens`` and results
+    stop once the context reaches ``max_context_tokens``; the first result
+    is always kept.
+    """
+
+    def __init__(self, max_snippet_tokens: int = 120, max_context_tokens: int = 1000):
+        if min(max_snippet_tokens, max_context_tokens) < 1:
+            raise ValueError("Token budgets must be at least 1")
+        self.max_snippet_tokens = max_snippet_tokens
+        self.max_context_tokens = max_context_tokens
+
+    def compact(self, search_results: list) -> List[Dict[str, str]]:
+        compacted = []
+        seen_urls, seen_snippets = set(), set()
+        used = 0
+        for result in search_results:
+            snippet = " ".join(str(result.get("snippet") or "").split())
+            url = result.get("url") or ""
+            key = snippet.casefold()
+            if not snippet or url in seen_urls or key in seen_snippets:
+                continue
+            seen_urls.add(url)
+            seen_snippets.add(key)
+
+            snippet = trim_to_tokens(snippet, self.max_snippet_tokens)
+            tokens = estimate_tokens(f"URL: {url}\nContent: {snippet}")
+            if compacted and used + tokens > self.max_context_tokens:
+                break
+            compacted.append({"url": url, "snippet": snippet})
+            used += tokens
+        return compacted
+
+    def format_results(self, search_results: list) -> str:
+        return format_search_results(self.compact(search_results))
+
+
+class PromptStats:
+    """Running totals of estimated prompt size, one record per completion request."""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, messages: List[Dict[str, str]]) -> int:
+        tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        with self._lock:
+            self.calls += 1
+            self.total_tokens += tokens
+            self.max_tokens = max(self.max_tokens, tokens)
+        return tokens
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            average = self.total_tokens / self.calls if self.calls else 0.0
+            return {
+                "calls": self.calls,
+                "total_tokens": self.total_tokens,
+                "average_tokens": average,
+                "max_tokens": self.max_tokens,
+            }
@@ -0,0 +1,91 @@
+import csv
+import os
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+RESULT_COLUMNS = ["Row", "Column", "Entity", "Sources", "Extracted Information"]
+
+
+class CSVResultWriter:
+    """Appends result rows to a CSV file as they arrive."""
+
+    def __init__(self, path: str, columns: List[str] = RESULT_COLUMNS):
+        self.path = path
+        self.count = 0
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=columns, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, row: Dict[str, Any]):
+        self.writer.writerow(row)
+        self.count += 1
+        # Keep the file readable (e.g. with `tail -f`) while the job runs
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetResultWriter:
+    """Writes result rows to a Parquet file one row group per ``batch_size`` rows."""
+
+    def __init__(self, path: str, columns: List[str] = RESULT_COLUMNS, batch_size: int = 1000):
+        self.path = path
+        self.count = 0
+        self.columns = columns
+        self.batch_size = batch_size
+        self.buffer: List[Dict[str, Any]] = []
+        self.schema = pa.schema(
+            [(column, pa.int64() if column == "Row" else pa.string()) for column in columns]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, row: Dict[str, Any]):
+        self.buffer.append(row)
+        self.count += 1
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        arrays = {}
+        for column in self.columns:
+            values = [row.get(column) for row in self.buffer]
+            if column != "Row":
+                values = [None if value is None else str(value) for value in values]
+            arrays[column] = values
+        self.writer.write_table(pa.table(arrays, schema=self.schema))
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_result_writer(
+    path: str, output_format: Optional[str] = None, columns: List[str] = RESULT_COLUMNS
+):
+    """Opens a streaming writer, picking CSV or Parquet from ``output_format`` or the extension."""
+    if output_format is None:
+        extension = os.path.splitext(path)[1].lower()
+        output_format = "parquet" if extension in (".parquet", ".pq") else "csv"
+    if output_format == "parquet":
+        return ParquetResultWriter(path, columns)
+    if output_format == "csv":
+        return CSVResultWriter(path, columns)
+    raise ValueError(f"Unsupported output format: {output_format}")
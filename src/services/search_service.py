@@ -1,34 +1,277 @@
-from typing import Dict, List
+import asyncio
+import os
+from typing import Dict, List, Optional
 
-import requests
+import httpx
 
-from utils.rate_limiter import RateLimiter
+from utils.disk_cache import DiskCache
+from utils.helpers import handle_error
+from utils.metrics import metrics
+from utils.quota_ledger import QuotaLedger
+from utils.rate_limiter import RateLimiter, create_rate_limiter, parse_retry_delay
 
+SERPAPI_URL = "https://serpapi.com/search"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
 
-class SearchService:
-    def __init__(self, api_key: str, rate_limit: int = 5):
+
+def normalize_query(query: str) -> str:
+    """Folds case and whitespace so trivially different queries share a cache entry."""
+    return " ".join(query.split()).casefold()
+
+
+def create_search_cache(search_config: Dict) -> Optional[DiskCache]:
+    """Builds the persistent result cache described by the ``search.cache`` config."""
+    cache_config = search_config.get("cache") or {}
+    if not cache_config.get("enabled", False):
+        return None
+    return DiskCache(
+        os.path.join(cache_config.get("directory", ".cache"), "search.sqlite3"),
+        ttl=cache_config.get("ttl_seconds"),
+        max_entries=cache_config.get("max_entries"),
+    )
+
+
+def create_search_service(
+    api_key: str, search_config: Dict, quota_ledger: Optional[QuotaLedger] = None
+) -> "SearchService":
+    """Builds a SearchService with the cache, pool and rate limit from the ``search`` config.
+
+    With a ``quota_ledger`` the SerpAPI rate limit is shared with other processes.
+    """
+    return SearchService(
+        api_key,
+        cache=create_search_cache(search_config),
+        timeout=search_config.get("timeout_seconds", 10.0),
+        max_connections=search_config.get("max_connections", 10),
+        rate_limiter=create_rate_limiter(
+            search_config.get("rate_limit", 5),
+            search_config.get("rate_limit_period", 60),
+            search_config.get("adaptive_rate"),
+            quota_ledger,
+            "serpapi",
+        ),
+        retry_attempts=search_config.get("retry_attempts", 3),
+    )
+
+
+class _BaseSearchService:
+    def __init__(
+        self,
+        api_key: str,
+        rate_limit: int = 5,
+        cache: Optional[DiskCache] = None,
+        base_url: str = SERPAPI_URL,
+        timeout: float = 10.0,
+        max_connections: int = 10,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_attempts: int = 3,
+    ):
         self.api_key = api_key
         if not self.api_key or self.api_key.startswith("${"):
             raise ValueError(
                 "Invalid SERPAPI_API_KEY. Please check your environment variables."
             )
-        self.rate_limiter = RateLimiter(rate_limit)
+        self.rate_limiter = rate_limiter or RateLimiter(rate_limit)
+        self.retry_attempts = max(1, retry_attempts)
+        self.cache = cache
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+
+    @staticmethod
+    def _cache_key(query: str, max_results: int) -> str:
+        return f"{normalize_query(query)}|{max_results}"
+
+    def _cached(self, query: str, max_results: int) -> Optional[List[Dict]]:
+        if self.cache is None:
+            return None
+        try:
+            cached = self.cache.get(self._cache_key(query, max_results))
+        except Exception as e:
+            # e.g. "database is locked" with many workers; search as if it missed
+            handle_error(e, stage="search_cache")
+            cached = None
+        metrics.cache_result("search", cached is not None)
+        return cached
+
+    def _back_off(self, headers=None):
+        """Holds the limiter back after a server or connection error, as after an unhinted 429."""
+        # A Retry-After on the response was already applied by observe()
+        if parse_retry_delay(headers) is None:
+            self.rate_limiter.defer(self.rate_limiter.per / self.rate_limiter.rate)
+
+    def _parse(self, query: str, max_results: int, response: httpx.Response) -> List[Dict]:
+        response.raise_for_status()
+
+        data = response.json()
+        organic_results = data.get("organic_results", [])
+
+        results = [
+            {"url": r.get("link"), "snippet": r.get("snippet", "")}
+            for r in organic_results[:max_results]
+        ]
+        if self.cache is not None:
+            try:
+                self.cache.set(self._cache_key(query, max_results), results)
+            except Exception as e:
+                # The search is paid for; losing the cache entry must not fail it
+                handle_error(e, stage="search_cache")
+        return results
+
+
+class SearchService(_BaseSearchService):
+    """Blocking SerpAPI client that reuses keep-alive connections across calls."""
+
+    def __init__(
+        self,
+        api_key: str,
+        rate_limit: int = 5,
+        cache: Optional[DiskCache] = None,
+        base_url: str = SERPAPI_URL,
+        timeout: float = 10.0,
+        max_connections: int = 10,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_attempts: int = 3,
+    ):
+        super().__init__(
+            api_key,
+            rate_limit,
+            cache,
+            base_url,
+            timeout,
+            max_connections,
+            rate_limiter,
+            retry_attempts,
+        )
+        self.client = httpx.Client(timeout=self.timeout, limits=self.limits)
 
     def search(self, query: str, max_results: int = 3) -> List[Dict]:
-        self.rate_limiter.wait()
+        cached = self._cached(query, max_results)
+        if cached is not None:
+            return cached
+
         try:
             params = {"api_key": self.api_key, "q": query, "num": max_results}
 
-            response = requests.get("https://serpapi.com/search", params=params)
-            response.raise_for_status()
+            for attempt in range(self.retry_attempts):
+                if attempt:
+                    metrics.inc("quickdata_retries_total", stage="search")
+                with metrics.timer("quickdata_rate_limit_wait_seconds", stage="search"):
+                    self.rate_limiter.wait()
+                try:
+                    with metrics.track("search"):
+                        response = self.client.get(self.base_url, params=params)
+                        if response.is_error and response.status_code not in RETRYABLE_STATUS:
+                            response.raise_for_status()
+                except httpx.TransportError:
+                    if attempt == self.retry_attempts - 1:
+                        raise
+                    self._back_off()
+                    continue
+                # A 429 makes the limiter back off before the next attempt
+                self.rate_limiter.observe(response.status_code, response.headers)
+                if response.status_code not in RETRYABLE_STATUS:
+                    break
+                if response.status_code != 429:
+                    self._back_off(response.headers)
+            return self._parse(query, max_results, response)
+
+        except httpx.HTTPError as e:
+            raise Exception(f"Search error: {str(e)}")
+
+    def close(self):
+        self.client.close()
+
 
-            data = response.json()
-            organic_results = data.get("organic_results", [])
+class AsyncSearchService(_BaseSearchService):
+    """asyncio SerpAPI client with a pooled ``httpx.AsyncClient``.
 
-            return [
-                {"url": r.get("link"), "snippet": r.get("snippet", "")}
-                for r in organic_results[:max_results]
-            ]
+    Create it inside the event loop that will use it, and ``await aclose()``
+    (or use ``async with``) when done.
+    """
 
-        except requests.exceptions.RequestException as e:
+    def __init__(
+        self,
+        api_key: str,
+        rate_limit: int = 5,
+        cache: Optional[DiskCache] = None,
+        base_url: str = SERPAPI_URL,
+        timeout: float = 10.0,
+        max_connections: int = 10,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_attempts: int = 3,
+    ):
+        super().__init__(
+            api_key,
+            rate_limit,
+            cache,
+            base_url,
+            timeout,
+            max_connections,
+            rate_limiter,
+            retry_attempts,
+        )
+        self.max_connections = max_connections
+        self.client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+
+    async def search(self, query: str, max_results: int = 3) -> List[Dict]:
+        cached = self._cached(query, max_results)
+        if cached is not None:
+            return cached
+
+        try:
+            params = {"api_key": self.api_key, "q": query, "num": max_results}
+
+            for attempt in range(self.retry_attempts):
+                if attempt:
+                    metrics.inc("quickdata_retries_total", stage="search")
+                with metrics.timer("quickdata_rate_limit_wait_seconds", stage="search"):
+                    await self.rate_limiter.wait_async()
+                try:
+                    with metrics.track("search"):
+                        response = await self.client.get(self.base_url, params=params)
+                        if response.is_error and response.status_code not in RETRYABLE_STATUS:
+                            response.raise_for_status()
+                except httpx.TransportError:
+                    if attempt == self.retry_attempts - 1:
+                        raise
+                    self._back_off()
+                    continue
+                self.rate_limiter.observe(response.status_code, response.headers)
+                if response.status_code not in RETRYABLE_STATUS:
+                    break
+                if response.status_code != 429:
+                    self._back_off(response.headers)
+            return self._parse(query, max_results, response)
+
+        except httpx.HTTPError as e:
             raise Exception(f"Search error: {str(e)}")
+
+    async def search_many(
+        self,
+        queries: List[str],
+        max_results: int = 3,
+        concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+    ) -> List:
+        """Runs ``queries`` concurrently and returns their results in input order."""
+        slots = asyncio.Semaphore(concurrency or self.max_connections)
+
+        async def bounded(query: str):
+            async with slots:
+                return await self.search(query, max_results)
+
+        return await asyncio.gather(
+            *(bounded(query) for query in queries), return_exceptions=return_exceptions
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -0,0 +1,98 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, Optional
+
+from services.enrichment import EnrichmentEngine, create_engine
+from services.llm_service import create_llm_service
+from services.search_service import create_search_service
+from utils.metrics import Tracer
+from utils.quota_ledger import create_quota_ledger
+
+
+def create_service_pool(config: Dict) -> "ServicePool":
+    """Builds the search and LLM services and the limits from ``processing``."""
+    # Shared with queue workers and other instances when quota.enabled is set
+    quota_ledger = create_quota_ledger(config.get("quota"))
+    llm_service = create_llm_service(config["api_keys"]["groq"], config.get("llm", {}), quota_ledger)
+    search_service = create_search_service(config["api_keys"]["serpapi"], config.get("search", {}), quota_ledger)
+    processing_config = config.get("processing", {})
+    user_quota = processing_config.get("user_quota") or {}
+    return ServicePool(
+        search_service,
+        llm_service,
+        search_concurrency=processing_config.get("search_concurrency", 4),
+        llm_concurrency=processing_config.get("llm_concurrency", 4),
+        max_jobs_per_user=user_quota.get("max_jobs", 1),
+        max_workers_per_user=user_quota.get("max_workers", processing_config.get("max_workers", 8)),
+    )
+
+
+class ServicePool:
+    """One set of API clients shared by every session of a server process.
+
+    The search and LLM services (with their rate limiters, caches and HTTP
+    connection pools) exist once, so N sessions cannot spend N times the
+    quota. Engines built here share one search and one LLM semaphore, so
+    ``search_concurrency`` and ``llm_concurrency`` hold across all jobs.
+    Each user may run ``max_jobs_per_user`` jobs at once, each on at most
+    ``max_workers_per_user`` threads.
+    """
+
+    def __init__(
+        self,
+        search_service,
+        llm_service,
+        search_concurrency: int = 4,
+        llm_concurrency: int = 4,
+        max_jobs_per_user: int = 1,
+        max_workers_per_user: int = 8,
+    ):
+        if min(search_concurrency, llm_concurrency, max_jobs_per_user, max_workers_per_user) < 1:
+            raise ValueError("Concurrency limits and user quotas must be at least 1")
+        self.search_service = search_service
+        self.llm_service = llm_service
+        self.max_jobs_per_user = max_jobs_per_user
+        self.max_workers_per_user = max_workers_per_user
+        self.search_concurrency = search_concurrency
+        self.llm_concurrency = llm_concurrency
+        self.search_slots = threading.BoundedSemaphore(search_concurrency)
+        self.llm_slots = threading.BoundedSemaphore(llm_concurrency)
+        self.running: Dict[Hashable, int] = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def job(self, user: Hashable) -> Iterator[None]:
+        """Counts a running job against ``user``'s quota until the block ends."""
+        with self.lock:
+            running = self.running.get(user, 0)
+            if running >= self.max_jobs_per_user:
+                raise Exception(
+                    f"You already have {running} job(s) running; "
+                    f"wait for it to finish or submit this one to the worker queue"
+                )
+            self.running[user] = running + 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.running[user] -= 1
+                if not self.running[user]:
+                    del self.running[user]
+
+    def create_engine(self, config: Dict, tracer: Optional[Tracer] = None) -> EnrichmentEngine:
+        """An engine for one job, on the shared services and concurrency limits."""
+        return create_engine(
+            self.search_service,
+            self.llm_service,
+            config,
+            tracer=tracer,
+            max_workers=min(config.get("processing", {}).get("max_workers", 8), self.max_workers_per_user),
+            search_concurrency=self.search_concurrency,
+            llm_concurrency=self.llm_concurrency,
+            search_slots=self.search_slots,
+            llm_slots=self.llm_slots,
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"users": len(self.running), "jobs": sum(self.running.values())}
@@ -1,11 +1,159 @@
-import os.path
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import httplib2
 import pandas as pd
+from cachetools import TTLCache
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from utils.helpers import handle_error
+from utils.metrics import metrics
+from utils.rate_limiter import RateLimiter
+
+# Sheets allows 60 write requests per minute per user
+WRITE_RATE_LIMIT = 60
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+METADATA_TTL = 300  # seconds spreadsheet metadata (tab titles, sizes) is reused
+METADATA_FIELDS = "spreadsheetId,properties.title,sheets.properties(sheetId,title,gridProperties)"
+
+# Built clients, keyed by token file, shared by every handler in the process
+_services: Dict[str, "_SheetsClient"] = {}
+_services_lock = threading.Lock()
+_metadata: TTLCache = TTLCache(maxsize=256, ttl=METADATA_TTL)
+_metadata_lock = threading.Lock()
+
+
+def clear_caches():
+    """Forgets shared clients and metadata, e.g. after switching Google accounts."""
+    with _services_lock:
+        for client in _services.values():
+            client.refresher.cancel()
+        _services.clear()
+    with _metadata_lock:
+        _metadata.clear()
+
+
+class CredentialRefresher:
+    """Refreshes OAuth credentials on a background timer before they expire.
+
+    The token is renewed ``margin`` seconds ahead of its expiry and saved
+    back to ``token_path``, so API calls never stall on an inline refresh.
+    Failed refreshes are retried every ``retry_interval`` seconds.
+    """
+
+    def __init__(self, creds, token_path: str, margin: float = 300, retry_interval: float = 30):
+        self.creds = creds
+        self.token_path = token_path
+        self.margin = margin
+        self.retry_interval = retry_interval
+        self.timer: Optional[threading.Timer] = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+        self.schedule()
+
+    def seconds_until_refresh(self) -> Optional[float]:
+        expiry = getattr(self.creds, "expiry", None)
+        if not isinstance(expiry, datetime) or not getattr(self.creds, "refresh_token", None):
+            return None
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return max(0.0, (expiry - now).total_seconds() - self.margin)
+
+    def schedule(self, delay: Optional[float] = None):
+        if delay is None:
+            delay = self.seconds_until_refresh()
+        if delay is None:
+            return
+        with self.lock:
+            if self.cancelled:
+                return
+            self.timer = threading.Timer(delay, self.refresh)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def refresh(self):
+        try:
+            self.creds.refresh(Request())
+            # Write-then-rename so a concurrent reader never sees a half-written token
+            temp_path = f"{self.token_path}.tmp"
+            with open(temp_path, "w") as token:
+                token.write(self.creds.to_json())
+            os.replace(temp_path, self.token_path)
+        except Exception as e:
+            handle_error(e, stage="sheets_auth")
+            self.schedule(self.retry_interval)
+            return
+        delay = self.seconds_until_refresh()
+        if delay is not None:
+            # A token that is already inside the margin must not refresh in a tight loop
+            self.schedule(max(delay, self.retry_interval))
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.timer is not None:
+                self.timer.cancel()
+
+
+class _SheetsClient:
+    """A built discovery client plus the state shared by everyone using it."""
+
+    def __init__(self, creds, token_path: str):
+        self.creds = creds
+        self.local = threading.local()
+        # Static discovery ships with googleapiclient, so building needs no network fetch
+        self.service = build(
+            "sheets",
+            "v4",
+            credentials=creds,
+            requestBuilder=self._build_request,
+            static_discovery=True,
+            cache_discovery=False,
+        )
+        self.write_rate_limiter = RateLimiter(WRITE_RATE_LIMIT, per=60)
+        self.refresher = CredentialRefresher(creds, token_path)
+
+    def _build_request(self, http, *args, **kwargs):
+        # httplib2 connections are not thread-safe: keep one per thread
+        if not hasattr(self.local, "http"):
+            self.local.http = AuthorizedHttp(self.creds, http=httplib2.Http())
+        return HttpRequest(self.local.http, *args, **kwargs)
+
+
+def column_letter(index: int) -> str:
+    """0 -> "A", 25 -> "Z", 26 -> "AA"."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def column_blocks(positions: List[int]) -> List[Tuple[int, int]]:
+    """Groups sorted column positions into (first, last) runs of adjacent columns."""
+    blocks = []
+    for position in positions:
+        if blocks and blocks[-1][1] == position - 1:
+            blocks[-1] = (blocks[-1][0], position)
+        else:
+            blocks.append((position, position))
+    return blocks
+
+
+def a1_range(sheet_name: Optional[str], cells: str) -> str:
+    if sheet_name is None:
+        return cells
+    return "'{}'!{}".format(sheet_name.replace("'", "''"), cells)
 
 
 class GoogleSheetsHandler:
@@ -17,70 +165,162 @@ class GoogleSheetsHandler:
 
     def _authenticate(self):
         try:
-            self.service = self._initialize_service()
+            client = self._initialize_service()
+            self.service = client.service
+            self.write_rate_limiter = client.write_rate_limiter
         except Exception as e:
             raise Exception(f"Authentication failed: {str(e)}")
 
-    def _initialize_service(self):
+    def _initialize_service(self) -> _SheetsClient:
+        """Returns the process-wide client for this token file, building it once."""
         try:
-            creds = None
-            if os.path.exists(self.token_path):
-                creds = Credentials.from_authorized_user_file(
-                    self.token_path, self.scopes
+            with _services_lock:
+                if self.token_path not in _services:
+                    _services[self.token_path] = _SheetsClient(self._load_credentials(), self.token_path)
+                return _services[self.token_path]
+        except Exception as e:
+            raise Exception(f"Service initialization failed: {str(e)}")
+
+    def _load_credentials(self):
+        creds = None
+        if os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(
+                self.token_path, self.scopes
+            )
+
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(
+                    self.credentials_path, self.scopes
                 )
+                creds = flow.run_local_server(port=0)
 
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    creds.refresh(Request())
-                else:
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        self.credentials_path, self.scopes
-                    )
-                    creds = flow.run_local_server(port=0)
+            # Save the credentials for the next run
+            with open(self.token_path, "w") as token:
+                token.write(creds.to_json())
+        return creds
 
-                # Save the credentials for the next run
-                with open(self.token_path, "w") as token:
-                    token.write(creds.to_json())
+    @staticmethod
+    def _access_error(e: HttpError, message: str) -> Exception:
+        if e.resp.status == 403:
+            return Exception("You don't have permission to access this spreadsheet")
+        elif e.resp.status == 404:
+            return Exception("Spreadsheet not found. Please check the URL")
+        return Exception(f"{message}: {str(e)}")
 
-            return build("sheets", "v4", credentials=creds)
-        except Exception as e:
-            raise Exception(f"Service initialization failed: {str(e)}")
+    def get_spreadsheet_metadata(self, spreadsheet_id: str, refresh: bool = False) -> Dict[str, Any]:
+        """Tab titles and sizes of a spreadsheet, cached for ``METADATA_TTL`` seconds."""
+        with _metadata_lock:
+            metadata = None if refresh else _metadata.get(spreadsheet_id)
+        metrics.cache_result("sheets_metadata", metadata is not None)
+        if metadata is None:
+            try:
+                with metrics.track("sheets_read"):
+                    metadata = self.service.spreadsheets().get(
+                        spreadsheetId=spreadsheet_id, fields=METADATA_FIELDS
+                    ).execute()
+            except HttpError as e:
+                raise self._access_error(e, "Error accessing spreadsheet")
+            with _metadata_lock:
+                _metadata[spreadsheet_id] = metadata
+        return metadata
+
+    def get_sheet_titles(self, spreadsheet_id: str) -> List[str]:
+        metadata = self.get_spreadsheet_metadata(spreadsheet_id)
+        return [sheet["properties"]["title"] for sheet in metadata.get("sheets", [])]
 
     def validate_sheet_access(self, spreadsheet_id: str) -> bool:
-        try:
-            self.service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-            return True
-        except HttpError as e:
-            if e.resp.status == 403:
-                raise Exception("You don't have permission to access this spreadsheet")
-            elif e.resp.status == 404:
-                raise Exception("Spreadsheet not found. Please check the URL")
-            else:
-                raise Exception(f"Error accessing spreadsheet: {str(e)}")
+        self.get_spreadsheet_metadata(spreadsheet_id)
+        return True
 
-    def get_sheet_data(self, spreadsheet_id: str) -> pd.DataFrame:
+    def _batch_get(self, spreadsheet_id: str, ranges: List[str]) -> List[list]:
+        """Fetches several A1 ranges in one request; missing or blank ranges come back as []."""
         try:
-            self.validate_sheet_access(spreadsheet_id)
-            sheet = self.service.spreadsheets()
-            result = (
-                sheet.values()
-                .get(
-                    spreadsheetId=spreadsheet_id,
-                    range="A1:ZZ",  # Default range to get all data
+            with metrics.track("sheets_read"):
+                result = (
+                    self.service.spreadsheets()
+                    .values()
+                    .batchGet(spreadsheetId=spreadsheet_id, ranges=ranges, majorDimension="ROWS")
+                    .execute()
                 )
-                .execute()
-            )
+        except HttpError as e:
+            raise self._access_error(e, "Error fetching sheet data")
+        value_ranges = result.get("valueRanges", [])
+        return [value_range.get("values", []) for value_range in value_ranges] + [
+            [] for _ in range(len(ranges) - len(value_ranges))
+        ]
 
-            values = result.get("values", [])
-            if not values:
-                return pd.DataFrame()
+    def read_sheet_header(self, spreadsheet_id: str, sheet_name: Optional[str] = None) -> List[str]:
+        values = self._batch_get(spreadsheet_id, [a1_range(sheet_name, "1:1")])[0]
+        return values[0] if values else []
 
-            # Convert to DataFrame
-            df = pd.DataFrame(values[1:], columns=values[0])
-            return df
+    def iter_sheet_pages(
+        self,
+        spreadsheet_id: str,
+        columns: Optional[List[str]] = None,
+        start_row: int = 0,
+        end_row: Optional[int] = None,
+        page_size: int = 1000,
+        sheet_name: Optional[str] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Yields the sheet ``page_size`` rows at a time, fetching only ``columns``.
 
-        except HttpError as e:
-            raise Exception(f"Error fetching sheet data: {str(e)}")
+        Every page is a single ``values().batchGet`` with one range per run of
+        adjacent selected columns. Rows are numbered from 0 below the header,
+        like ``get_sheet_data``, and blank cells are returned as missing
+        values. Reading stops at ``end_row`` or at the first page where the
+        selected columns are empty.
+        """
+        header = self.read_sheet_header(spreadsheet_id, sheet_name)
+        if not header:
+            return
+        if columns is None:
+            columns = header
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise Exception(f"Columns not found: {', '.join(missing)}")
+
+        blocks = column_blocks(sorted({header.index(column) for column in columns}))
+        row = start_row
+        while end_row is None or row < end_row:
+            count = page_size if end_row is None else min(page_size, end_row - row)
+            # Sheet line numbers are 1-based and line 1 is the header
+            first_line, last_line = row + 2, row + count + 1
+            ranges = [
+                a1_range(sheet_name, f"{column_letter(first)}{first_line}:{column_letter(last)}{last_line}")
+                for first, last in blocks
+            ]
+            pages = self._batch_get(spreadsheet_id, ranges)
+            length = max(len(values) for values in pages)
+            if length == 0:
+                return
+
+            data = {}
+            for (first, last), values in zip(blocks, pages):
+                values = values + [[]] * (length - len(values))
+                for offset, position in enumerate(range(first, last + 1)):
+                    data[header[position]] = [
+                        cells[offset] if offset < len(cells) and cells[offset] != "" else None
+                        for cells in values
+                    ]
+            yield pd.DataFrame(
+                {column: data[column] for column in columns},
+                index=pd.RangeIndex(row, row + length),
+            )
+            row += count
+
+    def get_sheet_data(
+        self,
+        spreadsheet_id: str,
+        columns: Optional[List[str]] = None,
+        page_size: int = 1000,
+    ) -> pd.DataFrame:
+        pages = list(self.iter_sheet_pages(spreadsheet_id, columns, page_size=page_size))
+        if not pages:
+            return pd.DataFrame()
+        return pd.concat(pages)
 
     def update_sheet_data(
         self, spreadsheet_id: str, range_name: str, data: pd.DataFrame
@@ -114,40 +354,165 @@ class GoogleSheetsHandler:
                 }]
             }
             spreadsheet = self.service.spreadsheets().create(body=spreadsheet).execute()
+            with _metadata_lock:
+                _metadata[spreadsheet['spreadsheetId']] = spreadsheet
             return spreadsheet['spreadsheetId']
         except Exception as e:
             raise Exception(f"Error creating new sheet: {str(e)}")
 
-    def export_results(self, data: pd.DataFrame, spreadsheet_id: str = None, sheet_name: str = "Results") -> str:
+    def ensure_sheet(self, spreadsheet_id: str, sheet_name: str):
+        """Adds the tab ``sheet_name`` unless the (cached) metadata already lists it."""
+        if sheet_name in self.get_sheet_titles(spreadsheet_id):
+            return
+
+        request = {
+            'addSheet': {
+                'properties': {
+                    'title': sheet_name
+                }
+            }
+        }
+        body = {'requests': [request]}
+        self.service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body=body
+        ).execute()
+        with _metadata_lock:
+            if spreadsheet_id in _metadata:
+                _metadata[spreadsheet_id].setdefault('sheets', []).append(request['addSheet'])
+
+    def open_result_writer(
+        self,
+        spreadsheet_id: Optional[str] = None,
+        sheet_name: str = "Results",
+        **writer_options,
+    ) -> "SheetResultWriter":
+        """Starts an incremental export, creating a new spreadsheet if no ID is given."""
         try:
             if not spreadsheet_id:
                 spreadsheet_id = self.create_new_sheet(f"AI Data Agent Results - {pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}")
-            
-            # Ensure the sheet exists by getting all sheets
-            sheet_metadata = self.service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-            sheets = sheet_metadata.get('sheets', '')
-            sheet_exists = any(sheet['properties']['title'] == sheet_name for sheet in sheets)
-            
-            if not sheet_exists:
-                # Add new sheet if it doesn't exist
-                request = {
-                    'addSheet': {
-                        'properties': {
-                            'title': sheet_name
-                        }
-                    }
-                }
-                body = {'requests': [request]}
-                self.service.spreadsheets().batchUpdate(
-                    spreadsheetId=spreadsheet_id,
-                    body=body
-                ).execute()
-            
-            # Now update the data
-            range_name = f"'{sheet_name}'!A1"  # Use single range reference
-            self.update_sheet_data(spreadsheet_id, range_name, data)
-            
-            return f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}"
-            
+            self.ensure_sheet(spreadsheet_id, sheet_name)
+            return SheetResultWriter(self, spreadsheet_id, sheet_name, **writer_options)
+        except HttpError as e:
+            raise self._access_error(e, "Error exporting results")
+
+    def export_results(self, data: pd.DataFrame, spreadsheet_id: str = None, sheet_name: str = "Results") -> str:
+        try:
+            with self.open_result_writer(spreadsheet_id, sheet_name, columns=list(data.columns)) as writer:
+                for row in data.to_dict("records"):
+                    writer.write(row)
+            return writer.url
         except Exception as e:
             raise Exception(f"Error exporting results: {str(e)}")
+
+
+def _cell(value: Any) -> Any:
+    """Converts a DataFrame value into something the Sheets JSON API accepts."""
+    if value is None or value is pd.NA:
+        return ""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return ""
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class SheetResultWriter:
+    """Writes result rows into a sheet tab in chunks while a job is running.
+
+    Rows are buffered and sent as one ``values().batchUpdate`` once
+    ``chunk_size`` rows are waiting or ``flush_interval`` seconds have passed,
+    so a long job shows up progressively without spending the write quota.
+    Every chunk targets an explicit range, so retrying a failed chunk
+    overwrites the same cells instead of appending duplicates.
+    """
+
+    def __init__(
+        self,
+        handler: GoogleSheetsHandler,
+        spreadsheet_id: str,
+        sheet_name: str = "Results",
+        columns: Optional[List[str]] = None,
+        chunk_size: int = 500,
+        flush_interval: float = 5.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 1.0,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.handler = handler
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.rate_limiter = rate_limiter or handler.write_rate_limiter
+        self.count = 0
+        self.requests = 0
+        self.buffer: List[list] = []
+        self.next_line = 1  # 1-based sheet line of the first buffered row
+        self.last_flush = time.monotonic()
+
+    @property
+    def url(self) -> str:
+        return f"https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}"
+
+    def write(self, row: Dict[str, Any]):
+        if self.columns is None:
+            self.columns = list(row)
+        if self.next_line == 1 and not self.buffer:
+            self.buffer.append(list(self.columns))
+        self.buffer.append([_cell(row.get(column)) for column in self.columns])
+        self.count += 1
+        if (
+            len(self.buffer) >= self.chunk_size
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        first, last = self.next_line, self.next_line + len(self.buffer) - 1
+        cells = f"A{first}:{column_letter(len(self.columns) - 1)}{last}"
+        body = {
+            "valueInputOption": "RAW",
+            "data": [{"range": a1_range(self.sheet_name, cells), "values": self.buffer}],
+        }
+        self._execute(body)
+        self.next_line = last + 1
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def _execute(self, body: Dict[str, Any]):
+        for attempt in range(self.max_attempts):
+            if attempt:
+                metrics.inc("quickdata_retries_total", stage="sheets_write")
+            with metrics.timer("quickdata_rate_limit_wait_seconds", stage="sheets_write"):
+                self.rate_limiter.acquire()
+            self.requests += 1
+            try:
+                with metrics.track("sheets_write"):
+                    self.handler.service.spreadsheets().values().batchUpdate(
+                        spreadsheetId=self.spreadsheet_id, body=body
+                    ).execute()
+                return
+            except HttpError as e:
+                status = e.resp.status
+                if status not in RETRYABLE_STATUS or attempt == self.max_attempts - 1:
+                    raise Exception(f"Error writing rows {body['data'][0]['range']}: {str(e)}")
+                self.rate_limiter.observe(status, dict(e.resp))
+                if status != 429:
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,147 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pydantic_core
+from pydantic import StrictBool, StrictFloat, StrictInt, StrictStr, TypeAdapter, ValidationError
+
+STRUCTURED_SYSTEM_PROMPT = """Extract multiple pieces of information from the search results.
+Reply with a single JSON object and nothing else, mapping each prompt number to its answer, e.g. {"1": "answer", "2": 42}.
+Use a JSON number, boolean or list of strings where that is what the answer is, and null if the information is not found."""
+
+REPAIR_PROMPT = "That reply was not valid JSON. Reply again with only the JSON object."
+
+BASE_COLUMNS = ["Row", "Column", "Entity", "Sources"]
+ERROR_COLUMN = "Error"
+
+# Bools first: in a Union, StrictInt would otherwise never see them as ints
+Answer = Optional[Union[StrictBool, StrictInt, StrictFloat, StrictStr, List[StrictStr]]]
+ANSWER = TypeAdapter(Answer)
+ANSWERS = TypeAdapter(Dict[str, Answer])
+
+NOT_FOUND = {"", "not found", "n/a", "none", "unknown"}
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+NUMBERED_LINE = re.compile(r"^\s*(\d+)[.):]\s*(.*\S)?\s*$")
+
+
+@lru_cache(maxsize=64)
+def _prompt_columns(prompts: Tuple[str, ...]) -> Tuple[str, ...]:
+    taken = set(BASE_COLUMNS) | {ERROR_COLUMN}
+    columns = []
+    for prompt in prompts:
+        name = prompt.replace(" of {entity}", "").replace("{entity}", "entity").strip() or "Answer"
+        column, suffix = name, 2
+        while column in taken:
+            column, suffix = f"{name} ({suffix})", suffix + 1
+        taken.add(column)
+        columns.append(column)
+    return tuple(columns)
+
+
+def prompt_columns(prompts: Sequence[str]) -> List[str]:
+    """One result column name per prompt: "Find the email of {entity}" -> "Find the email"."""
+    return list(_prompt_columns(tuple(prompts)))
+
+
+def result_columns(prompts: Sequence[str]) -> List[str]:
+    """Column layout of structured result rows."""
+    return BASE_COLUMNS + prompt_columns(prompts) + [ERROR_COLUMN]
+
+
+def _clean(value: Answer) -> Answer:
+    if isinstance(value, str) and value.strip().casefold() in NOT_FOUND:
+        return None
+    return value
+
+
+def _answer_list(data: Dict[str, Any], prompt_count: int) -> List[Answer]:
+    return [_clean(data.get(str(number))) for number in range(1, prompt_count + 1)]
+
+
+def _validate_values(data: Any) -> Optional[Dict[str, Answer]]:
+    """Validates one value at a time; values of the wrong shape are kept as JSON text."""
+    if not isinstance(data, dict):
+        return None
+    answers = {}
+    for key, value in data.items():
+        try:
+            answers[str(key)] = ANSWER.validate_python(value)
+        except ValidationError:
+            answers[str(key)] = json.dumps(value)
+    return answers
+
+
+def _parse_numbered(text: str, prompt_count: int) -> Optional[List[Answer]]:
+    """Reads the free-text "1. answer" format the plain prompts ask for."""
+    data = {}
+    for line in text.splitlines():
+        match = NUMBERED_LINE.match(line)
+        if match:
+            data.setdefault(match.group(1), match.group(2) or "")
+    if not any(str(number) in data for number in range(1, prompt_count + 1)):
+        return None
+    return _answer_list(data, prompt_count)
+
+
+def parse_answers(text: Optional[str], prompt_count: int) -> Tuple[Optional[List[Answer]], str]:
+    """Parses a reply into one typed answer per prompt, without calling the model again.
+
+    Returns the answers and how they were read: "json" for a valid reply,
+    "repaired" when the JSON had to be cut out of surrounding prose, fixed
+    or completed after truncation, and "numbered" for a plain numbered
+    list. Answers are None if nothing usable was found.
+    """
+    text = text or ""
+    try:
+        return _answer_list(ANSWERS.validate_json(text), prompt_count), "json"
+    except ValidationError:
+        pass
+
+    start = text.find("{")
+    if start != -1:
+        end = text.rfind("}")
+        candidate = text[start:end + 1] if end > start else text[start:]
+        candidate = TRAILING_COMMA.sub(r"\1", candidate)
+        try:
+            data = _validate_values(pydantic_core.from_json(candidate, allow_partial="trailing-strings"))
+        except ValueError:
+            data = None
+        if data:
+            return _answer_list(data, prompt_count), "repaired"
+
+    answers = _parse_numbered(text, prompt_count)
+    return answers, "numbered" if answers is not None else "failed"
+
+
+def format_answer(value: Answer) -> str:
+    if value is None:
+        return "Not found"
+    if isinstance(value, list):
+        return ", ".join(value)
+    return str(value)
+
+
+def structured_row(
+    base: Dict[str, Any], prompts: Sequence[str], answers: Optional[List[Answer]], error: Optional[str] = None
+) -> Dict[str, Any]:
+    """Adds one column per prompt (and the error, if any) to a result row."""
+    row = dict(base)
+    row.update(zip(prompt_columns(prompts), answers or [None] * len(prompts)))
+    row[ERROR_COLUMN] = error
+    return row
+
+
+def structured_frame(rows: List[Dict[str, Any]], prompts: Sequence[str]) -> pd.DataFrame:
+    """Builds the result DataFrame with a typed column per prompt.
+
+    Columns are assembled in one pass and typed with ``convert_dtypes``, so
+    numeric answers become nullable integer or float columns and text
+    answers a string column, without touching rows one by one.
+    """
+    columns = result_columns(prompts)
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    answer_columns = prompt_columns(prompts)
+    frame[answer_columns] = frame[answer_columns].convert_dtypes()
+    return frame
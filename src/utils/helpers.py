@@ -1,10 +1,18 @@
+import logging
+
+from utils.metrics import metrics
+
+logger = logging.getLogger("quickdata")
+
+
 def format_data(data):
     # Function to format data for presentation
     return [str(item).strip() for item in data]
 
-def handle_error(error):
-    # Function to log and handle errors
-    print(f"Error: {error}")
+def handle_error(error, stage="app"):
+    # Function to log and count errors
+    logger.error("%s error: %s", stage, error)
+    metrics.inc("quickdata_errors_total", stage=stage)
 
 def validate_input(data):
     # Function to validate user input
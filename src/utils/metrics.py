@@ -0,0 +1,319 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Seconds; covers cache hits (sub-millisecond) up to slow completions
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRIC_HELP = {
+    "quickdata_stage_seconds": "Latency of search, LLM and Sheets calls",
+    "quickdata_calls_total": "Calls made per stage",
+    "quickdata_errors_total": "Calls that raised, per stage",
+    "quickdata_retries_total": "Extra attempts after throttling or transient errors",
+    "quickdata_cache_hits_total": "Calls answered from a cache",
+    "quickdata_cache_misses_total": "Calls that missed the cache",
+    "quickdata_rate_limit_wait_seconds": "Time spent waiting for a rate limiter",
+    "quickdata_llm_tokens_total": "Tokens reported by the LLM API",
+    "quickdata_entities_total": "Entities enriched",
+    "quickdata_rate_limit_per_minute": "Current allowance of each rate limiter",
+    "quickdata_rate_limit_throttled_total": "429 responses seen by each rate limiter",
+}
+
+# Histograms that also become spans of the current entity trace
+TRACED_HISTOGRAMS = {
+    "quickdata_stage_seconds": "{stage}",
+    "quickdata_rate_limit_wait_seconds": "{stage}_rate_limit_wait",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects, with quantile estimates."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimates the ``q`` quantile by interpolating inside its bucket."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            if count and seen + count >= rank:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and latency histograms for the enrichment pipeline.
+
+    Services record into the process-wide ``metrics`` registry. Everything
+    can be exported as Prometheus text (``to_prometheus``) or JSON
+    (``snapshot`` / ``write``).
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        """Sets gauge ``name``, a value that goes up and down, e.g. a current rate."""
+        key = _labels(labels)
+        with self._lock:
+            self.gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+        trace = current_trace()
+        if trace is not None and name in TRACED_HISTOGRAMS:
+            trace.add_span(TRACED_HISTOGRAMS[name].format(**labels), value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Observes how long the block takes into histogram ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def track(self, stage: str) -> Iterator[None]:
+        """Counts a call to ``stage``, times it, and counts it as an error if it raises."""
+        self.inc("quickdata_calls_total", stage=stage)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("quickdata_errors_total", stage=stage)
+            trace = current_trace()
+            if trace is not None:
+                trace.errors.append(stage)
+            raise
+        finally:
+            self.observe("quickdata_stage_seconds", time.perf_counter() - start, stage=stage)
+
+    def cache_result(self, stage: str, hit: bool):
+        self.inc("quickdata_cache_hits_total" if hit else "quickdata_cache_misses_total", stage=stage)
+
+    def value(self, name: str, **labels) -> float:
+        """A counter's total or a gauge's last value; 0 if it was never recorded."""
+        with self._lock:
+            series = self.counters.get(name) or self.gauges.get(name, {})
+            return series.get(_labels(labels), 0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self._lock:
+            return self.histograms.get(name, {}).get(_labels(labels))
+
+    def latency(self, stage: str) -> Dict[str, Optional[float]]:
+        """p50 and p95 latency of ``stage`` in seconds, or None before its first call."""
+        histogram = self.histogram("quickdata_stage_seconds", stage=stage)
+        if histogram is None:
+            return {"p50": None, "p95": None}
+        with self._lock:
+            return {"p50": histogram.quantile(0.5), "p95": histogram.quantile(0.95)}
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "uptime_seconds": time.time() - self.started,
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self.counters.items()
+                },
+                "gauges": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self.gauges.items()
+                },
+                "histograms": {
+                    name: [{"labels": dict(key), **histogram.snapshot()} for key, histogram in series.items()]
+                    for name, series in self.histograms.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self.gauges.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Writes Prometheus text for ``.prom``/``.txt`` paths, JSON otherwise."""
+        if path.endswith((".prom", ".txt")):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+metrics = MetricsRegistry()
+
+
+class EntityTrace:
+    """Spans recorded while one entity is enriched."""
+
+    def __init__(self, entity: Any, column: Any):
+        self.entity = entity
+        self.column = column
+        self.start = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.errors: List[str] = []
+
+    def add_span(self, stage: str, seconds: float):
+        self.spans.append({"stage": stage, "seconds": round(seconds, 6)})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "entity": str(self.entity),
+            "column": str(self.column),
+            "start": self.start,
+            "seconds": round(time.time() - self.start, 6),
+            "spans": self.spans,
+            "errors": self.errors,
+        }
+
+
+_current = threading.local()
+
+
+def current_trace() -> Optional[EntityTrace]:
+    return getattr(_current, "trace", None)
+
+
+@contextmanager
+def active_trace(trace: Optional[EntityTrace]) -> Iterator[None]:
+    """Collects the spans recorded on this thread into ``trace`` until the block ends.
+
+    Lets an entity's stages run on different threads and still share one trace.
+    """
+    previous = current_trace()
+    _current.trace = trace
+    try:
+        yield
+    finally:
+        _current.trace = previous
+
+
+class Tracer:
+    """Appends one JSON line per enriched entity, with the time spent in each stage."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, entity: Any, column: Any) -> Iterator[EntityTrace]:
+        """Collects the spans recorded on this thread until the block ends."""
+        trace = EntityTrace(entity, column)
+        try:
+            with active_trace(trace):
+                yield trace
+        finally:
+            self.write(trace)
+
+    def write(self, trace: EntityTrace):
+        line = json.dumps(trace.as_dict())
+        with self._lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self._lock:
+            self.file.close()
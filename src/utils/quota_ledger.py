@@ -0,0 +1,58 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterator, Optional
+
+
+def create_quota_ledger(quota_config: Optional[Dict]) -> Optional["QuotaLedger"]:
+    """Opens the ledger described by the ``quota`` config, or None when sharing is off."""
+    quota_config = quota_config or {}
+    if not quota_config.get("enabled", False):
+        return None
+    return QuotaLedger(quota_config.get("path", ".cache/quota.sqlite3"))
+
+
+class QuotaLedger:
+    """Rate-limit buckets kept in SQLite so every process draws from one quota.
+
+    Each UI session and worker that opens the same file shares its SerpAPI
+    and Groq allowance, including the rate adaptive limiters settled on.
+    Updates run in ``BEGIN IMMEDIATE`` transactions, so two processes never
+    spend the same tokens.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, last_update REAL NOT NULL, "
+            "rate REAL, last_decrease REAL)"
+        )
+        # Ledgers created before adaptive limits were shared lack the rate columns
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(buckets)")}
+        for column in ("rate", "last_decrease"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE buckets ADD COLUMN {column} REAL")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Holds the ledger's write lock across processes until the block ends."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
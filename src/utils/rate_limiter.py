@@ -1,30 +1,354 @@
+import asyncio
+import re
 import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
 from threading import Lock
+from typing import Dict, Hashable, Iterator, Mapping, Optional
+
+from utils.metrics import metrics
+from utils.quota_ledger import QuotaLedger
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Parses ``"12"``, ``"7.5s"``, ``"250ms"`` or ``"1m30.5s"`` into seconds."""
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+
+def parse_retry_delay(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After or rate-limit headers.
+
+    Understands ``Retry-After`` (seconds or HTTP date), ``retry-after-ms`` and
+    the ``x-ratelimit-remaining-requests`` / ``x-ratelimit-reset-requests``
+    pair sent by Groq and other OpenAI-compatible APIs.
+    """
+    if not headers:
+        return None
+    headers = {k.lower(): v for k, v in headers.items()}
+
+    if "retry-after-ms" in headers:
+        delay = _parse_duration(headers["retry-after-ms"])
+        if delay is not None:
+            return delay / 1000
+    if "retry-after" in headers:
+        delay = _parse_duration(headers["retry-after"])
+        if delay is not None:
+            return delay
+        try:
+            return max(0.0, parsedate_to_datetime(headers["retry-after"]).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    if headers.get("x-ratelimit-remaining-requests", "").strip() == "0":
+        return _parse_duration(headers.get("x-ratelimit-reset-requests", ""))
+    return None
 
 
 class RateLimiter:
-    def __init__(self, rate: int, per: int = 60):
+    """Token bucket allowing ``rate`` requests every ``per`` seconds.
+
+    Callers reserve tokens up front and then sleep exactly until their
+    reservation is covered, so waiters never poll and are served in the
+    order they arrived. The same bucket can be shared by threads
+    (``acquire``) and coroutines (``acquire_async``).
+
+    A limiter with a ``name`` reports its rate and the 429s it saw to the
+    metrics registry, labelled ``limiter=name``.
+    """
+
+    def __init__(self, rate: float, per: float = 60, capacity: Optional[float] = None, name: str = ""):
+        if rate <= 0 or per <= 0:
+            raise ValueError("rate and per must be positive")
         self.rate = rate  # Number of requests
         self.per = per  # Per X seconds
-        self.tokens = rate
-        self.last_update = time.time()
+        self.capacity = capacity if capacity is not None else rate  # Burst size
+        self.name = name
+        self.tokens = self.capacity
+        self.last_update = self._clock()
+        self.throttled = 0
         self.lock = Lock()
+        self._publish_rate()
+
+    _clock = staticmethod(time.monotonic)
 
-    def _add_tokens(self):
-        now = time.time()
+    @contextmanager
+    def _bucket(self) -> Iterator[None]:
+        """Guards ``tokens`` and ``last_update`` while they are read and changed."""
+        with self.lock:
+            yield
+
+    def _add_tokens(self, now: float):
         time_passed = now - self.last_update
-        new_tokens = time_passed * (self.rate / self.per)
-        self.tokens = min(self.rate, self.tokens + new_tokens)
+        self.tokens = min(self.capacity, self.tokens + time_passed * (self.rate / self.per))
         self.last_update = now
 
-    def acquire(self):
-        with self.lock:
-            self._add_tokens()
-            if self.tokens >= 1:
-                self.tokens -= 1
-                return True
+    def _reserve(self, n: float, timeout: Optional[float]) -> Optional[float]:
+        """Debits ``n`` tokens and returns how long to sleep, or None if over ``timeout``."""
+        if n > self.capacity:
+            raise ValueError(f"Cannot acquire {n} tokens from a bucket of {self.capacity}")
+        with self._bucket():
+            self._add_tokens(self._clock())
+            delay = max(0.0, n - self.tokens) * self.per / self.rate
+            if timeout is not None and delay > timeout:
+                return None
+            self.tokens -= n
+            return delay
+
+    def set_rate(self, rate: float):
+        with self._bucket():
+            # Settle tokens earned at the old rate before switching
+            self._add_tokens(self._clock())
+            self.rate = rate
+            self._publish_rate()
+
+    def _publish_rate(self):
+        if self.name:
+            metrics.set("quickdata_rate_limit_per_minute", self.effective_rate, limiter=self.name)
+
+    def defer(self, seconds: float):
+        """Makes the next token available no sooner than ``seconds`` from now."""
+        with self._bucket():
+            self._add_tokens(self._clock())
+            self.tokens = min(self.tokens, 0.0 - seconds * self.rate / self.per)
+
+    def observe(self, status_code: int, headers: Optional[Mapping[str, str]] = None):
+        """Feeds back an API response so server-requested pauses are honoured."""
+        delay = parse_retry_delay(headers)
+        if status_code == 429:
+            self.throttled += 1
+            if self.name:
+                metrics.inc("quickdata_rate_limit_throttled_total", limiter=self.name)
+            if delay is None:
+                # No hint from the server: skip at least one refill interval
+                delay = self.per / self.rate
+        if delay:
+            self.defer(delay)
+
+    @property
+    def effective_rate(self) -> float:
+        """Current allowance in requests per minute."""
+        return self.rate * 60 / self.per
+
+    def stats(self) -> Dict[str, float]:
+        return {"rate_per_minute": self.effective_rate, "throttled": self.throttled}
+
+    def _refund(self, n: float):
+        with self._bucket():
+            self._add_tokens(self._clock())
+            self.tokens = min(self.capacity, self.tokens + n)
+
+    def acquire(self, n: float = 1, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        """Takes ``n`` tokens, sleeping until they are available.
+
+        With ``blocking=False`` (or a ``timeout`` that is too short) nothing is
+        taken and False is returned instead of waiting.
+        """
+        delay = self._reserve(n, timeout if blocking else 0)
+        if delay is None:
             return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    def try_acquire(self, n: float = 1) -> bool:
+        return self.acquire(n, blocking=False)
 
     def wait(self):
-        while not self.acquire():
-            time.sleep(0.1)
+        self.acquire()
+
+    async def acquire_async(self, n: float = 1, timeout: Optional[float] = None) -> bool:
+        delay = self._reserve(n, timeout)
+        if delay is None:
+            return False
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._refund(n)
+                raise
+        return True
+
+    async def wait_async(self):
+        await self.acquire_async()
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """RateLimiter that tunes its own rate from API responses (AIMD).
+
+    Every successful response nudges the rate up so that a full window of
+    successes adds ``increase`` requests per ``per``; a 429 multiplies it by
+    ``decrease_factor``. Bursts of 429s from requests already in flight
+    only cut the rate once per refill interval.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        per: float = 60,
+        min_rate: float = 1,
+        max_rate: Optional[float] = None,
+        increase: float = 1,
+        decrease_factor: float = 0.5,
+        name: str = "",
+    ):
+        super().__init__(rate, per, capacity=rate, name=name)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.last_decrease = float("-inf")
+
+    def _clamp(self, rate: float) -> float:
+        if self.max_rate is not None:
+            rate = min(rate, self.max_rate)
+        return max(self.min_rate, rate)
+
+    def _adapt(self, status_code: int):
+        """Applies one AIMD step; runs inside ``_bucket`` so the rate is read and changed together."""
+        now = self._clock()
+        if status_code == 429:
+            if now - self.last_decrease < self.per / self.rate:
+                return
+            self.last_decrease = now
+            rate = self.rate * self.decrease_factor
+        else:
+            rate = self.rate + self.increase / self.rate
+        # Settle tokens earned at the old rate before switching
+        self._add_tokens(now)
+        self.rate = self._clamp(rate)
+        self._publish_rate()
+
+    def observe(self, status_code: int, headers: Optional[Mapping[str, str]] = None):
+        super().observe(status_code, headers)
+        if status_code == 429 or 200 <= status_code < 300:
+            with self._bucket():
+                self._adapt(status_code)
+
+
+class SharedRateLimiter(RateLimiter):
+    """RateLimiter whose bucket lives in a QuotaLedger shared with other processes.
+
+    Every limiter opened with the same ledger and ``name`` spends from one
+    bucket, so any number of workers together stay under ``rate``. A pause
+    requested by the API (429 or Retry-After) holds back all of them.
+    Wall-clock time is used because monotonic clocks differ per process.
+    """
+
+    _clock = staticmethod(time.time)
+
+    def __init__(self, ledger: QuotaLedger, name: str, rate: float, per: float = 60, capacity: Optional[float] = None):
+        self.ledger = ledger
+        super().__init__(rate, per, capacity, name)
+
+    def _load(self, row: tuple):
+        """Takes the shared state from a ``buckets`` row (tokens, last_update, rate, last_decrease)."""
+        self.tokens, self.last_update = row[0], row[1]
+
+    def _saved(self) -> Dict[str, float]:
+        """Columns written back to the ledger; a fixed-rate limiter leaves the shared rate alone."""
+        return {"tokens": self.tokens, "last_update": self.last_update}
+
+    @contextmanager
+    def _bucket(self) -> Iterator[None]:
+        with self.ledger.transaction() as conn:
+            row = conn.execute(
+                "SELECT tokens, last_update, rate, last_decrease FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            if row is not None:
+                self._load(row)
+            yield
+            saved = self._saved()
+            columns = ", ".join(saved)
+            updates = ", ".join(f"{column} = excluded.{column}" for column in saved)
+            conn.execute(
+                f"INSERT INTO buckets (name, {columns}) VALUES (?{', ?' * len(saved)}) "
+                f"ON CONFLICT(name) DO UPDATE SET {updates}",
+                (self.name, *saved.values()),
+            )
+
+
+class SharedAdaptiveRateLimiter(SharedRateLimiter, AdaptiveRateLimiter):
+    """AdaptiveRateLimiter whose bucket and learned rate live in a QuotaLedger.
+
+    The rate is adapted inside the same ledger transaction as the tokens, so
+    a 429 seen by one process slows every process sharing ``name``, and a
+    burst of 429s across processes still cuts the rate only once.
+    """
+
+    def __init__(self, ledger: QuotaLedger, name: str, rate: float, per: float = 60, **adaptive):
+        self.ledger = ledger
+        AdaptiveRateLimiter.__init__(self, rate, per, name=name, **adaptive)
+
+    def _load(self, row: tuple):
+        super()._load(row)
+        if row[2] is not None:
+            # Clamped in case this process was configured with tighter bounds
+            self.rate = self._clamp(row[2])
+            self.last_decrease = row[3]
+            # Other processes may have moved it
+            self._publish_rate()
+
+    def _saved(self) -> Dict[str, float]:
+        return {**super()._saved(), "rate": self.rate, "last_decrease": self.last_decrease}
+
+
+def create_rate_limiter(
+    rate: float,
+    per: float = 60,
+    adaptive_config: Optional[Dict] = None,
+    quota_ledger: Optional[QuotaLedger] = None,
+    name: str = "",
+) -> RateLimiter:
+    """Builds a static or adaptive limiter from an ``adaptive_rate`` config block.
+
+    With a ``quota_ledger`` the limiter is shared with every process using the
+    same ledger and ``name``, including the adapted rate.
+    """
+    adaptive_config = adaptive_config or {}
+    enabled = adaptive_config.get("enabled", False)
+    if not enabled:
+        if quota_ledger is not None:
+            return SharedRateLimiter(quota_ledger, name, rate, per)
+        return RateLimiter(rate, per, name=name)
+    adaptive = {
+        "min_rate": adaptive_config.get("min_rate", 1),
+        "max_rate": adaptive_config.get("max_rate"),
+        "increase": adaptive_config.get("increase", 1),
+        "decrease_factor": adaptive_config.get("decrease_factor", 0.5),
+    }
+    if quota_ledger is not None:
+        return SharedAdaptiveRateLimiter(quota_ledger, name, rate, per, **adaptive)
+    return AdaptiveRateLimiter(rate, per, name=name, **adaptive)
+
+
+class KeyedRateLimiter:
+    """One independent RateLimiter per key, e.g. per API key or endpoint."""
+
+    def __init__(self, rate: float, per: float = 60, capacity: Optional[float] = None):
+        self.rate = rate
+        self.per = per
+        self.capacity = capacity
+        self.buckets: Dict[Hashable, RateLimiter] = {}
+        self.lock = Lock()
+
+    def bucket(self, key: Hashable) -> RateLimiter:
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = RateLimiter(self.rate, self.per, self.capacity)
+            return self.buckets[key]
+
+    def acquire(self, key: Hashable, n: float = 1, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        return self.bucket(key).acquire(n, blocking, timeout)
+
+    async def acquire_async(self, key: Hashable, n: float = 1, timeout: Optional[float] = None) -> bool:
+        return await self.bucket(key).acquire_async(n, timeout)
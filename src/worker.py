@@ -0,0 +1,100 @@
+"""Queue worker: enriches the batches of jobs submitted to the worker queue.
+
+Start one per core or machine; every worker that opens the same job store
+takes batches from it, and with ``quota.enabled`` they share one SerpAPI
+and Groq allowance. Other hosts need the ``jobs`` and ``quota`` files on a
+shared filesystem.
+
+Example:
+
+    ./quickdata-worker --idle-exit 300
+"""
+import argparse
+import sys
+
+from cli import load_config
+from services.enrichment import create_engine
+from services.job_queue import QueueWorker, create_job_queue, default_worker_id
+from services.job_store import create_job_store
+from services.llm_service import create_llm_service
+from services.search_service import create_search_service
+from utils.metrics import Tracer, metrics
+from utils.quota_ledger import create_quota_ledger
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="quickdata-worker",
+        description="Process batches of queued QuickData jobs until stopped.",
+    )
+    parser.add_argument("--config", default="config/config.yaml", help="config file (default: %(default)s)")
+    parser.add_argument("--worker-id", default=default_worker_id(), help="name in leases (default: host-pid)")
+    parser.add_argument("--max-workers", type=int, help="entities enriched in parallel")
+    parser.add_argument(
+        "--idle-exit", type=float, metavar="SECONDS", help="stop after the queue has been empty this long"
+    )
+    parser.add_argument(
+        "--metrics", metavar="FILE", help="write metrics here on exit (.prom for Prometheus text, else JSON)"
+    )
+    parser.add_argument("--trace", metavar="FILE", help="append one JSON line per entity with time spent per stage")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print finished batches")
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace) -> int:
+    config = load_config(args.config)
+    for key in ("serpapi", "groq"):
+        if not config["api_keys"].get(key):
+            raise Exception(f"Missing API key: set {key.upper()}_API_KEY in the environment or .env")
+    if args.max_workers is not None:
+        config.setdefault("processing", {})["max_workers"] = args.max_workers
+
+    queue_config = config.get("queue", {})
+    job_store = create_job_store(config.get("jobs", {}))
+    job_queue = create_job_queue(job_store, queue_config)
+    quota_ledger = create_quota_ledger(config.get("quota"))
+    search_service = create_search_service(config["api_keys"]["serpapi"], config.get("search", {}), quota_ledger)
+    llm_service = create_llm_service(config["api_keys"]["groq"], config.get("llm", {}), quota_ledger)
+    tracer = Tracer(args.trace) if args.trace else None
+
+    def make_engine(params):
+        llm_config = {**config.get("llm", {}), "structured_output": params.get("structured_output", False)}
+        return create_engine(search_service, llm_service, {**config, "llm": llm_config}, tracer)
+
+    def report(lease, count):
+        if not args.quiet:
+            print(
+                f"{args.worker_id}: job {lease.job_id[:8]} batch {lease.batch} done "
+                f"({count} entities, {worker.processed} so far)",
+                file=sys.stderr,
+                flush=True,
+            )
+
+    worker = QueueWorker(job_store, job_queue, make_engine, args.worker_id, on_batch=report)
+    print(f"{args.worker_id}: waiting for batches in {job_store.path}", file=sys.stderr, flush=True)
+    try:
+        worker.run(queue_config.get("poll_seconds", 2), args.idle_exit)
+    finally:
+        search_service.close()
+        if tracer is not None:
+            tracer.close()
+        if args.metrics:
+            metrics.write(args.metrics)
+    print(f"{args.worker_id}: enriched {worker.processed} entities", file=sys.stderr)
+    return 0
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        return run(args)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import os
+import tempfile
+import time
+import unittest
+
+import pandas as pd
+
+from src.services.background_job import BackgroundJob, JobRegistry
+from src.services.enrichment import EnrichmentEngine, plan_tasks
+from src.services.job_store import JobStore, partial_rows, run_job
+from src.services.service_pool import ServicePool
+from tests.test_enrichment import StubLLMService, StubSearchService
+
+
+class SlowLLMService(StubLLMService):
+    def __init__(self, delay=0.02):
+        super().__init__()
+        self.delay = delay
+
+    def extract_multiple_information(self, search_results, prompt_templates):
+        time.sleep(self.delay)
+        return super().extract_multiple_information(search_results, prompt_templates)
+
+
+class ListWriter:
+    """Buffers rows like SheetResultWriter; ``rows`` is what has reached the sink."""
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.rows = []
+        self.closed = False
+
+    def write(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        self.rows.extend(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.closed = True
+
+
+class TestBackgroundJob(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = JobStore(os.path.join(self.tmpdir.name, "jobs.sqlite3"))
+        data = pd.DataFrame({"company": [f"c{i % 30}" for i in range(40)]})
+        self.plan = plan_tasks(data, ["company"], "Find {entity}")
+        self.job_id = self.store.create_job({"prompts": ["prompt"]}, self.plan)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def engine(self, delay=0.02):
+        return EnrichmentEngine(StubSearchService(), SlowLLMService(delay), max_workers=2)
+
+    def expected_rows(self):
+        other = self.store.create_job({"prompts": ["prompt"]}, self.plan)
+        return run_job(self.engine(delay=0), self.store, other)
+
+    def wait_for(self, job, done):
+        deadline = time.monotonic() + 10
+        while job.progress()["done"] < done and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_runs_to_completion(self):
+        writer = ListWriter()
+        closed = []
+        job = BackgroundJob(self.store, self.job_id, self.engine(), writer=writer, on_close=lambda: closed.append(1))
+
+        job.start()
+        self.assertTrue(job.wait(10))
+
+        self.assertEqual(job.status, "complete")
+        self.assertEqual(self.store.get_job(self.job_id)["status"], "complete")
+        self.assertEqual(job.rows, self.expected_rows())
+        self.assertEqual(writer.rows, job.rows)
+        self.assertTrue(writer.closed)
+        self.assertEqual(closed, [1])
+        progress = job.progress()
+        self.assertEqual((progress["done"], progress["total"], progress["processed"]), (30, 30, 30))
+
+    def test_pause_and_resume_write_each_row_once(self):
+        writer = ListWriter()
+        job = BackgroundJob(self.store, self.job_id, self.engine(), writer=writer)
+
+        job.start()
+        self.wait_for(job, 5)
+        job.pause()
+        self.assertTrue(job.wait(10))
+
+        self.assertEqual(job.status, "paused")
+        self.assertEqual(self.store.get_job(self.job_id)["status"], "paused")
+        done = self.store.get_job(self.job_id)["completed"]
+        self.assertLess(done, 30)
+        self.assertFalse(writer.closed)
+        # Every entity that started before the pause was recorded
+        self.assertEqual(done, job.progress()["done"])
+        # and every row finished in sheet order reached the sink
+        self.assertTrue(job.rows)
+        self.assertEqual(writer.rows, job.rows)
+
+        job.resume()
+        self.assertTrue(job.wait(10))
+
+        self.assertEqual(job.status, "complete")
+        self.assertEqual(writer.rows, self.expected_rows())
+        self.assertTrue(writer.closed)
+
+    def test_cancel_keeps_partial_results(self):
+        writer = ListWriter()
+        job = BackgroundJob(self.store, self.job_id, self.engine(), writer=writer)
+
+        job.start()
+        self.wait_for(job, 5)
+        job.cancel()
+        self.assertTrue(job.wait(10))
+
+        self.assertEqual(job.status, "cancelled")
+        self.assertEqual(self.store.get_job(self.job_id)["status"], "cancelled")
+        self.assertTrue(writer.closed)
+        rows = partial_rows(self.store, self.job_id)
+        done = self.store.completed_results(self.job_id)
+        self.assertGreaterEqual(len(done), 5)
+        self.assertEqual(len(rows), sum(task_index in done for task_index in self.plan.assignments))
+        self.assertEqual(rows, [row for row in self.expected_rows() if row in rows])
+        with self.assertRaises(Exception):
+            job.start()
+
+    def test_cancel_while_paused(self):
+        writer = ListWriter()
+        job = BackgroundJob(self.store, self.job_id, self.engine(), writer=writer)
+        job.start()
+        job.pause()
+        job.wait(10)
+
+        job.cancel()
+
+        self.assertEqual(job.status, "cancelled")
+        self.assertEqual(self.store.get_job(self.job_id)["status"], "cancelled")
+        self.assertTrue(writer.closed)
+
+    def test_job_slot_is_held_only_while_running(self):
+        pool = ServicePool(StubSearchService(), StubLLMService())
+        job = BackgroundJob(self.store, self.job_id, self.engine(), guard=lambda: pool.job("alice"))
+
+        job.start()
+        self.assertEqual(pool.stats()["jobs"], 1)
+        with self.assertRaises(Exception):
+            with pool.job("alice"):
+                pass
+        job.pause()
+        job.wait(10)
+
+        self.assertEqual(pool.stats()["jobs"], 0)
+
+    def test_registry_reattaches_live_job(self):
+        registry = JobRegistry()
+        started = []
+
+        def start():
+            job = BackgroundJob(self.store, self.job_id, self.engine())
+            job.start()
+            started.append(job)
+            return job
+
+        job = registry.run(self.job_id, start)
+        job.pause()
+        job.wait(10)
+        self.assertIs(registry.get(self.job_id), job)
+
+        # Another session resuming the job gets the same run back
+        self.assertIs(registry.run(self.job_id, start), job)
+        self.assertTrue(job.wait(10))
+        self.assertEqual(len(started), 1)
+        self.assertEqual(job.rows, self.expected_rows())
+        self.assertIsNone(registry.get(self.job_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
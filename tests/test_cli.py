@@ -0,0 +1,106 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from unittest.mock import patch
+
+import pandas as pd
+import yaml
+
+import src.cli as cli
+from tests.test_enrichment import StubLLMService, StubSearchService
+
+
+class ClosableStubSearchService(StubSearchService):
+    def close(self):
+        pass
+
+
+class TestCLI(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmpdir.name, "companies.csv")
+        pd.DataFrame({"name": ["Acme", "Globex", "acme", "Initech"]}).to_csv(self.input_path, index=False)
+        self.config_path = os.path.join(self.tmpdir.name, "config.yaml")
+        with open(self.config_path, "w") as f:
+            yaml.safe_dump(
+                {"api_keys": {}, "processing": {"max_workers": 2}, "jobs": {"directory": self.tmpdir.name}}, f
+            )
+
+        patches = [
+            patch.object(cli, "load_env_variables"),
+            patch.object(cli, "get_env_variable", return_value="key"),
+            patch.object(cli, "create_search_service", return_value=ClosableStubSearchService()),
+            patch.object(cli, "create_llm_service", return_value=StubLLMService()),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_cli(self, *extra):
+        argv = [
+            "--csv", self.input_path,
+            "-c", "name",
+            "-p", "Find the email",
+            "--query-template", "Find {entity}",
+            "--config", self.config_path,
+            "-q",
+            *extra,
+        ]
+        with redirect_stderr(io.StringIO()) as stderr:
+            code = cli.main(argv)
+        return code, stderr.getvalue()
+
+    def test_writes_csv(self):
+        output = os.path.join(self.tmpdir.name, "out.csv")
+
+        code, stderr = self.run_cli("-o", output, "--start-row", "1")
+
+        self.assertEqual(code, 0)
+        self.assertIn("wrote 3 rows", stderr)
+        result = pd.read_csv(output)
+        self.assertEqual(list(result["Row"]), [1, 2, 3])
+        self.assertEqual(list(result["Extracted Information"]), ["FIND GLOBEX", "FIND ACME", "FIND INITECH"])
+
+    def test_writes_parquet(self):
+        output = os.path.join(self.tmpdir.name, "out.parquet")
+
+        code, _ = self.run_cli("-o", output)
+
+        self.assertEqual(code, 0)
+        result = pd.read_parquet(output)
+        self.assertEqual(list(result["Entity"]), ["Acme", "Globex", "acme", "Initech"])
+        self.assertEqual(result["Extracted Information"][2], "FIND ACME")
+
+    def test_unknown_column_fails(self):
+        code, stderr = self.run_cli("-o", os.path.join(self.tmpdir.name, "out.csv"), "-c", "missing")
+
+        self.assertEqual(code, 1)
+        self.assertIn("Columns not found: missing", stderr)
+
+    def test_incremental_reuses_unchanged_rows(self):
+        output = os.path.join(self.tmpdir.name, "out.csv")
+        self.run_cli("-o", output, "--incremental")
+        pd.DataFrame({"name": ["Acme", "Globex", "Hooli", "Initech"]}).to_csv(self.input_path, index=False)
+
+        code, stderr = self.run_cli("-o", output, "--incremental")
+
+        self.assertEqual(code, 0)
+        self.assertIn("1 new or changed rows, 3 unchanged", stderr)
+        self.assertIn("1 cells, 1 unique entities", stderr)
+        result = pd.read_csv(output)
+        self.assertEqual(list(result["Row"]), [0, 1, 2, 3])
+        self.assertEqual(list(result["Extracted Information"]), ["FIND ACME", "FIND GLOBEX", "FIND HOOLI", "FIND INITECH"])
+
+    def test_format_prompt(self):
+        self.assertEqual(cli.format_prompt("Find the email"), "Find the email of {entity}")
+        self.assertEqual(cli.format_prompt("Who founded {entity}?"), "Who founded {entity}?")
+        self.assertEqual(cli.parse_sheet_id("https://docs.google.com/spreadsheets/d/abc/edit"), "abc")
+
+
+if __name__ == "__main__":
+    unittest.main()
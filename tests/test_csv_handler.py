@@ -1,9 +1,16 @@
 import unittest
-from io import StringIO
+from io import BytesIO, StringIO
 
 import pandas as pd
 
-from services.csv_handler import process_csv_data, read_csv
+from services.csv_handler import (
+    count_csv_rows,
+    iter_csv_chunks,
+    process_csv_data,
+    read_csv,
+    read_csv_header,
+)
+from services.enrichment import build_tasks
 
 
 class TestCSVHandler(unittest.TestCase):
@@ -35,5 +42,61 @@ class TestCSVHandler(unittest.TestCase):
         self.assertIsNone(result)
 
 
+class TestStreamingCSV(unittest.TestCase):
+    def setUp(self):
+        lines = ["id,name,notes"] + [f"{i},{'' if i % 7 == 0 else f'Company {i}'},{'x' * 50}" for i in range(500)]
+        self.data = ("\n".join(lines) + "\n").encode("utf-8")
+
+    def test_header_and_row_count(self):
+        file = BytesIO(self.data)
+
+        self.assertEqual(read_csv_header(file), ["id", "name", "notes"])
+        self.assertEqual(count_csv_rows(file, block_size=4096), 500)
+
+    def test_chunks_hold_only_selected_columns(self):
+        chunks = list(iter_csv_chunks(BytesIO(self.data), ["id", "name"], block_size=4096))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(list(chunk.columns) == ["id", "name"] for chunk in chunks))
+        combined = pd.concat(chunks)
+        self.assertEqual(list(combined.index), list(range(500)))
+        # Selected columns are read as text, and empty cells become missing values
+        self.assertEqual(combined.loc[3, "id"], "3")
+        self.assertTrue(pd.isna(combined.loc[7, "name"]))
+
+    def test_row_range(self):
+        chunks = list(iter_csv_chunks(BytesIO(self.data), ["name"], 120, 430, block_size=4096))
+
+        combined = pd.concat(chunks)
+        self.assertEqual((combined.index[0], combined.index[-1]), (120, 429))
+        self.assertEqual(combined.loc[121, "name"], "Company 121")
+
+    def test_dtype_hint(self):
+        chunk = next(iter_csv_chunks(BytesIO(self.data), ["id"], dtype={"id": "int64"}))
+
+        self.assertEqual(chunk["id"].dtype, "int64")
+
+    def test_tasks_from_chunks_match_full_load(self):
+        full = pd.read_csv(BytesIO(self.data), dtype=str)
+        chunks = iter_csv_chunks(BytesIO(self.data), ["id", "name"], block_size=4096)
+
+        streamed = build_tasks(chunks, ["id", "name"], "Find {entity}")
+        loaded = build_tasks(full, ["id", "name"], "Find {entity}")
+
+        self.assertEqual([vars(t) for t in streamed], [vars(t) for t in loaded])
+
+    def test_quoted_newlines_across_blocks(self):
+        lines = ["id,address"] + [f'{i},"{i} Main St\nSuite {i}\nSpringfield"' for i in range(500)]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+
+        self.assertEqual(count_csv_rows(BytesIO(data), block_size=4096), 500)
+        chunks = list(iter_csv_chunks(BytesIO(data), ["id", "address"], 10, block_size=4096))
+        self.assertGreater(len(chunks), 1)
+        combined = pd.concat(chunks)
+        expected = pd.read_csv(BytesIO(data), dtype=str).iloc[10:]
+        self.assertEqual(list(combined["address"]), list(expected["address"]))
+        self.assertEqual(list(combined.index), list(expected.index))
+
+
 if __name__ == "__main__":
     unittest.main()
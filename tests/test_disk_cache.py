@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.utils.disk_cache import DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "nested", "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_and_counters(self):
+        cache = DiskCache(self.path)
+        self.assertIsNone(cache.get("missing"))
+        cache.set("key", [{"url": "http://example.com", "snippet": "text"}])
+
+        self.assertEqual(cache.get("key"), [{"url": "http://example.com", "snippet": "text"}])
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "entries": 1})
+        cache.close()
+
+    def test_persists_across_instances(self):
+        cache = DiskCache(self.path)
+        cache.set("key", {"value": 1})
+        cache.close()
+
+        reopened = DiskCache(self.path)
+        self.assertEqual(reopened.get("key"), {"value": 1})
+        reopened.close()
+
+    def test_shares_the_file_in_wal_mode(self):
+        first, second = DiskCache(self.path), DiskCache(self.path)
+        first.set("key", "value")
+
+        self.assertEqual(second.get("key"), "value")
+        self.assertEqual(first.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        first.close()
+        second.close()
+
+    @patch("src.utils.disk_cache.time.time")
+    def test_ttl_expiry(self, mock_time):
+        mock_time.return_value = 1000.0
+        cache = DiskCache(self.path, ttl=60)
+        cache.set("key", "value")
+
+        mock_time.return_value = 1059.0
+        self.assertEqual(cache.get("key"), "value")
+
+        mock_time.return_value = 1061.0
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+    @patch("src.utils.disk_cache.time.time")
+    def test_lru_eviction(self, mock_time):
+        cache = DiskCache(self.path, max_entries=2)
+        mock_time.return_value = 1.0
+        cache.set("a", 1)
+        mock_time.return_value = 2.0
+        cache.set("b", 2)
+        mock_time.return_value = 3.0
+        cache.get("a")
+        mock_time.return_value = 4.0
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,313 @@
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from src.services.enrichment import (
+    EnrichmentEngine,
+    EnrichmentTask,
+    build_tasks,
+    normalize_entity,
+    plan_tasks,
+)
+
+
+class StubSearchService:
+    def __init__(self, delay=0.0, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def search(self, query, max_results=3):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            # Later queries finish first so completion order differs from input order
+            time.sleep(self.delay / (1 + len(query) % 5))
+            if query == self.fail_on:
+                raise Exception("Search error: boom")
+            return [{"url": f"http://example.com/{query}", "snippet": query}]
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class StubLLMService:
+    def __init__(self):
+        self.batches = []
+
+    def extract_multiple_information(self, search_results, prompt_templates):
+        return {"result": search_results[0]["snippet"].upper(), "status": "success"}
+
+    def extract_batch(self, items, prompt_templates, max_entities=8, max_prompt_tokens=6000):
+        self.batches.append([entity for entity, _ in items])
+        return [self.extract_multiple_information(results, prompt_templates) for _, results in items]
+
+
+class TestEnrichmentEngine(unittest.TestCase):
+    def test_build_tasks_skips_missing_values(self):
+        data = pd.DataFrame({"name": ["Acme", None, "Globex"], "city": ["Paris", "Rome", None]})
+        tasks = build_tasks(data, ["name", "city"], "Find {entity}")
+
+        self.assertEqual(
+            [(t.row, t.column, t.entity, t.query) for t in tasks],
+            [
+                (0, "name", "Acme", "Find Acme"),
+                (2, "name", "Globex", "Find Globex"),
+                (0, "city", "Paris", "Find Paris"),
+                (1, "city", "Rome", "Find Rome"),
+            ],
+        )
+
+    def test_run_preserves_task_order(self):
+        engine = EnrichmentEngine(StubSearchService(delay=0.02), StubLLMService(), max_workers=4)
+        tasks = [EnrichmentTask("name", f"e{i}", "q" * (i + 1)) for i in range(12)]
+
+        rows = list(engine.run(tasks, ["prompt"]))
+
+        self.assertEqual([row["Entity"] for row in rows], [t.entity for t in tasks])
+        self.assertEqual(rows[2]["Extracted Information"], "QQQ")
+        self.assertEqual(rows[2]["Sources"], "http://example.com/qqq")
+
+    def test_run_reports_progress_for_every_task(self):
+        engine = EnrichmentEngine(StubSearchService(), StubLLMService(), max_workers=3)
+        tasks = [EnrichmentTask("name", f"e{i}", f"q{i}") for i in range(5)]
+        progress = []
+
+        list(engine.run(tasks, ["prompt"], on_progress=lambda done, total, row: progress.append((done, total))))
+
+        self.assertEqual(progress, [(i, 5) for i in range(1, 6)])
+
+    def test_search_concurrency_is_bounded(self):
+        search = StubSearchService(delay=0.02)
+        engine = EnrichmentEngine(search, StubLLMService(), max_workers=8, search_concurrency=2)
+        tasks = [EnrichmentTask("name", f"e{i}", f"q{i}") for i in range(10)]
+
+        list(engine.run(tasks, ["prompt"]))
+
+        self.assertLessEqual(search.peak, 2)
+
+    def test_search_error_is_recorded_per_row(self):
+        engine = EnrichmentEngine(StubSearchService(fail_on="bad"), StubLLMService())
+        tasks = [EnrichmentTask("name", "ok", "ok"), EnrichmentTask("name", "bad", "bad")]
+
+        rows = list(engine.run(tasks, ["prompt"]))
+
+        self.assertEqual(rows[0]["Extracted Information"], "OK")
+        self.assertIn("Search error: boom", rows[1]["Extracted Information"])
+        self.assertEqual(rows[1]["Sources"], "")
+
+    def test_batched_llm_calls(self):
+        llm = StubLLMService()
+        engine = EnrichmentEngine(StubSearchService(delay=0.01), llm, max_workers=4, llm_batch_size=4)
+        tasks = [EnrichmentTask("name", f"e{i}", f"q{i}") for i in range(10)]
+
+        rows = list(engine.run(tasks, ["prompt"]))
+
+        self.assertEqual([row["Extracted Information"] for row in rows], [f"Q{i}" for i in range(10)])
+        self.assertEqual(sorted(len(batch) for batch in llm.batches), [2, 4, 4])
+
+    def test_batched_search_error_is_recorded(self):
+        engine = EnrichmentEngine(StubSearchService(fail_on="bad"), StubLLMService(), llm_batch_size=2)
+        tasks = [EnrichmentTask("name", "ok", "ok"), EnrichmentTask("name", "bad", "bad")]
+
+        rows = list(engine.run(tasks, ["prompt"]))
+
+        self.assertEqual(rows[0]["Extracted Information"], "OK")
+        self.assertIn("Search error: boom", rows[1]["Extracted Information"])
+
+    def test_batches_start_before_every_search_is_done(self):
+        search = CountingSearchService()
+        search.delay = 0.01
+        engine = EnrichmentEngine(search, StubLLMService(), max_workers=4, search_concurrency=2, llm_batch_size=3)
+        tasks = [EnrichmentTask("name", f"e{i}", f"q{i}") for i in range(40)]
+        searched_at_first_row = []
+
+        def on_progress(done, total, row):
+            if done == 1:
+                searched_at_first_row.append(search.calls)
+
+        rows = list(engine.run(tasks, ["prompt"], on_progress=on_progress))
+
+        self.assertEqual(len(rows), 40)
+        # The first batch, plus the lookahead searched while it was extracted: not the whole sheet
+        self.assertLessEqual(searched_at_first_row[0], 3 + (3 + 2))
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            EnrichmentEngine(StubSearchService(), StubLLMService(), max_workers=0)
+
+
+class SlowLLMService(StubLLMService):
+    """Counts completions started, so tests can see how far searches run ahead."""
+
+    def __init__(self, delay, search):
+        super().__init__()
+        self.delay = delay
+        self.search = search
+        self.started = 0
+        self.max_ahead = 0
+
+    def extract_multiple_information(self, search_results, prompt_templates):
+        with self.search.lock:
+            self.started += 1
+        time.sleep(self.delay)
+        return super().extract_multiple_information(search_results, prompt_templates)
+
+
+class CountingSearchService(StubSearchService):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.llm = None
+
+    def search(self, query, max_results=3):
+        with self.lock:
+            self.calls += 1
+            if self.llm is not None:
+                self.llm.max_ahead = max(self.llm.max_ahead, self.calls - self.llm.started)
+        return super().search(query, max_results)
+
+
+class TestPipelinedEngine(unittest.TestCase):
+    def test_rows_match_the_unpipelined_engine(self):
+        tasks = [EnrichmentTask("name", f"e{i}", "q" * (i + 1)) for i in range(12)]
+        tasks.append(EnrichmentTask("name", "bad", "bad"))
+
+        def run(prefetch):
+            search = StubSearchService(delay=0.01, fail_on="bad")
+            engine = EnrichmentEngine(search, StubLLMService(), max_workers=4, prefetch=prefetch)
+            return list(engine.run(tasks, ["prompt"]))
+
+        self.assertEqual(run(prefetch=3), run(prefetch=0))
+
+    def test_searches_run_at_most_prefetch_ahead(self):
+        search = CountingSearchService()
+        llm = SlowLLMService(0.01, search)
+        search.llm = llm
+        engine = EnrichmentEngine(search, llm, max_workers=4, search_concurrency=2, llm_concurrency=1, prefetch=3)
+        tasks = [EnrichmentTask("name", f"e{i}", f"q{i}") for i in range(20)]
+
+        rows = list(engine.run(tasks, ["prompt"]))
+
+        self.assertEqual(len(rows), 20)
+        # The completion just handed to the LLM may not have started yet
+        self.assertLessEqual(llm.max_ahead, 3 + 1)
+        self.assertGreaterEqual(llm.max_ahead, 2)
+
+    def test_cancel_drains_running_completions(self):
+        search = CountingSearchService()
+        llm = SlowLLMService(0.05, search)
+        engine = EnrichmentEngine(search, llm, max_workers=4, search_concurrency=2, llm_concurrency=2, prefetch=2)
+        tasks = [EnrichmentTask("name", f"e{i}", f"q{i}") for i in range(50)]
+        recorded = []
+
+        rows = engine.run(tasks, ["prompt"], on_result=lambda index, row: recorded.append(index))
+        next(rows)
+        rows.close()
+
+        # Completions running at cancel time were still recorded; no new work was started
+        self.assertGreater(len(recorded), 1)
+        self.assertEqual(len(recorded), llm.started)
+        self.assertLess(search.calls, 10)
+
+    def test_close_keeps_running_entities_without_prefetch(self):
+        search = CountingSearchService()
+        llm = SlowLLMService(0.05, search)
+        engine = EnrichmentEngine(search, llm, max_workers=3)
+        tasks = [EnrichmentTask("name", f"e{i}", f"q{i}") for i in range(30)]
+        recorded = []
+
+        rows = engine.run(tasks, ["prompt"], on_result=lambda index, row: recorded.append(index))
+        next(rows)
+        rows.close()
+
+        self.assertEqual(len(recorded), llm.started)
+        self.assertLess(len(recorded), 10)
+
+    def test_invalid_prefetch(self):
+        with self.assertRaises(ValueError):
+            EnrichmentEngine(StubSearchService(), StubLLMService(), prefetch=-1)
+
+
+class TestPlanTasks(unittest.TestCase):
+    def setUp(self):
+        self.data = pd.DataFrame(
+            {
+                "company": ["Acme", "ACME ", "Globex", None],
+                "partner": ["acme", "Initech", "Globex", "  Acme  "],
+            }
+        )
+
+    def test_normalize_entity(self):
+        self.assertEqual(normalize_entity("  Acme\t Corp "), "acme corp")
+        self.assertEqual(normalize_entity(" Acme  Corp ", casefold=False), "Acme Corp")
+        self.assertEqual(
+            normalize_entity(" Acme  Corp ", collapse_whitespace=False), "acme  corp"
+        )
+
+    def test_duplicates_are_collapsed(self):
+        plan = plan_tasks(self.data, ["company", "partner"], "Find {entity}")
+
+        self.assertEqual([t.entity for t in plan.tasks], ["Acme", "Globex", "Initech"])
+        self.assertEqual(len(plan.cells), 7)
+        self.assertEqual(plan.calls_saved, 4)
+
+    def test_case_sensitive_dedupe(self):
+        plan = plan_tasks(self.data, ["company", "partner"], "Find {entity}", casefold=False)
+
+        self.assertEqual([t.entity for t in plan.tasks], ["Acme", "ACME ", "Globex", "acme", "Initech"])
+
+    def test_dedupe_disabled(self):
+        plan = plan_tasks(self.data, ["company", "partner"], "Find {entity}", dedupe=False)
+
+        self.assertEqual(len(plan.tasks), 7)
+        self.assertEqual(plan.calls_saved, 0)
+
+    def test_fan_out_restores_every_cell_in_sheet_order(self):
+        plan = plan_tasks(self.data, ["company", "partner"], "Find {entity}")
+        engine = EnrichmentEngine(StubSearchService(), StubLLMService())
+
+        rows = plan.fan_out(list(engine.run(plan.tasks, ["prompt"])))
+
+        self.assertEqual(
+            [(r["Row"], r["Column"], r["Entity"], r["Extracted Information"]) for r in rows],
+            [
+                (0, "company", "Acme", "FIND ACME"),
+                (1, "company", "ACME ", "FIND ACME"),
+                (2, "company", "Globex", "FIND GLOBEX"),
+                (0, "partner", "acme", "FIND ACME"),
+                (1, "partner", "Initech", "FIND INITECH"),
+                (2, "partner", "Globex", "FIND GLOBEX"),
+                (3, "partner", "  Acme  ", "FIND ACME"),
+            ],
+        )
+
+    def test_iter_fan_out_streams_cells_as_tasks_arrive(self):
+        plan = plan_tasks(self.data, ["company", "partner"], "Find {entity}")
+        rows = [{"Extracted Information": task.entity} for task in plan.tasks]
+        emitted = []
+
+        def task_rows():
+            for row in rows:
+                yield row
+                emitted.append(len(emitted))
+
+        cells = []
+        for cell in plan.iter_fan_out(task_rows()):
+            cells.append((len(emitted), cell["Entity"]))
+
+        # Cells are released as soon as the task they map to has arrived
+        self.assertEqual(
+            cells,
+            [(0, "Acme"), (0, "ACME "), (1, "Globex"), (1, "acme"), (2, "Initech"), (2, "Globex"), (2, "  Acme  ")],
+        )
+        self.assertEqual(plan.fan_out(rows), list(plan.iter_fan_out(rows)))
+
+
+if __name__ == "__main__":
+    unittest.main()
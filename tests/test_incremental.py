@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.services.enrichment import EnrichmentEngine, plan_tasks
+from src.services.incremental import IncrementalRun, fingerprint_rows
+from src.services.job_store import JobStore
+from tests.test_job_store import CountingSearchService
+from tests.test_enrichment import StubLLMService
+
+
+class TestIncrementalRun(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = JobStore(os.path.join(self.tmpdir.name, "jobs.sqlite3"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def enrich(self, data, prompts=("prompt",), key_column=None, whole_source=False):
+        run = IncrementalRun(
+            self.store, "leads.csv", ["company", "city"], list(prompts), "Find {entity}", key_column,
+            whole_source=whole_source,
+        )
+        search = CountingSearchService()
+        engine = EnrichmentEngine(search, StubLLMService())
+        plan = plan_tasks(run.filter_changed(data), ["company", "city"], "Find {entity}")
+        rows = run.merge(plan.fan_out(list(engine.run(plan.tasks, list(prompts)))))
+        return run, sorted(search.queries), rows
+
+    def test_only_new_and_changed_rows_are_enriched(self):
+        data = pd.DataFrame({"company": ["Acme", "Globex"], "city": ["Paris", "Rome"]})
+        run, queries, _ = self.enrich(data)
+        self.assertEqual(run.changed_rows, 2)
+        self.assertEqual(len(queries), 4)
+
+        data = pd.DataFrame({"company": ["Acme", "Globex Ltd", "Initech"], "city": ["Paris", "Rome", None]})
+        run, queries, rows = self.enrich(data)
+
+        self.assertEqual((run.changed_rows, run.reused_rows), (2, 1))
+        self.assertEqual(queries, ["Find Globex Ltd", "Find Initech", "Find Rome"])
+        self.assertEqual(
+            [(r["Row"], r["Column"], r["Extracted Information"]) for r in rows],
+            [
+                (0, "company", "FIND ACME"),
+                (1, "company", "FIND GLOBEX LTD"),
+                (2, "company", "FIND INITECH"),
+                (0, "city", "FIND PARIS"),
+                (1, "city", "FIND ROME"),
+            ],
+        )
+
+    def test_prompt_change_reprocesses_everything(self):
+        data = pd.DataFrame({"company": ["Acme"], "city": ["Paris"]})
+        self.enrich(data)
+
+        run, queries, _ = self.enrich(data, prompts=("other prompt",))
+
+        self.assertEqual(run.changed_rows, 1)
+        self.assertEqual(len(queries), 2)
+
+    def test_key_column_follows_moved_rows_and_drops_removed_ones(self):
+        data = pd.DataFrame({"id": ["a", "b"], "company": ["Acme", "Globex"], "city": ["Paris", "Rome"]})
+        self.enrich(data, key_column="id", whole_source=True)
+
+        moved = pd.DataFrame({"id": ["b", "c"], "company": ["Globex", "Initech"], "city": ["Rome", "Oslo"]})
+        run, queries, rows = self.enrich(moved, key_column="id", whole_source=True)
+
+        self.assertEqual(queries, ["Find Initech", "Find Oslo"])
+        self.assertEqual([(r["Row"], r["Entity"]) for r in rows if r["Column"] == "company"], [(0, "Globex"), (1, "Initech")])
+        self.assertEqual(set(self.store.row_fingerprints("leads.csv")), {"b", "c"})
+
+    def test_narrower_range_keeps_results_of_other_rows(self):
+        data = pd.DataFrame({"company": [f"c{i}" for i in range(10)], "city": [f"t{i}" for i in range(10)]})
+        counts = [self.enrich(data.iloc[start:end])[0].changed_rows for start, end in [(0, 10), (0, 5), (0, 10)]]
+
+        self.assertEqual(counts, [10, 0, 0])
+        self.assertEqual(len(self.store.row_fingerprints("leads.csv")), 10)
+
+    def test_state_round_trip(self):
+        data = pd.DataFrame({"company": ["Acme"], "city": ["Paris"]})
+        run = IncrementalRun(self.store, "leads.csv", ["company", "city"], ["prompt"], "Find {entity}")
+        list(run.filter_changed(data))
+
+        restored = IncrementalRun.from_state(self.store, run.state())
+
+        self.assertEqual(restored.rows, {"0": [0, run.rows["0"][1], True]})
+        self.assertEqual(restored.settings, run.settings)
+
+    def test_fingerprints_compare_values_as_text(self):
+        numbers = pd.DataFrame({"company": [5, 6], "city": ["Paris", None]})
+        text = pd.DataFrame({"company": ["5", "6"], "city": ["Paris", ""]})
+
+        self.assertEqual(
+            fingerprint_rows(numbers, ["company", "city"], "s"),
+            fingerprint_rows(text, ["company", "city"], "s"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
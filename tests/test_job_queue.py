@@ -0,0 +1,117 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from src.services.enrichment import EnrichmentEngine, plan_tasks
+from src.services.job_queue import JobQueue, QueueWorker
+from src.services.job_store import JobStore, run_job, stored_rows
+from tests.test_enrichment import StubLLMService, StubSearchService
+
+
+class FailingSearchService(StubSearchService):
+    def search(self, query, max_results=3):
+        raise KeyboardInterrupt
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "jobs.sqlite3")
+        self.store = JobStore(self.path)
+        self.queue = JobQueue(self.store, lease_seconds=60, max_attempts=2)
+        data = pd.DataFrame({"company": ["Acme", "Globex", "acme", "Initech", "Hooli"]})
+        self.plan = plan_tasks(data, ["company"], "Find {entity}")
+        self.params = {"source": "test.csv", "columns": ["company"], "prompts": ["prompt"]}
+        self.job_id = self.store.create_job(self.params, self.plan)
+
+    def tearDown(self):
+        self.queue.close()
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def make_engine(self, params):
+        return EnrichmentEngine(StubSearchService(), StubLLMService(), max_workers=2)
+
+    def test_workers_complete_the_job(self):
+        self.assertEqual(self.queue.submit(self.job_id, batch_size=2), 2)
+        self.assertEqual(self.store.get_job(self.job_id)["status"], "queued")
+
+        worker = QueueWorker(self.store, self.queue, self.make_engine, "w1")
+        worker.run(poll_seconds=0, idle_exit=0)
+
+        self.assertEqual(worker.processed, 4)
+        self.assertEqual(self.store.get_job(self.job_id)["status"], "complete")
+        self.assertEqual(self.queue.progress(self.job_id)["done"], 2)
+
+        local_store = JobStore(os.path.join(self.tmpdir.name, "local.sqlite3"))
+        local_job = local_store.create_job(self.params, self.plan)
+        expected = run_job(self.make_engine(self.params), local_store, local_job)
+        local_store.close()
+        self.assertEqual(stored_rows(self.store, self.job_id), expected)
+
+    def test_concurrent_workers_never_share_a_batch(self):
+        self.queue.submit(self.job_id, batch_size=1)
+        leases = []
+
+        def work(name):
+            # Separate connections, as separate processes would have
+            store = JobStore(self.path)
+            queue = JobQueue(store, lease_seconds=60)
+            while True:
+                lease = queue.lease(name)
+                if lease is None:
+                    break
+                leases.append(lease.batch)
+            queue.close()
+            store.close()
+
+        threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(leases), [0, 1, 2, 3])
+
+    def test_expired_lease_is_handed_to_another_worker(self):
+        self.queue.submit(self.job_id, batch_size=10)
+        queue = JobQueue(self.store, lease_seconds=0.01)
+        lease = queue.lease("crashed")
+        time.sleep(0.02)
+
+        retry = queue.lease("w2")
+        self.assertEqual((retry.batch, retry.attempts), (lease.batch, 2))
+        self.assertFalse(queue.heartbeat(lease, "crashed"))
+        self.assertIsNone(queue.lease("w3"))
+        queue.close()
+
+    def test_batch_fails_after_max_attempts(self):
+        self.queue.submit(self.job_id, batch_size=10)
+
+        def make_engine(params):
+            return EnrichmentEngine(FailingSearchService(), StubLLMService())
+
+        worker = QueueWorker(self.store, self.queue, make_engine, "w1")
+        for _ in range(2):
+            with self.assertRaises(KeyboardInterrupt):
+                worker.run_once()
+
+        self.assertFalse(worker.run_once())
+        self.assertEqual(self.queue.progress(self.job_id)["failed"], 1)
+        self.assertEqual(self.store.get_job(self.job_id)["status"], "failed")
+
+    def test_resubmit_skips_finished_entities(self):
+        self.store.record_result(self.job_id, 0, {"Entity": "Acme"})
+
+        self.queue.submit(self.job_id, batch_size=10)
+        lease = self.queue.lease("w1")
+
+        self.assertEqual(lease.task_indexes, [1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
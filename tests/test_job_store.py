@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.services.enrichment import EnrichmentEngine, plan_tasks
+from src.services.job_store import JobStore, run_job
+from tests.test_enrichment import StubLLMService, StubSearchService
+
+
+class CountingSearchService(StubSearchService):
+    def __init__(self, interrupt_on=None):
+        super().__init__()
+        self.interrupt_on = interrupt_on
+        self.queries = []
+
+    def search(self, query, max_results=3):
+        self.queries.append(query)
+        if query == self.interrupt_on:
+            raise KeyboardInterrupt
+        return super().search(query, max_results)
+
+
+class TestJobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = JobStore(os.path.join(self.tmpdir.name, "jobs.sqlite3"))
+        data = pd.DataFrame({"company": ["Acme", "Globex", "acme", "Initech"]})
+        self.plan = plan_tasks(data, ["company"], "Find {entity}")
+        self.params = {"source": "test.csv", "columns": ["company"], "prompts": ["prompt"]}
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_plan_round_trip(self):
+        job_id = self.store.create_job(self.params, self.plan)
+
+        plan = self.store.load_plan(job_id)
+        self.assertEqual([vars(t) for t in plan.tasks], [vars(t) for t in self.plan.tasks])
+        self.assertEqual([vars(c) for c in plan.cells], [vars(c) for c in self.plan.cells])
+        self.assertEqual(plan.assignments, self.plan.assignments)
+        job = self.store.get_job(job_id)
+        self.assertEqual(job["params"], self.params)
+        self.assertEqual((job["status"], job["total"], job["completed"]), ("running", 3, 0))
+
+    def test_results_are_recorded_and_counted(self):
+        job_id = self.store.create_job(self.params, self.plan)
+        self.store.record_result(job_id, 1, {"Entity": "Globex"})
+        self.store.record_result(job_id, 1, {"Entity": "Globex"})
+
+        self.assertEqual(self.store.completed_results(job_id), {1: {"Entity": "Globex"}})
+        self.assertEqual(self.store.get_job(job_id)["completed"], 1)
+
+    def test_incomplete_jobs(self):
+        finished = self.store.create_job(self.params, self.plan)
+        pending = self.store.create_job(self.params, self.plan)
+        self.store.set_status(finished, "complete")
+
+        self.assertEqual([job["id"] for job in self.store.incomplete_jobs()], [pending])
+
+        self.store.delete_job(pending)
+        self.assertEqual(self.store.incomplete_jobs(), [])
+
+    def test_resume_skips_finished_entities(self):
+        job_id = self.store.create_job(self.params, self.plan)
+        search = CountingSearchService(interrupt_on="Find Initech")
+        engine = EnrichmentEngine(search, StubLLMService(), max_workers=1)
+
+        with self.assertRaises(KeyboardInterrupt):
+            run_job(engine, self.store, job_id)
+        self.assertEqual(self.store.get_job(job_id)["status"], "failed")
+        self.assertEqual(self.store.get_job(job_id)["completed"], 2)
+
+        search = CountingSearchService()
+        engine = EnrichmentEngine(search, StubLLMService(), max_workers=1)
+        progress = []
+        rows = run_job(
+            engine, self.store, job_id, on_progress=lambda done, total, row: progress.append((done, total))
+        )
+
+        self.assertEqual(search.queries, ["Find Initech"])
+        self.assertEqual(progress, [(3, 3)])
+        self.assertEqual(self.store.get_job(job_id)["status"], "complete")
+        self.assertEqual(
+            [(r["Row"], r["Entity"], r["Extracted Information"]) for r in rows],
+            [(0, "Acme", "FIND ACME"), (1, "Globex", "FIND GLOBEX"), (2, "acme", "FIND ACME"), (3, "Initech", "FIND INITECH")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,67 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
-from src.services.llm_service import LLMService
+from src.services.llm_service import (
+    AsyncLLMService,
+    LLMService,
+    create_llm_cache,
+    parse_batch_response,
+)
+from src.utils.disk_cache import DiskCache, TieredCache
+from src.utils.rate_limiter import AdaptiveRateLimiter, RateLimiter
+from tests.stub_server import StubServer
+
+
+class FakeChatCompletions:
+    """OpenAI-compatible /chat/completions endpoint for StubServer."""
+
+    def __init__(self, delay=0.0, throttle_first=0, fail_first=0):
+        self.delay = delay
+        self.throttle_first = throttle_first
+        self.fail_first = fail_first
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, method, path, query, body):
+        if path != "/openai/v1/chat/completions":
+            return 404, {"error": {"message": "unknown path"}}
+        with self.lock:
+            self.calls += 1
+            if self.calls <= self.throttle_first:
+                return 429, {"error": {"message": "rate limited"}}, {"Retry-After": "0"}
+            if self.calls <= self.throttle_first + self.fail_first:
+                return 503, {"error": {"message": "unavailable"}}
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            user_message = body["messages"][-1]["content"]
+            snippet = user_message.split("Content: ")[1].split("\n")[0]
+            # Earlier items answer slower so completion order differs from input order
+            time.sleep(self.delay * (1 + int(snippet[-1]) % 3))
+            return 200, {
+                "id": "chatcmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": f"answer for {snippet}"},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+            }
+        finally:
+            with self.lock:
+                self.active -= 1
 
 
 class TestLLMService(unittest.TestCase):
@@ -39,5 +99,236 @@ class TestLLMService(unittest.TestCase):
         self.assertIn("API error", result["result"])
 
 
+class TestLLMServiceCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.disk = DiskCache(os.path.join(self.tmp.name, "llm.sqlite3"))
+        self.cache = TieredCache(max_memory_entries=8, disk=self.disk)
+        self.service = LLMService(api_key="test_api_key", cache=self.cache)
+        self.service.client = MagicMock()
+        response = MagicMock()
+        response.choices[0].message.content = "1. jane@example.com"
+        self.service.client.chat.completions.create.return_value = response
+        self.search_results = [{"url": "http://example.com", "snippet": "Contact jane"}]
+
+    def tearDown(self):
+        self.disk.close()
+        self.tmp.cleanup()
+
+    def test_repeated_request_is_served_from_cache(self):
+        first = self.service.extract_multiple_information(self.search_results, ["Email"])
+        second = self.service.extract_multiple_information(self.search_results, ["Email"])
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.service.client.chat.completions.create.call_count, 1)
+        self.assertEqual(self.service.cache_stats()["memory_hits"], 1)
+
+    def test_changed_inputs_miss_the_cache(self):
+        self.service.extract_multiple_information(self.search_results, ["Email"])
+        self.service.extract_multiple_information(self.search_results, ["Phone"])
+        self.service.extract_information(self.search_results, "Email")
+
+        self.assertEqual(self.service.client.chat.completions.create.call_count, 3)
+
+    def test_disk_tier_survives_new_memory_tier(self):
+        self.service.extract_multiple_information(self.search_results, ["Email"])
+        self.service.cache = TieredCache(max_memory_entries=8, disk=self.disk)
+
+        self.service.extract_multiple_information(self.search_results, ["Email"])
+
+        self.assertEqual(self.service.client.chat.completions.create.call_count, 1)
+        self.assertEqual(self.service.cache_stats()["disk_hits"], 1)
+
+    def test_errors_are_not_cached(self):
+        self.service.client.chat.completions.create.side_effect = Exception("API error")
+        result = self.service.extract_multiple_information(self.search_results, ["Email"])
+
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(self.service.cache_stats()["memory_entries"], 0)
+        self.assertEqual(self.service.cache_stats()["disk_entries"], 0)
+
+    def test_cache_write_failure_keeps_the_completion(self):
+        self.disk.close()  # Every disk write now raises sqlite3.ProgrammingError
+
+        result = self.service.extract_multiple_information(self.search_results, ["Email"])
+
+        self.assertEqual(result, {"result": "1. jane@example.com", "status": "success"})
+
+    def test_memory_tier_is_bounded(self):
+        cache = TieredCache(max_memory_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, {"result": key, "status": "success"})
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), {"result": "c", "status": "success"})
+
+    def test_create_llm_cache_disabled(self):
+        self.assertIsNone(create_llm_cache({}))
+
+
+def completion(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+
+class TestLLMServiceBatch(unittest.TestCase):
+    def setUp(self):
+        self.service = LLMService(api_key="test_api_key")
+        self.service.client = MagicMock()
+        self.create = self.service.client.chat.completions.create
+        self.items = [
+            (f"Company {i}", [{"url": f"http://example.com/{i}", "snippet": f"snippet {i}"}])
+            for i in range(5)
+        ]
+
+    def test_entities_share_one_completion(self):
+        self.create.return_value = completion(
+            '{"1": ["a1", "b1"], "2": ["a2", "b2"], "3": ["a3", "b3"]}'
+        )
+
+        results = self.service.extract_batch(self.items[:3], ["Email", "Phone"])
+
+        self.assertEqual(self.create.call_count, 1)
+        self.assertEqual(results[1], {"result": "1. a2\n2. b2", "status": "success"})
+        prompt = self.create.call_args.kwargs["messages"][1]["content"]
+        self.assertIn("### Entity 3: Company 2", prompt)
+
+    def test_batches_split_on_entity_limit(self):
+        self.create.side_effect = [
+            completion('{"1": ["a"], "2": ["b"]}'),
+            completion('{"1": ["c"], "2": ["d"]}'),
+            completion("only answer"),
+        ]
+
+        results = self.service.extract_batch(self.items, ["Email"], max_entities=2)
+
+        self.assertEqual(self.create.call_count, 3)
+        self.assertEqual([r["result"] for r in results], ["1. a", "1. b", "1. c", "1. d", "only answer"])
+
+    def test_batches_split_on_token_budget(self):
+        self.create.return_value = completion('{"1": ["x"]}')
+        self.service.extract_batch(self.items[:2], ["Email"], max_prompt_tokens=1)
+
+        self.assertEqual(self.create.call_count, 2)
+
+    def test_cached_answers_are_per_entity(self):
+        self.service.cache = TieredCache()
+        items = [(f"Company {i}", []) for i in range(4)]
+        self.create.return_value = completion('{"1": ["a"], "2": ["b"]}')
+        self.service.extract_batch(items[:2], ["Email"])
+        self.create.return_value = completion('{"1": ["c"], "2": ["d"]}')
+
+        # Same (empty) search results, different entities: nothing is reused
+        results = self.service.extract_batch(items[2:], ["Email"])
+
+        self.assertEqual(self.create.call_count, 2)
+        self.assertEqual([r["result"] for r in results], ["1. c", "1. d"])
+        self.assertEqual(self.service.extract_batch(items[:2], ["Email"])[1]["result"], "1. b")
+        self.assertEqual(self.create.call_count, 2)
+
+    def test_unparseable_entities_fall_back_to_single_calls(self):
+        self.create.side_effect = [
+            completion('Sure! {"1": ["a", "b"], "2": ["only one"], "3": ["c", "d"]}'),
+            completion("fallback answer"),
+        ]
+
+        results = self.service.extract_batch(self.items[:3], ["Email", "Phone"])
+
+        self.assertEqual(
+            [r["result"] for r in results], ["1. a\n2. b", "fallback answer", "1. c\n2. d"]
+        )
+        self.assertIn("Company 1", str(self.create.call_args_list[0]))
+
+    def test_parse_batch_response(self):
+        self.assertEqual(parse_batch_response('```json\n{"1": ["a", "b"]}\n```', 1, 2), {1: ["a", "b"]})
+        self.assertEqual(parse_batch_response("no json here", 2, 1), {})
+        self.assertEqual(parse_batch_response('{"1": ["a"]}', 2, 2), {})
+
+
+class TestAsyncLLMService(unittest.TestCase):
+    def run_batch(self, endpoint, size, **kwargs):
+        batch = [[{"url": f"http://example.com/{i}", "snippet": f"entity {i}"}] for i in range(size)]
+
+        async def run():
+            async with AsyncLLMService("test_api_key", base_url=server.url, **kwargs) as service:
+                return await service.extract_many(batch, ["Email"])
+
+        with StubServer(endpoint) as server:
+            return asyncio.run(run())
+
+    def test_extract_many_returns_results_in_input_order(self):
+        results = self.run_batch(FakeChatCompletions(delay=0.01), 9, max_in_flight=9)
+
+        self.assertEqual([r["status"] for r in results], ["success"] * 9)
+        self.assertEqual([r["result"] for r in results], [f"answer for entity {i}" for i in range(9)])
+
+    def test_in_flight_requests_are_capped(self):
+        endpoint = FakeChatCompletions(delay=0.02)
+        self.run_batch(endpoint, 10, max_in_flight=3)
+
+        self.assertEqual(endpoint.calls, 10)
+        self.assertLessEqual(endpoint.peak, 3)
+
+    def test_throttled_requests_are_retried(self):
+        endpoint = FakeChatCompletions(throttle_first=2)
+        results = self.run_batch(endpoint, 3, max_backoff=0.05)
+
+        self.assertEqual([r["status"] for r in results], ["success"] * 3)
+        self.assertEqual(endpoint.calls, 5)
+
+    def test_throttling_feeds_the_rate_limiter(self):
+        endpoint = FakeChatCompletions(throttle_first=1)
+        limiter = AdaptiveRateLimiter(600, per=60, min_rate=60)
+        results = self.run_batch(endpoint, 1, max_backoff=0.01, rate_limiter=limiter)
+
+        self.assertEqual(results[0]["status"], "success")
+        self.assertEqual(limiter.stats()["throttled"], 1)
+        self.assertLess(limiter.effective_rate, 600)
+
+    def test_sync_service_retries_through_rate_limiter(self):
+        endpoint = FakeChatCompletions(throttle_first=1)
+        limiter = AdaptiveRateLimiter(600, per=60, min_rate=60)
+        with StubServer(endpoint) as server:
+            service = LLMService("test_api_key", rate_limiter=limiter)
+            service.client = service.client.with_options(base_url=server.url)
+            result = service.extract_multiple_information(
+                [{"url": "http://example.com", "snippet": "entity 1"}], ["Email"]
+            )
+
+        self.assertEqual(result, {"result": "answer for entity 1", "status": "success"})
+        self.assertEqual(endpoint.calls, 2)
+        self.assertEqual(limiter.stats()["throttled"], 1)
+
+    def test_sync_service_retries_server_errors(self):
+        endpoint = FakeChatCompletions(fail_first=1)
+        with StubServer(endpoint) as server:
+            service = LLMService("test_api_key", rate_limiter=RateLimiter(600, per=60), max_backoff=0.01)
+            service.client = service.client.with_options(base_url=server.url)
+            result = service.extract_multiple_information(
+                [{"url": "http://example.com", "snippet": "entity 1"}], ["Email"]
+            )
+
+        self.assertEqual(result, {"result": "answer for entity 1", "status": "success"})
+        self.assertEqual(endpoint.calls, 2)
+
+    def test_exhausted_retries_are_reported_per_item(self):
+        endpoint = FakeChatCompletions(throttle_first=100)
+        results = self.run_batch(endpoint, 2, max_attempts=2, max_backoff=0.01)
+
+        self.assertEqual([r["status"] for r in results], ["error", "error"])
+        self.assertEqual(results[0]["error_type"], "RateLimitError")
+        self.assertEqual(endpoint.calls, 4)
+
+    def test_repeated_batch_is_served_from_cache(self):
+        cache = TieredCache()
+        endpoint = FakeChatCompletions()
+        self.run_batch(endpoint, 2, cache=cache)
+        self.run_batch(endpoint, 2, cache=cache)
+
+        self.assertEqual(endpoint.calls, 2)
+        self.assertEqual(cache.stats()["memory_hits"], 2)
+
+
 if __name__ == "__main__":
     unittest.main()
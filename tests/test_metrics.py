@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+from src.services.enrichment import EnrichmentEngine, plan_tasks
+from src.services.llm_service import LLMService
+from src.utils.disk_cache import TieredCache
+from tests.test_enrichment import StubSearchService
+# Imported the way the services import it, so the registry and traces are shared
+from utils.metrics import Histogram, MetricsRegistry, Tracer, metrics
+from utils.rate_limiter import create_rate_limiter
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_histogram_quantiles_interpolate_within_buckets(self):
+        histogram = Histogram(buckets=(1, 2, 4))
+        for value in [0.5] * 50 + [1.5] * 45 + [3] * 5:
+            histogram.observe(value)
+
+        self.assertAlmostEqual(histogram.quantile(0.5), 1.0)
+        self.assertAlmostEqual(histogram.quantile(0.95), 2.0)
+        self.assertIsNone(Histogram().quantile(0.5))
+
+    def test_track_counts_calls_errors_and_latency(self):
+        with self.registry.track("search"):
+            pass
+        with self.assertRaises(ValueError):
+            with self.registry.track("search"):
+                raise ValueError("boom")
+
+        self.assertEqual(self.registry.value("quickdata_calls_total", stage="search"), 2)
+        self.assertEqual(self.registry.value("quickdata_errors_total", stage="search"), 1)
+        self.assertEqual(self.registry.histogram("quickdata_stage_seconds", stage="search").count, 2)
+
+    def test_prometheus_text(self):
+        self.registry.inc("quickdata_cache_hits_total", stage="llm")
+        self.registry.set("quickdata_rate_limit_per_minute", 60, limiter="groq")
+        self.registry.set("quickdata_rate_limit_per_minute", 30, limiter="groq")
+        self.registry.observe("quickdata_stage_seconds", 0.003, stage='sheets "read"')
+
+        text = self.registry.to_prometheus()
+
+        self.assertIn("# TYPE quickdata_cache_hits_total counter", text)
+        self.assertIn("# TYPE quickdata_rate_limit_per_minute gauge", text)
+        self.assertIn('quickdata_rate_limit_per_minute{limiter="groq"} 30', text)
+        self.assertIn('quickdata_cache_hits_total{stage="llm"} 1', text)
+        self.assertIn('quickdata_stage_seconds_bucket{stage="sheets \\"read\\"",le="0.001"} 0', text)
+        self.assertIn('quickdata_stage_seconds_bucket{stage="sheets \\"read\\"",le="0.005"} 1', text)
+        self.assertIn('quickdata_stage_seconds_count{stage="sheets \\"read\\""} 1', text)
+
+    def test_write_json_and_prometheus(self):
+        self.registry.inc("quickdata_entities_total", 3)
+        self.registry.set("quickdata_rate_limit_per_minute", 12.5, limiter="serpapi")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            json_path = os.path.join(tmpdir, "out", "metrics.json")
+            prom_path = os.path.join(tmpdir, "metrics.prom")
+            self.registry.write(json_path)
+            self.registry.write(prom_path)
+
+            with open(json_path) as f:
+                snapshot = json.load(f)
+            with open(prom_path) as f:
+                prom = f.read()
+
+        self.assertEqual(snapshot["counters"]["quickdata_entities_total"], [{"labels": {}, "value": 3}])
+        self.assertEqual(
+            snapshot["gauges"]["quickdata_rate_limit_per_minute"], [{"labels": {"limiter": "serpapi"}, "value": 12.5}]
+        )
+        self.assertIn("quickdata_entities_total 3", prom)
+
+
+class TestPipelineMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_engine_writes_one_trace_line_per_entity(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "traces.jsonl")
+            tracer = Tracer(path)
+            llm = LLMService(api_key="test_api_key")
+            llm.client = MagicMock()
+            llm.client.chat.completions.create.return_value = SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content="1. ok"))],
+                usage=SimpleNamespace(prompt_tokens=120, completion_tokens=8),
+            )
+            engine = EnrichmentEngine(StubSearchService(), llm, max_workers=2, tracer=tracer)
+            plan = plan_tasks(pd.DataFrame({"name": ["Acme", "Globex"]}), ["name"], "Q{entity}")
+
+            list(engine.run(plan.tasks, ["Email"]))
+            tracer.close()
+            with open(path) as f:
+                traces = [json.loads(line) for line in f]
+
+        self.assertEqual(sorted(trace["entity"] for trace in traces), ["Acme", "Globex"])
+        self.assertEqual([span["stage"] for span in traces[0]["spans"]], ["llm"])
+        self.assertEqual(metrics.value("quickdata_entities_total"), 2)
+        self.assertEqual(metrics.value("quickdata_llm_tokens_total", kind="prompt"), 240)
+        self.assertEqual(metrics.value("quickdata_llm_tokens_total", kind="completion"), 16)
+        self.assertIsNotNone(metrics.latency("llm")["p50"])
+
+    def test_llm_cache_hits_are_counted(self):
+        llm = LLMService(api_key="test_api_key", cache=TieredCache(8))
+        llm.client = MagicMock()
+        llm.client.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="1. ok"))]
+        )
+        results = [{"url": "https://a.com", "snippet": "Acme"}]
+
+        llm.extract_multiple_information(results, ["Email"])
+        llm.extract_multiple_information(results, ["Email"])
+
+        self.assertEqual(metrics.value("quickdata_cache_misses_total", stage="llm"), 1)
+        self.assertEqual(metrics.value("quickdata_cache_hits_total", stage="llm"), 1)
+
+    def test_rate_limiters_report_rate_and_throttling(self):
+        limiter = create_rate_limiter(40, 60, {"enabled": True}, name="groq")
+        self.assertEqual(metrics.value("quickdata_rate_limit_per_minute", limiter="groq"), 40)
+
+        limiter.observe(429)
+
+        self.assertEqual(metrics.value("quickdata_rate_limit_per_minute", limiter="groq"), 20)
+        self.assertEqual(metrics.value("quickdata_rate_limit_throttled_total", limiter="groq"), 1)
+        create_rate_limiter(5, 60, name="serpapi").set_rate(10)
+        self.assertEqual(metrics.value("quickdata_rate_limit_per_minute", limiter="serpapi"), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.services.llm_service import EXTRACT_MULTIPLE_SYSTEM_PROMPT, LLMService
+from src.services.prompt_builder import PromptBuilder, create_prompt_builder, trim_to_tokens
+from tests.test_llm_service import completion
+
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_empty_and_repeated_results_are_dropped(self):
+        results = [
+            {"url": "https://a.com", "snippet": "Acme  makes anvils."},
+            {"url": "https://b.com", "snippet": "  "},
+            {"url": "https://c.com", "snippet": "acme makes anvils."},
+            {"url": "https://a.com", "snippet": "Other text from the same page"},
+            {"url": "https://d.com", "snippet": None},
+            {"url": "https://e.com", "snippet": "Acme was founded in 1949."},
+        ]
+
+        self.assertEqual(
+            PromptBuilder().compact(results),
+            [
+                {"url": "https://a.com", "snippet": "Acme makes anvils."},
+                {"url": "https://e.com", "snippet": "Acme was founded in 1949."},
+            ],
+        )
+
+    def test_snippets_are_trimmed_at_word_boundaries(self):
+        self.assertEqual(trim_to_tokens("one two three four five", 3), "one two…")
+        self.assertEqual(trim_to_tokens("short", 3), "short")
+
+    def test_context_budget_keeps_the_first_result(self):
+        results = [{"url": f"https://{i}.com", "snippet": f"fact {i} " + "word " * 40} for i in range(5)]
+
+        self.assertEqual(len(PromptBuilder(max_context_tokens=10).compact(results)), 1)
+        self.assertEqual(len(PromptBuilder(max_context_tokens=130).compact(results)), 2)
+
+    def test_create_prompt_builder(self):
+        builder = create_prompt_builder({"prompt": {"max_snippet_tokens": 50}})
+
+        self.assertEqual((builder.max_snippet_tokens, builder.max_context_tokens), (50, 1000))
+
+
+class TestPromptSize(unittest.TestCase):
+    def test_calls_record_prompt_size_without_repeating_the_system_prompt(self):
+        service = LLMService(api_key="test_api_key")
+        service.client = MagicMock()
+        service.client.chat.completions.create.return_value = completion("1. info@acme.com")
+        results = [{"url": "https://a.com", "snippet": "Mail info@acme.com"}] * 3
+
+        service.extract_multiple_information(results, ["Email"])
+
+        messages = service.client.chat.completions.create.call_args.kwargs["messages"]
+        self.assertNotIn(EXTRACT_MULTIPLE_SYSTEM_PROMPT, messages[1]["content"])
+        self.assertEqual(messages[1]["content"].count("info@acme.com"), 1)
+        stats = service.prompt_stats()
+        self.assertEqual(stats["calls"], 1)
+        self.assertGreater(stats["total_tokens"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
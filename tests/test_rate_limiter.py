@@ -0,0 +1,250 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from src.utils.quota_ledger import QuotaLedger
+from src.utils.rate_limiter import (
+    AdaptiveRateLimiter,
+    KeyedRateLimiter,
+    RateLimiter,
+    SharedAdaptiveRateLimiter,
+    SharedRateLimiter,
+    create_rate_limiter,
+    parse_retry_delay,
+)
+# Imported the way the limiters import it, so they report into this registry
+from utils.metrics import metrics
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_up_to_capacity_then_refuses(self):
+        limiter = RateLimiter(3, per=60)
+
+        self.assertTrue(all(limiter.try_acquire() for _ in range(3)))
+        self.assertFalse(limiter.try_acquire())
+
+    def test_acquire_many_tokens(self):
+        limiter = RateLimiter(5, per=60)
+
+        self.assertTrue(limiter.acquire(4, blocking=False))
+        self.assertFalse(limiter.acquire(2, blocking=False))
+        self.assertTrue(limiter.acquire(1, blocking=False))
+
+    def test_acquire_more_than_capacity_raises(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(2).acquire(3)
+
+    def test_blocking_acquire_sleeps_until_next_token(self):
+        limiter = RateLimiter(20, per=1)
+        limiter.acquire(20)
+
+        start = time.monotonic()
+        limiter.acquire(2)
+        elapsed = time.monotonic() - start
+
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(elapsed, 0.3)
+
+    def test_timeout_does_not_consume_tokens(self):
+        limiter = RateLimiter(1, per=60)
+        limiter.acquire()
+
+        self.assertFalse(limiter.acquire(timeout=0.01))
+        self.assertLess(limiter.tokens, 0.01)
+        self.assertGreaterEqual(limiter.tokens, 0)
+
+    def test_waiters_are_served_in_arrival_order(self):
+        limiter = RateLimiter(50, per=1, capacity=1)
+        limiter.acquire()
+        order = []
+
+        def worker(i):
+            limiter.acquire()
+            order.append(i)
+
+        threads = []
+        for i in range(5):
+            thread = threading.Thread(target=worker, args=(i,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.002)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, list(range(5)))
+
+    def test_async_acquire(self):
+        limiter = RateLimiter(20, per=1)
+
+        async def run():
+            start = time.monotonic()
+            await asyncio.gather(*(limiter.acquire_async() for _ in range(22)))
+            return time.monotonic() - start
+
+        elapsed = asyncio.run(run())
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(elapsed, 0.3)
+
+    def test_cancelled_async_waiter_returns_its_tokens(self):
+        limiter = RateLimiter(1, per=60)
+        limiter.acquire()
+
+        async def run():
+            waiter = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+
+        asyncio.run(run())
+        self.assertGreaterEqual(limiter.tokens, 0)
+
+
+class TestKeyedRateLimiter(unittest.TestCase):
+    def test_buckets_are_independent(self):
+        limiter = KeyedRateLimiter(1, per=60)
+
+        self.assertTrue(limiter.acquire("serpapi", blocking=False))
+        self.assertFalse(limiter.acquire("serpapi", blocking=False))
+        self.assertTrue(limiter.acquire("groq", blocking=False))
+        self.assertIs(limiter.bucket("groq"), limiter.bucket("groq"))
+
+
+class TestParseRetryDelay(unittest.TestCase):
+    def test_retry_after_seconds(self):
+        self.assertEqual(parse_retry_delay({"Retry-After": "12"}), 12)
+        self.assertEqual(parse_retry_delay({"retry-after-ms": "250"}), 0.25)
+
+    def test_retry_after_http_date_in_the_past(self):
+        self.assertEqual(parse_retry_delay({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0)
+
+    def test_groq_rate_limit_headers(self):
+        headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1m2.5s"}
+        self.assertEqual(parse_retry_delay(headers), 62.5)
+        headers["x-ratelimit-remaining-requests"] = "14"
+        self.assertIsNone(parse_retry_delay(headers))
+
+    def test_missing_or_garbage(self):
+        self.assertIsNone(parse_retry_delay(None))
+        self.assertIsNone(parse_retry_delay({"Retry-After": "soon"}))
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_additive_increase_on_success(self):
+        limiter = AdaptiveRateLimiter(10, per=60, max_rate=12)
+        for _ in range(10):
+            limiter.observe(200)
+        self.assertAlmostEqual(limiter.effective_rate, 10.96, places=1)
+
+        for _ in range(100):
+            limiter.observe(200)
+        self.assertEqual(limiter.effective_rate, 12)
+
+    def test_multiplicative_decrease_once_per_burst(self):
+        limiter = AdaptiveRateLimiter(40, per=60, min_rate=5)
+        limiter.observe(429)
+        limiter.observe(429)
+        limiter.observe(429)
+
+        self.assertEqual(limiter.effective_rate, 20)
+        self.assertEqual(limiter.stats()["throttled"], 3)
+
+    def test_rate_never_drops_below_minimum(self):
+        limiter = AdaptiveRateLimiter(4, per=60, min_rate=3)
+        limiter.observe(429)
+        self.assertEqual(limiter.rate, 3)
+
+    def test_retry_after_defers_next_token(self):
+        limiter = RateLimiter(100, per=1)
+        limiter.observe(429, {"Retry-After": "0.1"})
+
+        start = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_create_rate_limiter(self):
+        self.assertIs(type(create_rate_limiter(5)), RateLimiter)
+        adaptive = create_rate_limiter(5, 60, {"enabled": True, "max_rate": 9})
+        self.assertIsInstance(adaptive, AdaptiveRateLimiter)
+        self.assertEqual(adaptive.max_rate, 9)
+
+
+class TestSharedRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "quota.sqlite3")
+        # One ledger connection per limiter, as separate processes would have
+        self.ledgers = [QuotaLedger(self.path) for _ in range(2)]
+
+    def tearDown(self):
+        for ledger in self.ledgers:
+            ledger.close()
+        self.tmpdir.cleanup()
+
+    def test_limiters_share_one_bucket(self):
+        first, second = (SharedRateLimiter(ledger, "serpapi", 3, per=60) for ledger in self.ledgers)
+        other = SharedRateLimiter(self.ledgers[1], "groq", 3, per=60)
+
+        self.assertTrue(first.try_acquire(2))
+        self.assertTrue(second.try_acquire())
+        self.assertFalse(first.try_acquire())
+        self.assertFalse(second.try_acquire())
+        self.assertTrue(other.try_acquire())
+
+    def test_throttling_pauses_every_limiter(self):
+        first, second = (SharedRateLimiter(ledger, "groq", 100, per=1) for ledger in self.ledgers)
+        first.observe(429, {"Retry-After": "0.1"})
+
+        start = time.monotonic()
+        second.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_adapted_rate_is_shared(self):
+        first, second = (
+            SharedAdaptiveRateLimiter(ledger, "groq", 40, per=60, max_rate=80) for ledger in self.ledgers
+        )
+        fixed = SharedRateLimiter(self.ledgers[1], "groq", 40, per=60)
+
+        # A burst of 429s seen by different processes cuts the rate once
+        first.observe(429)
+        second.observe(429)
+        fixed.observe(429)
+        self.assertEqual(first.rate, 20)
+        second.observe(200)
+        first.acquire()
+        self.assertAlmostEqual(first.rate, 20.05)
+        # The gauge follows the shared rate whichever process moved it
+        self.assertAlmostEqual(metrics.value("quickdata_rate_limit_per_minute", limiter="groq"), 20.05)
+
+    def test_create_rate_limiter_with_ledger(self):
+        limiter = create_rate_limiter(5, 60, {"enabled": True, "max_rate": 9}, self.ledgers[0], "serpapi")
+
+        self.assertIsInstance(limiter, SharedAdaptiveRateLimiter)
+        self.assertEqual(limiter.name, "serpapi")
+        self.assertEqual(limiter.max_rate, 9)
+        self.assertIs(type(create_rate_limiter(5, 60, {}, self.ledgers[0], "serpapi")), SharedRateLimiter)
+
+    def test_ledger_without_rate_columns_is_migrated(self):
+        path = os.path.join(self.tmpdir.name, "old.sqlite3")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, last_update REAL NOT NULL)")
+        conn.execute("INSERT INTO buckets VALUES ('groq', 1, ?)", (time.time(),))
+        conn.commit()
+        conn.close()
+        ledger = QuotaLedger(path)
+        self.addCleanup(ledger.close)
+
+        limiter = SharedAdaptiveRateLimiter(ledger, "groq", 40, per=60)
+        limiter.observe(429)
+
+        other = SharedAdaptiveRateLimiter(ledger, "groq", 40, per=60)
+        other.acquire()
+        self.assertEqual(other.rate, 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
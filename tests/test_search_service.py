@@ -1,9 +1,34 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
-import requests
+import httpx
 
-from src.services.search_service import SearchService
+from src.services.search_service import (
+    AsyncSearchService,
+    SearchService,
+    create_search_cache,
+    normalize_query,
+)
+from src.utils.disk_cache import DiskCache
+from src.utils.rate_limiter import AdaptiveRateLimiter, RateLimiter
+from tests.stub_server import StubServer
+
+
+def serpapi_stub(method, path, query, body):
+    q = query["q"][0]
+    if q == "missing":
+        return 404, {"error": "not found"}
+    time.sleep(0.01)
+    return 200, {
+        "organic_results": [
+            {"link": f"http://example.com/{q}/{i}", "snippet": f"{q} {i}"} for i in range(5)
+        ]
+    }
 
 
 class TestSearchService(unittest.TestCase):
@@ -11,7 +36,7 @@ class TestSearchService(unittest.TestCase):
         self.api_key = "test_api_key"
         self.search_service = SearchService(api_key=self.api_key)
 
-    @patch("src.services.search_service.requests.get")
+    @patch("src.services.search_service.httpx.Client.get")
     def test_search_success(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {
@@ -36,7 +61,7 @@ class TestSearchService(unittest.TestCase):
             params={"api_key": self.api_key, "q": "test query", "num": 2},
         )
 
-    @patch("src.services.search_service.requests.get")
+    @patch("src.services.search_service.httpx.Client.get")
     def test_search_no_results(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {"organic_results": []}
@@ -52,9 +77,9 @@ class TestSearchService(unittest.TestCase):
             params={"api_key": self.api_key, "q": "test query", "num": 2},
         )
 
-    @patch("src.services.search_service.requests.get")
+    @patch("src.services.search_service.httpx.Client.get")
     def test_search_request_exception(self, mock_get):
-        mock_get.side_effect = requests.exceptions.RequestException("Test exception")
+        mock_get.side_effect = httpx.HTTPError("Test exception")
 
         with self.assertRaises(Exception) as context:
             self.search_service.search("test query", max_results=2)
@@ -65,6 +90,62 @@ class TestSearchService(unittest.TestCase):
             params={"api_key": self.api_key, "q": "test query", "num": 2},
         )
 
+    @patch("src.services.search_service.httpx.Client.get")
+    def test_search_uses_cache_on_repeat(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "organic_results": [{"link": "http://example.com/1", "snippet": "One"}]
+        }
+        mock_get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(os.path.join(tmp, "search.sqlite3"))
+            service = SearchService(api_key=self.api_key, cache=cache)
+
+            first = service.search("Acme  Corp", max_results=2)
+            second = service.search("  acme corp ", max_results=2)
+            service.search("acme corp", max_results=3)
+            cache.close()
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 2)
+
+    @patch("src.services.search_service.httpx.Client.get")
+    def test_connection_error_is_retried(self, mock_get):
+        mock_response = MagicMock(status_code=200, is_error=False, headers={})
+        mock_response.json.return_value = {"organic_results": [{"link": "http://example.com/1"}]}
+        mock_get.side_effect = [httpx.ConnectError("connection refused"), mock_response]
+        service = SearchService(api_key=self.api_key, rate_limiter=RateLimiter(6000, per=60))
+
+        results = service.search("test query", max_results=1)
+
+        self.assertEqual(results, [{"url": "http://example.com/1", "snippet": ""}])
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch("src.services.search_service.httpx.Client.get")
+    def test_cache_errors_do_not_fail_the_search(self, mock_get):
+        mock_response = MagicMock(status_code=200, is_error=False, headers={})
+        mock_response.json.return_value = {"organic_results": [{"link": "http://example.com/1"}]}
+        mock_get.return_value = mock_response
+        cache = MagicMock()
+        cache.get.side_effect = sqlite3.OperationalError("database is locked")
+        cache.set.side_effect = sqlite3.OperationalError("database is locked")
+        service = SearchService(api_key=self.api_key, cache=cache)
+
+        results = service.search("test query", max_results=1)
+
+        self.assertEqual(results, [{"url": "http://example.com/1", "snippet": ""}])
+        cache.set.assert_called_once()
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  Find   ACME\tCorp "), "find acme corp")
+
+    def test_create_search_cache_disabled(self):
+        self.assertIsNone(create_search_cache({}))
+        self.assertIsNone(create_search_cache({"cache": {"enabled": False}}))
+
     def test_invalid_api_key(self):
         with self.assertRaises(ValueError) as context:
             SearchService(api_key="${INVALID_KEY}")
@@ -75,5 +156,110 @@ class TestSearchService(unittest.TestCase):
         )
 
 
+class TestSearchServiceStubServer(unittest.TestCase):
+    def test_sync_search_reuses_connection(self):
+        with StubServer(serpapi_stub) as server:
+            service = SearchService("test_api_key", rate_limit=100, base_url=server.url)
+            for i in range(5):
+                results = service.search(f"query {i}", max_results=2)
+            service.close()
+
+        self.assertEqual(results[0]["url"], "http://example.com/query 4/0")
+        self.assertEqual(server.requests, 5)
+        self.assertEqual(len(server.connections), 1)
+
+    def test_throttled_search_backs_off_and_retries(self):
+        calls = []
+
+        def throttling_stub(method, path, query, body):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                return 429, {"error": "slow down"}, {"Retry-After": "0.1"}
+            return serpapi_stub(method, path, query, body)
+
+        limiter = AdaptiveRateLimiter(600, per=60, min_rate=60)
+        with StubServer(throttling_stub) as server:
+            service = SearchService("test_api_key", base_url=server.url, rate_limiter=limiter)
+            results = service.search("query", max_results=1)
+            service.close()
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(calls[1] - calls[0], 0.09)
+        self.assertLess(limiter.effective_rate, 600)
+        self.assertEqual(limiter.stats()["throttled"], 1)
+
+    def test_server_error_is_retried(self):
+        calls = []
+
+        def failing_stub(method, path, query, body):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                return 503, {"error": "unavailable"}
+            return serpapi_stub(method, path, query, body)
+
+        limiter = AdaptiveRateLimiter(600, per=60, min_rate=60)
+        with StubServer(failing_stub) as server:
+            service = SearchService("test_api_key", base_url=server.url, rate_limiter=limiter)
+            results = service.search("query", max_results=1)
+            service.close()
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(len(calls), 2)
+        # Backed off one refill interval, but a server error is not a reason to slow down
+        self.assertGreaterEqual(calls[1] - calls[0], 0.09)
+        self.assertEqual(limiter.stats()["throttled"], 0)
+
+    def test_sync_search_http_error(self):
+        with StubServer(serpapi_stub) as server:
+            service = SearchService("test_api_key", base_url=server.url)
+            with self.assertRaises(Exception) as context:
+                service.search("missing")
+            service.close()
+
+        self.assertIn("Search error", str(context.exception))
+
+    def test_search_many_fans_out_in_order(self):
+        queries = [f"query {i}" for i in range(12)]
+
+        async def run():
+            async with AsyncSearchService(
+                "test_api_key", rate_limit=100, base_url=server.url, max_connections=3
+            ) as service:
+                return await service.search_many(queries, max_results=1)
+
+        with StubServer(serpapi_stub) as server:
+            results = asyncio.run(run())
+
+        self.assertEqual([r[0]["snippet"] for r in results], [f"{q} 0" for q in queries])
+        self.assertEqual(server.requests, 12)
+        self.assertLessEqual(len(server.connections), 3)
+
+    def test_search_many_return_exceptions(self):
+        async def run():
+            async with AsyncSearchService("test_api_key", base_url=server.url) as service:
+                return await service.search_many(["ok", "missing"], return_exceptions=True)
+
+        with StubServer(serpapi_stub) as server:
+            ok, missing = asyncio.run(run())
+
+        self.assertEqual(len(ok), 3)
+        self.assertIn("Search error", str(missing))
+
+    def test_async_search_uses_cache(self):
+        async def run(cache):
+            async with AsyncSearchService("test_api_key", cache=cache, base_url=server.url) as service:
+                await service.search("Acme")
+                return await service.search(" ACME ")
+
+        with tempfile.TemporaryDirectory() as tmp, StubServer(serpapi_stub) as server:
+            cache = DiskCache(os.path.join(tmp, "search.sqlite3"))
+            results = asyncio.run(run(cache))
+            cache.close()
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(server.requests, 1)
+
+
 if __name__ == "__main__":
     unittest.main()
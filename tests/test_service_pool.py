@@ -0,0 +1,73 @@
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from src.services.enrichment import plan_tasks
+from src.services.service_pool import ServicePool
+from tests.test_enrichment import StubLLMService, StubSearchService
+
+
+class TrackingSearchService(StubSearchService):
+    """Records the most searches that were ever in flight at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def search(self, query, max_results=3):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return super().search(query, max_results)
+
+
+class TestServicePool(unittest.TestCase):
+    def test_engines_share_the_concurrency_limits(self):
+        search = TrackingSearchService()
+        pool = ServicePool(search, StubLLMService(), search_concurrency=2, max_jobs_per_user=2)
+        config = {"processing": {"max_workers": 4}}
+        plan = plan_tasks(pd.DataFrame({"name": [f"Company {i}" for i in range(8)]}), ["name"], "Find {entity}")
+
+        def run_job():
+            list(pool.create_engine(config).run(plan.tasks, ["prompt"]))
+
+        jobs = [threading.Thread(target=run_job) for _ in range(2)]
+        for job in jobs:
+            job.start()
+        for job in jobs:
+            job.join()
+
+        self.assertEqual(search.peak, 2)
+
+    def test_user_quota(self):
+        pool = ServicePool(StubSearchService(), StubLLMService(), max_jobs_per_user=1)
+
+        with pool.job("alice"):
+            with self.assertRaises(Exception):
+                with pool.job("alice"):
+                    pass
+            with pool.job("bob"):
+                self.assertEqual(pool.stats(), {"users": 2, "jobs": 2})
+
+        self.assertEqual(pool.stats(), {"users": 0, "jobs": 0})
+
+    def test_engine_workers_are_capped_per_user(self):
+        pool = ServicePool(StubSearchService(), StubLLMService(), max_workers_per_user=3)
+
+        engine = pool.create_engine({"processing": {"max_workers": 16, "prefetch": 8}})
+
+        self.assertEqual(engine.max_workers, 3)
+        self.assertIs(engine.search_service, pool.search_service)
+        # Everything else comes from the config as in enrichment.create_engine
+        self.assertEqual(engine.prefetch, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,100 @@
+import os
+import re
+import tempfile
+import threading
+import time
 import unittest
+from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, patch
 
 import pandas as pd
 from googleapiclient.errors import HttpError
 
-from src.services.sheets_handler import GoogleSheetsHandler
+from src.services.sheets_handler import (
+    CredentialRefresher,
+    GoogleSheetsHandler,
+    clear_caches,
+    column_blocks,
+    column_letter,
+)
+from src.utils.rate_limiter import RateLimiter
+
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FailingRequest:
+    def __init__(self, error):
+        self.error = error
+
+    def execute(self):
+        raise self.error
+
+
+class FakeSheetsService:
+    """Serves values().batchGet from an in-memory grid, recording every request."""
+
+    def __init__(self, rows=None, titles=("Sheet1",)):
+        self.rows = rows or []
+        self.requests = []
+        self.titles = list(titles)
+        self.writes = []
+        self.metadata_requests = 0
+        self.failures = []  # HttpErrors raised by the next value writes
+
+    def get(self, spreadsheetId, fields=None):
+        self.metadata_requests += 1
+        return FakeRequest({"sheets": [{"properties": {"title": t}} for t in self.titles]})
+
+    def batchUpdate(self, spreadsheetId, body):
+        if "requests" in body:
+            self.titles.append(body["requests"][0]["addSheet"]["properties"]["title"])
+            return FakeRequest({})
+        (data,) = body["data"]
+        self.writes.append(data["range"])
+        if self.failures:
+            error = self.failures.pop(0)
+            return FakeRequest(None) if error is None else FailingRequest(error)
+        first_line = int(re.search(r"!A(\d+):", data["range"]).group(1))
+        for offset, values in enumerate(data["values"]):
+            line = first_line + offset
+            self.rows.extend([] for _ in range(line - len(self.rows)))
+            self.rows[line - 1] = values
+        return FakeRequest({})
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def batchGet(self, spreadsheetId, ranges, majorDimension="ROWS"):
+        self.requests.append(ranges)
+        return FakeRequest({"valueRanges": [{"values": self._read(r)} for r in ranges]})
+
+    @staticmethod
+    def _column_index(letters):
+        index = 0
+        for letter in letters:
+            index = index * 26 + ord(letter) - ord("A") + 1
+        return index - 1
+
+    def _read(self, a1):
+        if a1 == "1:1":
+            return self.rows[:1]
+        first_col, first_line, last_col, last_line = re.fullmatch(r"([A-Z]+)(\d+):([A-Z]+)(\d+)", a1).groups()
+        first, last = self._column_index(first_col), self._column_index(last_col)
+        values = [row[first : last + 1] for row in self.rows[int(first_line) - 1 : int(last_line)]]
+        # Like the API, drop trailing blank cells and trailing blank rows
+        values = [row[: max([i + 1 for i, v in enumerate(row) if v != ""], default=0)] for row in values]
+        while values and not values[-1]:
+            values.pop()
+        return values
 
 
 class TestGoogleSheetsHandler(unittest.TestCase):
@@ -12,8 +102,10 @@ class TestGoogleSheetsHandler(unittest.TestCase):
     @patch("src.services.sheets_handler.Credentials")
     @patch("src.services.sheets_handler.os.path.exists")
     def setUp(self, mock_exists, mock_credentials, mock_build):
-        mock_exists.return_value = False
-        self.mock_creds = MagicMock()
+        clear_caches()
+        self.addCleanup(clear_caches)
+        mock_exists.return_value = True
+        self.mock_creds = MagicMock(valid=True)
         mock_credentials.from_authorized_user_file.return_value = self.mock_creds
         self.mock_service = MagicMock()
         mock_build.return_value = self.mock_service
@@ -24,13 +116,43 @@ class TestGoogleSheetsHandler(unittest.TestCase):
     @patch("src.services.sheets_handler.Credentials")
     @patch("src.services.sheets_handler.os.path.exists")
     def test_authentication(self, mock_exists, mock_credentials, mock_build):
-        mock_exists.return_value = False
+        mock_exists.return_value = True
         mock_credentials.from_authorized_user_file.return_value = self.mock_creds
         mock_build.return_value = self.mock_service
 
         handler = GoogleSheetsHandler("dummy_credentials_path")
         self.assertIsNotNone(handler.service)
 
+    @patch("src.services.sheets_handler.build")
+    @patch("src.services.sheets_handler.Credentials")
+    @patch("src.services.sheets_handler.os.path.exists")
+    def test_client_is_shared_across_handlers(self, mock_exists, mock_credentials, mock_build):
+        clear_caches()
+        mock_exists.return_value = True
+        mock_credentials.from_authorized_user_file.return_value = self.mock_creds
+
+        first = GoogleSheetsHandler("dummy_credentials_path")
+        second = GoogleSheetsHandler("dummy_credentials_path")
+
+        mock_build.assert_called_once()
+        self.assertTrue(mock_build.call_args.kwargs["static_discovery"])
+        self.assertIs(first.service, second.service)
+        self.assertIs(first.write_rate_limiter, second.write_rate_limiter)
+        mock_credentials.from_authorized_user_file.assert_called_once()
+
+    def test_metadata_is_cached(self):
+        self.mock_service.spreadsheets().get().execute.return_value = {
+            "sheets": [{"properties": {"title": "Data"}}]
+        }
+        self.mock_service.spreadsheets().get.reset_mock()
+
+        self.assertTrue(self.handler.validate_sheet_access("dummy_spreadsheet_id"))
+        self.assertEqual(self.handler.get_sheet_titles("dummy_spreadsheet_id"), ["Data"])
+        self.assertEqual(self.mock_service.spreadsheets().get.call_count, 1)
+
+        self.handler.get_spreadsheet_metadata("dummy_spreadsheet_id", refresh=True)
+        self.assertEqual(self.mock_service.spreadsheets().get.call_count, 2)
+
     def test_validate_sheet_access_success(self):
         self.mock_service.spreadsheets().get().execute.return_value = {}
         result = self.handler.validate_sheet_access("dummy_spreadsheet_id")
@@ -58,20 +180,71 @@ class TestGoogleSheetsHandler(unittest.TestCase):
         )
 
     def test_get_sheet_data_success(self):
-        self.mock_service.spreadsheets().values().get().execute.return_value = {
-            "values": [["header1", "header2"], ["value1", "value2"]]
-        }
+        self.handler.service = FakeSheetsService([["header1", "header2"], ["value1", "value2"]])
         df = self.handler.get_sheet_data("dummy_spreadsheet_id")
         self.assertEqual(df.shape, (1, 2))
         self.assertEqual(list(df.columns), ["header1", "header2"])
 
     def test_get_sheet_data_empty(self):
-        self.mock_service.spreadsheets().values().get().execute.return_value = {
-            "values": []
-        }
+        self.handler.service = FakeSheetsService([])
         df = self.handler.get_sheet_data("dummy_spreadsheet_id")
         self.assertTrue(df.empty)
 
+    def test_get_sheet_data_skips_metadata_request(self):
+        self.mock_service.spreadsheets().values().batchGet().execute.return_value = {"valueRanges": []}
+        self.mock_service.spreadsheets().get.reset_mock()
+
+        self.handler.get_sheet_data("dummy_spreadsheet_id")
+
+        self.mock_service.spreadsheets().get.assert_not_called()
+
+    def test_get_sheet_data_not_found(self):
+        error = HttpError(resp=MagicMock(status=404), content=b"")
+        self.mock_service.spreadsheets().values().batchGet().execute.side_effect = error
+
+        with self.assertRaises(Exception) as context:
+            self.handler.get_sheet_data("dummy_spreadsheet_id")
+        self.assertIn("Spreadsheet not found", str(context.exception))
+
+    def test_pages_fetch_only_selected_columns(self):
+        header = ["id", "name", "city", "notes", "email"]
+        rows = [[str(i), f"Company {i}", f"City {i}", "x" * 20, f"c{i}@example.com"] for i in range(25)]
+        service = FakeSheetsService([header] + rows)
+        self.handler.service = service
+
+        pages = list(self.handler.iter_sheet_pages("sheet", ["email", "name", "city"], page_size=10))
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(list(pages[0].columns), ["email", "name", "city"])
+        self.assertEqual(pages[2].loc[24, "name"], "Company 24")
+        # Header, three pages and the empty page that ends the read
+        self.assertEqual(service.requests[1], ["B2:C11", "E2:E11"])
+        self.assertEqual(len(service.requests), 5)
+
+    def test_pages_respect_row_range_and_blanks(self):
+        rows = [["name", "city"], ["Acme", ""], ["", "Paris"], ["Globex"], ["Initech", "Rome"]]
+        service = FakeSheetsService(rows)
+        self.handler.service = service
+
+        pages = list(self.handler.iter_sheet_pages("sheet", start_row=1, end_row=3, page_size=10))
+
+        self.assertEqual(service.requests[1:], [["A3:B4"]])
+        page = pages[0]
+        self.assertEqual(list(page.index), [1, 2])
+        self.assertTrue(pd.isna(page.loc[1, "name"]))
+        self.assertTrue(pd.isna(page.loc[2, "city"]))
+
+    def test_unknown_column(self):
+        self.handler.service = FakeSheetsService([["name"], ["Acme"]])
+
+        with self.assertRaises(Exception) as context:
+            list(self.handler.iter_sheet_pages("sheet", ["email"]))
+        self.assertIn("Columns not found: email", str(context.exception))
+
+    def test_column_helpers(self):
+        self.assertEqual([column_letter(i) for i in (0, 25, 26, 701, 702)], ["A", "Z", "AA", "ZZ", "AAA"])
+        self.assertEqual(column_blocks([0, 1, 2, 4, 6, 7]), [(0, 2), (4, 4), (6, 7)])
+
     def test_update_sheet_data_success(self):
         data = pd.DataFrame({"header1": ["value1"], "header2": ["value2"]})
         self.mock_service.spreadsheets().values().update().execute.return_value = {}
@@ -89,5 +262,122 @@ class TestGoogleSheetsHandler(unittest.TestCase):
         self.assertIn("Error updating sheet", str(context.exception))
 
 
+class TestSheetResultWriter(unittest.TestCase):
+    @patch("src.services.sheets_handler.build")
+    @patch("src.services.sheets_handler.Credentials")
+    @patch("src.services.sheets_handler.os.path.exists")
+    def setUp(self, mock_exists, mock_credentials, mock_build):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        mock_exists.return_value = True
+        mock_credentials.from_authorized_user_file.return_value = MagicMock(valid=True)
+        self.service = FakeSheetsService()
+        mock_build.return_value = self.service
+        self.handler = GoogleSheetsHandler("dummy_credentials_path")
+        self.handler.write_rate_limiter = RateLimiter(1000, per=1)
+
+    def rows(self, count):
+        return [{"Row": i, "Entity": f"e{i}", "Extracted Information": f"info {i}"} for i in range(count)]
+
+    def test_rows_are_written_in_chunks(self):
+        writer = self.handler.open_result_writer("sheet", chunk_size=3, flush_interval=60)
+        for row in self.rows(7):
+            writer.write(row)
+        self.assertEqual(self.service.writes, ["'Results'!A1:C3", "'Results'!A4:C6"])
+
+        writer.close()
+
+        self.assertEqual(self.service.writes[-1], "'Results'!A7:C8")
+        self.assertEqual(self.service.rows[0], ["Row", "Entity", "Extracted Information"])
+        self.assertEqual(self.service.rows[7], [6, "e6", "info 6"])
+        self.assertIn("Results", self.service.titles)
+
+    def test_failed_chunk_is_retried_on_the_same_range(self):
+        self.service.failures = [HttpError(resp=MagicMock(status=503), content=b"")]
+        writer = self.handler.open_result_writer("sheet", chunk_size=100, retry_backoff=0)
+
+        with writer:
+            for row in self.rows(3):
+                writer.write(row)
+
+        self.assertEqual(self.service.writes, ["'Results'!A1:C4", "'Results'!A1:C4"])
+        self.assertEqual(len(self.service.rows), 4)
+
+    def test_client_errors_are_not_retried(self):
+        self.service.failures = [HttpError(resp=MagicMock(status=400), content=b"")]
+        writer = self.handler.open_result_writer("sheet", retry_backoff=0)
+        writer.write(self.rows(1)[0])
+
+        with self.assertRaises(Exception) as context:
+            writer.close()
+        self.assertIn("Error writing rows 'Results'!A1:C2", str(context.exception))
+        self.assertEqual(len(self.service.writes), 1)
+
+    def test_sheet_titles_are_fetched_once(self):
+        self.handler.open_result_writer("sheet")
+        self.handler.open_result_writer("sheet", sheet_name="Sheet1")
+
+        self.assertEqual(self.service.metadata_requests, 1)
+        self.assertEqual(self.service.titles, ["Sheet1", "Results"])
+
+    def test_export_results(self):
+        data = pd.DataFrame({"Entity": ["Acme", "Globex"], "Score": [1.5, float("nan")]})
+
+        url = self.handler.export_results(data, "sheet")
+
+        self.assertEqual(url, "https://docs.google.com/spreadsheets/d/sheet")
+        self.assertEqual(self.service.rows, [["Entity", "Score"], ["Acme", 1.5], ["Globex", ""]])
+
+
+class TestCredentialRefresher(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.token_path = os.path.join(self.tmpdir.name, "token.json")
+
+    def test_refreshes_ahead_of_expiry_in_background(self):
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        creds = MagicMock(refresh_token="refresh", expiry=now + timedelta(seconds=300.05))
+        creds.to_json.return_value = '{"token": "new"}'
+        refreshed = threading.Event()
+
+        def refresh(request):
+            creds.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+            refreshed.set()
+
+        creds.refresh.side_effect = refresh
+        refresher = CredentialRefresher(creds, self.token_path, margin=300)
+        self.addCleanup(refresher.cancel)
+
+        self.assertTrue(refreshed.wait(2))
+        self.assertGreater(refresher.seconds_until_refresh(), 3000)
+        refresher.cancel()
+        deadline = time.monotonic() + 2
+        while not os.path.exists(self.token_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with open(self.token_path) as token:
+            self.assertEqual(token.read(), '{"token": "new"}')
+
+    def test_failed_refresh_is_reported_and_retried(self):
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        creds = MagicMock(refresh_token="refresh", expiry=now + timedelta(hours=1))
+        creds.refresh.side_effect = Exception("invalid_grant")
+        refresher = CredentialRefresher(creds, self.token_path, retry_interval=60)
+        self.addCleanup(refresher.cancel)
+        refresher.timer.cancel()
+
+        with patch("src.services.sheets_handler.handle_error") as handle_error:
+            refresher.refresh()
+
+        handle_error.assert_called_once_with(creds.refresh.side_effect, stage="sheets_auth")
+        self.assertEqual(refresher.timer.interval, 60)
+        self.assertFalse(os.path.exists(self.token_path))
+
+    def test_credentials_without_expiry_are_left_alone(self):
+        refresher = CredentialRefresher(MagicMock(expiry=None), self.token_path)
+
+        self.assertIsNone(refresher.timer)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+from src.services.enrichment import EnrichmentEngine, plan_tasks
+from src.services.llm_service import LLMService
+from src.services.structured_output import parse_answers, prompt_columns, structured_frame
+from tests.test_enrichment import StubLLMService, StubSearchService
+from tests.test_llm_service import completion
+
+PROMPTS = ["Find the email of {entity}", "Find the employee count of {entity}"]
+
+
+class StructuredStubLLMService(StubLLMService):
+    def extract_structured(self, search_results, prompt_templates):
+        snippet = search_results[0]["snippet"]
+        if snippet == "QBAD":
+            return {"result": "not json", "status": "error", "error_type": "InvalidJSON"}
+        return {"result": "", "answers": [snippet.lower(), len(snippet)], "status": "success"}
+
+
+class TestParseAnswers(unittest.TestCase):
+    def test_valid_json_is_typed(self):
+        answers, parsed = parse_answers('{"1": "a@b.com", "2": 120, "3": ["x", "y"], "4": true}', 4)
+
+        self.assertEqual(answers, ["a@b.com", 120, ["x", "y"], True])
+        self.assertEqual(parsed, "json")
+
+    def test_missing_and_not_found_answers_are_none(self):
+        answers, _ = parse_answers('{"1": "Not found", "3": "extra"}', 2)
+
+        self.assertEqual(answers, [None, None])
+
+    def test_prose_fences_and_trailing_commas_are_repaired(self):
+        answers, parsed = parse_answers('Here you go:\n```json\n{"1": "a", "2": 5,}\n```', 2)
+
+        self.assertEqual((answers, parsed), (["a", 5], "repaired"))
+
+    def test_truncated_json_is_completed(self):
+        answers, parsed = parse_answers('{"1": "a", "2": "half an ans', 2)
+
+        self.assertEqual((answers, parsed), (["a", "half an ans"], "repaired"))
+
+    def test_unexpected_shapes_are_kept_as_text(self):
+        answers, _ = parse_answers('{"1": {"street": "Main"}, "2": 3}', 2)
+
+        self.assertEqual(answers, ['{"street": "Main"}', 3])
+
+    def test_numbered_lists_are_read(self):
+        answers, parsed = parse_answers("1. a@b.com\n2. Not found", 2)
+
+        self.assertEqual((answers, parsed), (["a@b.com", None], "numbered"))
+
+    def test_unusable_reply(self):
+        self.assertEqual(parse_answers("I could not help", 2), (None, "failed"))
+
+    def test_prompt_columns_are_unique(self):
+        self.assertEqual(
+            prompt_columns(["Find the email of {entity}", "Find the email of {entity}", "Entity"]),
+            ["Find the email", "Find the email (2)", "Entity (2)"],
+        )
+
+
+class TestStructuredEnrichment(unittest.TestCase):
+    def run_engine(self, data, **kwargs):
+        engine = EnrichmentEngine(
+            StubSearchService(), StructuredStubLLMService(), max_workers=2, structured_output=True, **kwargs
+        )
+        plan = plan_tasks(data, ["name"], "Q{entity}")
+        return plan.fan_out(list(engine.run(plan.tasks, PROMPTS)))
+
+    def test_each_prompt_gets_a_typed_column(self):
+        rows = self.run_engine(pd.DataFrame({"name": ["Acme", "BAD", "acme"]}))
+        frame = structured_frame(rows, PROMPTS)
+
+        self.assertEqual(
+            list(frame.columns),
+            ["Row", "Column", "Entity", "Sources", "Find the email", "Find the employee count", "Error"],
+        )
+        self.assertEqual(list(frame["Find the email"]), ["qacme", pd.NA, "qacme"])
+        self.assertEqual(str(frame["Find the employee count"].dtype), "Int64")
+        self.assertEqual(frame["Error"][1], "not json")
+
+    def test_batched_text_answers_are_parsed(self):
+        rows = self.run_engine(pd.DataFrame({"name": ["Acme", "Globex"]}), llm_batch_size=2)
+
+        # StubLLMService.extract_batch answers with plain text, not numbered lists
+        self.assertEqual(rows[0]["Error"], "Unparseable answer: QACME")
+
+
+class TestExtractStructured(unittest.TestCase):
+    def setUp(self):
+        self.service = LLMService(api_key="test_api_key")
+        self.service.client = MagicMock()
+        self.create = self.service.client.chat.completions.create
+        self.search_results = [{"url": "http://example.com", "snippet": "Acme has 40 staff"}]
+
+    def test_repairable_reply_needs_one_call(self):
+        self.create.return_value = completion('Sure: {"1": "info@acme.com", "2": 40')
+
+        result = self.service.extract_structured(self.search_results, ["Email", "Staff"])
+
+        self.assertEqual(self.create.call_count, 1)
+        self.assertEqual(result["answers"], ["info@acme.com", 40])
+        self.assertEqual(result["result"], "1. info@acme.com\n2. 40")
+
+    def test_unusable_reply_is_asked_again_once(self):
+        self.create.side_effect = [completion("Acme is a company."), completion('{"1": null, "2": 40}')]
+
+        result = self.service.extract_structured(self.search_results, ["Email", "Staff"])
+
+        self.assertEqual(self.create.call_count, 2)
+        self.assertEqual(result["answers"], [None, 40])
+        retry_messages = self.create.call_args.kwargs["messages"]
+        self.assertEqual(retry_messages[2], {"role": "assistant", "content": "Acme is a company."})
+
+    def test_reply_that_stays_unusable_is_an_error(self):
+        self.create.return_value = completion("no idea")
+
+        result = self.service.extract_structured(self.search_results, ["Email"])
+
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(self.create.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
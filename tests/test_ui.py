@@ -1,4 +1,8 @@
-from unittest.mock import mock_open, patch
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+from unittest.mock import ANY, mock_open, patch
 
 import pandas as pd
 import pytest
@@ -6,7 +10,9 @@ import yaml
 
 from dashboard.ui import (
     convert_df,
+    current_user,
     extract_sheet_id_from_url,
+    get_sheets_handler,
     initialize_services,
     load_config,
 )
@@ -15,7 +21,7 @@ from dashboard.ui import (
 @pytest.fixture
 def mock_config():
     return {
-        "api_keys": {"serpapi": "mock-serpapi-key", "gemini": "mock-gemini-key"},
+        "api_keys": {"serpapi": "mock-serpapi-key", "groq": "mock-groq-key"},
         "google_sheets": {"credentials_file": "mock-credentials.json"},
     }
 
@@ -42,18 +48,69 @@ def test_load_config(mock_get_env, mock_file, mock_load_env):
     assert config["google_sheets"]["credentials_file"] == "mock-credentials.json"
 
 
-@patch("streamlit.session_state", {})
 def test_initialize_services(mock_config):
-    with patch("dashboard.ui.GoogleSheetsHandler") as mock_sheets:
-        with patch("dashboard.ui.LLMService") as mock_llm:
-            with patch("dashboard.ui.SearchService") as mock_search:
-                sheets, llm, search = initialize_services(mock_config)
-
-                mock_sheets.assert_called_once_with(
-                    mock_config["google_sheets"]["credentials_file"]
-                )
-                mock_llm.assert_called_once_with(mock_config["api_keys"]["gemini"])
-                mock_search.assert_called_once_with(mock_config["api_keys"]["serpapi"])
+    with patch("services.llm_service.LLMService") as mock_llm:
+        with patch("services.search_service.SearchService") as mock_search:
+            pool = initialize_services(mock_config)
+
+            assert pool.llm_service is mock_llm.return_value
+            assert pool.search_service is mock_search.return_value
+            mock_llm.assert_called_once_with(
+                mock_config["api_keys"]["groq"],
+                cache=None,
+                rate_limiter=None,
+                prompt_builder=ANY,
+                max_connections=None,
+            )
+            mock_search.assert_called_once_with(
+                mock_config["api_keys"]["serpapi"],
+                cache=None,
+                timeout=10.0,
+                max_connections=10,
+                rate_limiter=ANY,
+                retry_attempts=3,
+            )
+
+
+def test_sheets_handler_is_built_once(mock_config):
+    get_sheets_handler.clear()
+    with patch("dashboard.ui.get_config", return_value=mock_config):
+        with patch("services.sheets_handler.GoogleSheetsHandler") as mock_sheets:
+            assert get_sheets_handler() is get_sheets_handler()
+
+            mock_sheets.assert_called_once_with(mock_config["google_sheets"]["credentials_file"])
+    get_sheets_handler.clear()
+
+
+@pytest.mark.parametrize(
+    "user, expected",
+    [
+        ({"email": "ada@example.org"}, "ada@example.org"),
+        # Self-hosted Streamlit without auth reports this for everyone
+        ({"email": "test@example.com"}, "session-1"),
+        ({}, "session-1"),
+    ],
+)
+def test_current_user(user, expected):
+    with patch("dashboard.ui.st.experimental_user", user):
+        with patch(
+            "streamlit.runtime.scriptrunner.get_script_run_ctx",
+            return_value=SimpleNamespace(session_id="session-1"),
+        ):
+            assert current_user() == expected
+
+
+def test_import_does_not_load_heavy_sdks():
+    code = (
+        "import sys; import dashboard.ui; "
+        "print([m for m in ('pandas', 'yaml', 'groq', 'googleapiclient', 'google.oauth2') if m in sys.modules])"
+    )
+    src = os.path.join(os.path.dirname(__file__), "..", "src")
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=src, capture_output=True, text=True, check=True
+    ).stdout
+
+    assert output.strip() == "[]"
 
 
 def test_extract_sheet_id_from_url():